@@ -0,0 +1,317 @@
+"""效能量測指令
+
+    python -m books_crawler.bench overhead --lists 70
+    python -m books_crawler.bench scrapers --units 20
+    python -m books_crawler.bench parse --repeat 5
+    python -m books_crawler.bench records --count 1000000
+
+overhead：量測每個榜單的固定成本（建立爬蟲實例並抓取一頁），比較每個榜單各自
+建立資源（連線、UserAgent()、速率限制，與舊版相同）與共用 SharedResources 的差異。頁面由本機 HTTP 伺服器提供，
+結果只反映本程序內的開銷與連線建立次數，不含實際網路延遲。
+
+scrapers：以重播模式（內附範例頁面、不做禮貌等待）端對端執行每個爬蟲，
+回報每秒頁數與每秒紀錄數，用來比較各爬蟲扣除網路後的處理成本。
+
+parse：只量測解析，不經過 session 與重播。以 ``網頁html範例`` 中的頁面比較各頁面類型
+在 html.parser 與 lxml 下的解析時間，並標示 lxml 是否達到 PARSE_SPEEDUP_TARGET 倍。
+
+records：在獨立子程序中建立大量排行紀錄，比較 dict 與 RankingEntry 的峰值 RSS，
+以及序列化成 JSONL、CSV 的速度。
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_useragent import UserAgent
+
+from .core.fetcher import HostRateLimiter
+from .core.frontier import CrawlFrontier
+from .core.html_backend import available_backends, make_soup
+from .core.records import RankingEntry, write_csv, write_jsonl
+from .core.resources import SharedResources
+from .scrapers.bestseller_scraper import BestsellerScraper, parse_bestseller_html
+from .scrapers.chiming_scraper import CHIMING_URL, ChimingBestsellerScraper
+from .scrapers.detail_scraper import BookDetailScraper, parse_detail_html
+from .scrapers.list_scraper import BookListScraper, crawl_frontier, parse_list_html
+from .utils.category_utils import CategoryGenerator
+
+BENCH_PAGE = b'<html><body><ul><li class="item"></li></ul></body></html>'
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '網頁html範例')
+# lxml 相對 html.parser 的解析加速目標
+PARSE_SPEEDUP_TARGET = 5
+
+
+class _BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(BENCH_PAGE)))
+        self.end_headers()
+        self.wfile.write(BENCH_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def _start_server():
+    server = _CountingServer(('127.0.0.1', 0), _BenchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_overhead(lists=70, base_dir=None):
+    """回傳 {模式: (每榜單毫秒數, 連線數)}"""
+    base_dir = base_dir or tempfile.mkdtemp(prefix='books_bench_')
+    # 本機伺服器不需要禮貌間隔
+    config = {'base_dir': base_dir, 'fetch': {'rate_limits': {'default': 100000}}}
+    server = _start_server()
+    url = f'http://127.0.0.1:{server.server_address[1]}/chart'
+    results = {}
+    try:
+        for mode in ('per_list', 'shared'):
+            server.connections = 0
+            resources = SharedResources(config) if mode == 'shared' else None
+            scrapers = []
+            start = time.perf_counter()
+            for i in range(lists):
+                scraper = BestsellerScraper(f'list_{i}', url, config, resources=resources)
+                if mode == 'per_list':
+                    # 舊版每個榜單各自建立 UserAgent() 與速率限制，不使用程序共用的 User-Agent 池
+                    scraper.headers['User-Agent'] = UserAgent().random
+                    scraper.rate_limiter = HostRateLimiter.from_config(config)
+                scraper.get_bestsellers()
+                # 保留實例，避免 session 被回收而關閉連線，與舊版 main 的行為一致
+                scrapers.append(scraper)
+            elapsed = time.perf_counter() - start
+            results[mode] = (elapsed / lists * 1000, server.connections)
+            for scraper in scrapers:
+                scraper.session.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def _run_bestseller(config, resources, units):
+    records = 0
+    for i in range(units):
+        url = f'https://www.books.com.tw/web/sys_saletopb/books/{i:02d}/?loc=P_0002_{i:03d}'
+        records += len(BestsellerScraper(f'list_{i}', url, config, resources=resources).get_bestsellers())
+    return records
+
+
+def _run_list(config, resources, units):
+    # 偶數分類為Ａ版（6 頁），奇數分類為Ｂ版（17 頁）
+    scraper = BookListScraper(None, None, config, resources=resources)
+    frontier = CrawlFrontier(os.path.join(resources.base_dir, 'bench_frontier.sqlite'))
+    frontier.reset()
+    frontier.add_many(
+        (f'category_{i}', 1, f'https://www.books.com.tw/web/books_bmidm_{1302 if i % 2 else 1208}/?o=1&v=1&bench={i}')
+        for i in range(units)
+    )
+    try:
+        crawl_frontier(scraper, frontier, batch_size=scraper.fetcher.concurrency * 2)
+    finally:
+        frontier.close()
+    records = 0
+    for filename in os.listdir(resources.output_dir):
+        with open(os.path.join(resources.output_dir, filename), encoding='utf-8') as f:
+            records += sum(1 for _ in f)
+    return records
+
+
+def _run_detail(config, resources, units):
+    scraper = BookDetailScraper(config, resources=resources)
+    urls = [f'https://www.books.com.tw/products/0011{i:06d}' for i in range(units)]
+    return sum(1 for _, book in scraper.crawl_details(urls) if book)
+
+
+def _run_chiming(config, resources, units):
+    scraper = ChimingBestsellerScraper(None, config, resources=resources)
+    urls = [CHIMING_URL.format(f'0011{i:06d}') for i in range(units)]
+    return sum(len(series) for _, series in scraper.poll(urls) if series)
+
+
+def _run_categories(config, resources, units):
+    generator = CategoryGenerator(config.get('parser_backend', 'html.parser'), resources=resources)
+    records = 0
+    for _ in range(units):
+        records += sum(len(sub['subcategories']) or 1
+                       for category in generator.generate_categories()
+                       for sub in category['subcategories'])
+    return records
+
+
+SCRAPER_WORKLOADS = {
+    'bestseller': _run_bestseller,
+    'list': _run_list,
+    'detail': _run_detail,
+    'chiming': _run_chiming,
+    'categories': _run_categories,
+}
+
+
+def bench_scrapers(units=20, names=None, parser_backend='html.parser'):
+    """回傳 {爬蟲: (頁數, 紀錄數, 秒數)}，每個爬蟲使用獨立的輸出目錄"""
+    results = {}
+    for name in names or SCRAPER_WORKLOADS:
+        base_dir = tempfile.mkdtemp(prefix=f'books_bench_{name}_')
+        config = {'base_dir': base_dir, 'replay': {'mode': 'replay'}, 'parser_backend': parser_backend}
+        resources = SharedResources(config)
+        adapter = resources.session.get_adapter('https://')
+        # User-Agent 池只在程序第一次使用時載入，不計入量測
+        resources.user_agent()
+        try:
+            start = time.perf_counter()
+            records = SCRAPER_WORKLOADS[name](config, resources, units)
+            results[name] = (adapter.served, records, time.perf_counter() - start)
+        finally:
+            resources.close()
+    return results
+
+
+# 頁面類型: (範例檔名, 解析函式)
+PARSE_PAGES = {
+    'list': ('書籍頁面列表範例.html', lambda content, backend: parse_list_html(content, True, backend)),
+    'list_b': ('書籍頁面列表Ｂ版.html', lambda content, backend: parse_list_html(content, True, backend)),
+    'detail': ('書籍單頁B版.html', lambda content, backend: parse_detail_html(content, backend)),
+    'bestseller': ('排行榜ＡＢ版範例20241024.html', lambda content, backend: parse_bestseller_html(content, backend)),
+    'categories': ('書籍分類目錄20241024.html',
+                   lambda content, backend: CategoryGenerator(backend).parse_categories(make_soup(content, backend))),
+}
+
+
+def _parse_seconds(parse, content, backend, repeat, number):
+    """repeat 輪中每次解析的最短平均秒數"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            parse(content, backend)
+        seconds = (time.perf_counter() - start) / number
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def bench_parse(repeat=5, number=3, names=None, sample_dir=SAMPLE_DIR):
+    """回傳 {頁面類型: {後端: 每頁毫秒數}}，只計算解析，不含抓取與重播"""
+    backends = [backend for backend in ('html.parser', 'lxml') if backend in available_backends()]
+    results = {}
+    for name in names or PARSE_PAGES:
+        filename, parse = PARSE_PAGES[name]
+        with open(os.path.join(sample_dir, filename), 'rb') as f:
+            content = f.read()
+        results[name] = {
+            backend: _parse_seconds(parse, content, backend, repeat, number) * 1000 for backend in backends
+        }
+    return results
+
+
+def _ranking_row(i):
+    """模擬排行榜解析結果：書名、網址等每筆不同，作者與時間大量重複"""
+    return {
+        'rank': i % 100 + 1, 'title': f'書名{i}', 'url': f'https://www.books.com.tw/products/{i:010d}',
+        'book_id': f'{i:010d}', 'author': f'作者{i % 5000}', 'img_url': f'https://im1.book.com.tw/{i}.jpg',
+        'discount': '79', 'price': str(200 + i % 300), 'timestamp': f'2024-10-24 {i // 100000 % 24:02d}:00:00',
+    }
+
+
+def _hold_records(mode, count, results):
+    # resource 只有 POSIX 平台提供，在子程序中才載入，其他量測在 Windows 上仍可匯入執行
+    import resource
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if mode == 'dict':
+        records = [_ranking_row(i) for i in range(count)]
+    else:
+        records = [RankingEntry(**_ranking_row(i)) for i in range(count)]
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+
+    sample = records[:min(count, 100000)]
+    start = time.perf_counter()
+    if mode == 'dict':
+        for row in sample:
+            json.dumps(row, ensure_ascii=False)
+    else:
+        write_jsonl(sample, io.StringIO(), RankingEntry)
+    jsonl_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    if mode == 'dict':
+        csv.DictWriter(io.StringIO(), fieldnames=list(sample[0])).writerows(sample)
+    else:
+        write_csv(sample, io.StringIO(), RankingEntry)
+    csv_seconds = time.perf_counter() - start
+    results.put((mode, peak_kb, len(sample) / jsonl_seconds, len(sample) / csv_seconds))
+
+
+def bench_records(count=1000000):
+    """回傳 {模式: (峰值 RSS 增量 MB, JSONL 筆/秒, CSV 筆/秒)}，每種模式在新的子程序中執行"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    output = {}
+    for mode in ('dict', 'record'):
+        process = context.Process(target=_hold_records, args=(mode, count, results))
+        process.start()
+        mode, peak_kb, jsonl_rate, csv_rate = results.get()
+        process.join()
+        output[mode] = (peak_kb / 1024, jsonl_rate, csv_rate)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="效能量測")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    overhead_parser = subparsers.add_parser('overhead', help="每個榜單的固定成本")
+    overhead_parser.add_argument('--lists', type=int, default=70)
+    scrapers_parser = subparsers.add_parser('scrapers', help="重播範例頁面時各爬蟲的吞吐量")
+    scrapers_parser.add_argument('--units', type=int, default=20, help="每個爬蟲的榜單、分類或書籍數")
+    scrapers_parser.add_argument('--only', nargs='*', choices=list(SCRAPER_WORKLOADS))
+    scrapers_parser.add_argument('--parser-backend', default='html.parser')
+    parse_parser = subparsers.add_parser('parse', help="各頁面類型在不同解析後端的解析時間")
+    parse_parser.add_argument('--repeat', type=int, default=5)
+    parse_parser.add_argument('--only', nargs='*', choices=list(PARSE_PAGES))
+    records_parser = subparsers.add_parser('records', help="紀錄型別的記憶體與序列化速度")
+    records_parser.add_argument('--count', type=int, default=1000000)
+    args = parser.parse_args()
+
+    if args.command == 'overhead':
+        results = bench_overhead(args.lists)
+        for mode, (per_list_ms, connections) in results.items():
+            print(f"{mode:>10}: 每榜單 {per_list_ms:.2f} ms，建立連線 {connections} 次")
+    elif args.command == 'scrapers':
+        results = bench_scrapers(args.units, args.only, args.parser_backend)
+        for name, (pages, records, seconds) in results.items():
+            print(f"{name:>10}: {pages} 頁、{records} 筆，{pages / seconds:.1f} 頁/秒，{records / seconds:.1f} 筆/秒")
+    elif args.command == 'parse':
+        for name, timings in bench_parse(args.repeat, names=args.only).items():
+            line = f"{name:>10}: " + "，".join(f"{backend} {ms:.2f} ms" for backend, ms in timings.items())
+            if 'lxml' in timings:
+                speedup = timings['html.parser'] / timings['lxml']
+                status = '達標' if speedup >= PARSE_SPEEDUP_TARGET else '未達標'
+                line += f"，lxml {speedup:.1f}×（目標 {PARSE_SPEEDUP_TARGET}×，{status}）"
+            print(line)
+    elif args.command == 'records':
+        for mode, (peak_mb, jsonl_rate, csv_rate) in bench_records(args.count).items():
+            print(f"{mode:>8}: 峰值 RSS +{peak_mb:.0f} MB，JSONL {jsonl_rate:,.0f} 筆/秒，CSV {csv_rate:,.0f} 筆/秒")
+
+if __name__ == "__main__":
+    main()
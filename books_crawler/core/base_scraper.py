@@ -1,66 +1,124 @@
-from datetime import datetime
 import logging
 import json
 import csv
-import requests
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
-import time
-import random
 import os
+from .fetcher import AsyncFetcher
+from .parse_pool import ParsePipeline
+from .html_backend import DEFAULT_BACKEND, make_soup
+from .metrics import METRICS
+from .records import json_default
+from .resources import SharedResources
+from .sink import open_sink
 
 class BaseScraper:
-    def __init__(self, config=None):
+    def __init__(self, config=None, resources=None):
+        """resources 為一次執行中共用的 SharedResources，未提供時為本實例單獨建立"""
         self.config = config or {}
-        self.session = requests.Session()
+        self.resources = resources or SharedResources(
+            self.config, log_name=self.__class__.__name__.lower()
+        )
+        self.session = self.resources.session
+        self.http_cache = self.resources.http_cache
         self.setup_paths()
         self.setup_logging()
         self.headers = self._get_headers()
+        self.parser_backend = self.config.get('parser_backend', DEFAULT_BACKEND)
+        self.rate_limiter = self.resources.rate_limiter
+        self._fetcher = None
         
     def setup_paths(self):
-        """設置基本路徑"""
-        self.base_dir = self.config.get('base_dir', 'data')
-        self.log_dir = os.path.join(self.base_dir, 'logs')
-        self.output_dir = os.path.join(self.base_dir, 'output')
-        
-        for dir_path in [self.log_dir, self.output_dir]:
-            os.makedirs(dir_path, exist_ok=True)
+        """設置基本路徑（目錄由 SharedResources 建立）"""
+        self.base_dir = self.resources.base_dir
+        self.log_dir = self.resources.log_dir
+        self.output_dir = self.resources.output_dir
     
     def setup_logging(self):
-        """統一的日誌設置"""
-        timestamp = datetime.now().strftime('%Y%m%d')
-        log_filename = os.path.join(
-            self.log_dir,
-            f'{self.__class__.__name__.lower()}_{timestamp}.log'
-        )
-        
-        logging.basicConfig(
-            filename=log_filename,
-            level=logging.DEBUG,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        """統一的日誌設置（日誌檔由 SharedResources 設定）"""
         self.logger = logging.getLogger(self.__class__.__name__)
         
+    def report_cache_stats(self):
+        """在日誌中輸出本次執行的快取命中統計"""
+        if self.http_cache:
+            self.logger.info(self.http_cache.summary())
+
+    def report_stats(self):
+        """執行結束時輸出快取與效能指標摘要，並更新指標 textfile"""
+        self.report_cache_stats()
+        if self.resources.product_ids is not None:
+            # 執行中由頁面收集到的書籍 ID 寫回磁碟
+            self.resources.product_ids.flush()
+            self.logger.info(f"書籍 ID 集合共 {len(self.resources.product_ids)} 個")
+        self.logger.info(METRICS.summary())
+        self.resources.export_metrics()
+        
     def _get_headers(self):
-        """獲取隨機User-Agent"""
-        ua = UserAgent()
+        """從共用的 User-Agent 池取得隨機User-Agent"""
         return {
-            'User-Agent': ua.random,
+            'User-Agent': self.resources.user_agent(),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
             'Referer': 'https://www.books.com.tw',
         }
         
-    def _get_soup(self, url):
-        """取得 BeautifulSoup 物件，包含隨機延遲模擬"""
-        time.sleep(random.uniform(1, 3))
+    @property
+    def fetcher(self):
+        """延遲建立的抓取引擎，_get_soup 與批次抓取都經由它送出請求並共用主機速率預算"""
+        if self._fetcher is None:
+            self._fetcher = AsyncFetcher.from_config(
+                self.session, self.headers, self.config, logger=self.logger,
+                rate_limiter=self.rate_limiter, dead_letters=self.resources.dead_letters,
+                sleep=self.resources.sleep, product_ids=self.resources.product_ids,
+                http_cache=self.http_cache
+            )
+        return self._fetcher
+
+    def _extract_book_id(self, url):
+        """從URL中提取書籍ID"""
         try:
-            response = self.session.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
+            if "products" in url:
+                return url.split("/")[-1].split("?")[0]
+            return None
+        except Exception as e:
+            self.logger.error(f"提取書籍ID時出錯: {str(e)}")
+            return None
+        
+    def _get_soup(self, url, stop_markers=None):
+        """取得解析後的頁面（依 parser_backend 決定後端），請求前依主機速率預算等待
+
+        暫時性錯誤依 config['retry'] 重試，仍失敗時回傳 None 並記入 dead letter。
+        指定 stop_markers 時只下載並解析頁面開頭到最後一個標記為止的部分。
+        """
+        try:
+            response = self.fetcher.fetch(url, stop_markers)
+            return make_soup(response.text, self.parser_backend)
         except Exception as e:
             self.logger.error(f"獲取頁面失敗: {url}, 錯誤: {str(e)}")
             return None
+
+    def _fetch_and_parse(self, urls, parse_func, stop_markers=None, **kwargs):
+        """批次抓取並解析多個頁面，依完成順序回傳 (url, result)，失敗的頁面 result 為 None
+
+        config['parse_workers'] 為 0（預設）時在本程序解析，
+        其他值則交給該數量的子程序（None 代表使用全部 CPU）。
+        """
+        pipeline = ParsePipeline(
+            self.fetcher,
+            max_workers=self.config.get('parse_workers', 0),
+            logger=self.logger
+        )
+        return pipeline.run(urls, parse_func, stop_markers, backend=self.parser_backend, **kwargs)
+
+    @classmethod
+    def parser(cls):
+        """建立只用於解析的實例，不建立 session、輸出目錄與日誌檔，供解析子程序使用"""
+        instance = cls.__new__(cls)
+        instance.config = {}
+        instance.logger = logging.getLogger(cls.__name__)
+        return instance
+            
+    def open_sink(self, filename, format_type="jsonl", **kwargs):
+        """在輸出目錄建立串流輸出，逐筆寫入紀錄而不必全部留在記憶體"""
+        return open_sink(os.path.join(self.output_dir, filename), format_type, **kwargs)
             
     def save_data(self, data, filename, format_type="json"):
         """統一的數據保存方法"""
@@ -69,14 +127,16 @@ class BaseScraper:
         try:
             if format_type == "json":
                 with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
             elif format_type == "csv":
                 if not data:
                     self.logger.warning("沒有數據可以保存")
                     return
                     
+                # Ａ版與Ｂ版的紀錄欄位不同，標頭取所有紀錄欄位的聯集，缺少的欄位留空
+                fieldnames = list(dict.fromkeys(key for row in data for key in row))
                 with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.DictWriter(f, fieldnames=data[0].keys())
+                    writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
                     writer.writeheader()
                     writer.writerows(data)
                     
@@ -0,0 +1,194 @@
+"""排行榜的即時變動事件
+
+下游原本要重新載入整份排行快照，才能找出降價或新進前十名的書。這裡在每個
+榜單解析完成時，與記憶體中每個 (榜單, book_id) 上一次的名次、價格與折扣比較，
+只輸出變動事件：
+
+- ``new_entry``：新上榜（top_n 內）
+- ``rank_change``：名次變動達 rank_threshold 以上
+- ``price_change``：價格變動
+- ``dropped``：掉出榜單
+
+每次比較只處理本次榜單的書籍，事件以 JSONL 附加到檔案並（設定 webhook 時）
+POST 給下游。狀態以 JSON 快照保存；事件先於快照寫出，程序在兩者之間中斷時，
+重新執行會再送出一次相同的事件。榜單第一次出現時只建立狀態，不輸出事件。
+榜單筆數少於上一次的 min_list_ratio 時視為抓取不完整，不輸出 ``dropped``，
+本次沒有出現的書籍保留上一次的狀態。
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+import requests
+
+from .records import to_int
+from .sink import JsonlSink
+
+DEFAULT_RANK_THRESHOLD = 5
+DEFAULT_TOP_N = 10
+DEFAULT_WEBHOOK_TIMEOUT = 10
+DEFAULT_MIN_LIST_RATIO = 0.5
+
+
+class RankingState:
+    """每個榜單上一次的 {book_id: [rank, price, discount]}，以 JSON 快照保存"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lists = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.lists = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f"讀取排行狀態失敗，重新建立: {str(e)}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.lists, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+class ChangeDetector:
+    """比較榜單與上一次的狀態並更新狀態，回傳變動事件"""
+
+    def __init__(self, state, rank_threshold=DEFAULT_RANK_THRESHOLD, top_n=DEFAULT_TOP_N,
+                 min_list_ratio=DEFAULT_MIN_LIST_RATIO):
+        self.state = state
+        self.rank_threshold = rank_threshold
+        # top_n 為 None 時任何名次的新上榜都輸出
+        self.top_n = top_n
+        self.min_list_ratio = min_list_ratio
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def diff(self, list_name, entries):
+        previous = self.state.lists.get(list_name)
+        current = {}
+        events = []
+        detected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for entry in entries:
+            book_id = entry.get('book_id')
+            if not book_id:
+                continue
+            rank, price, discount = to_int(entry.get('rank')), to_int(entry.get('price')), to_int(entry.get('discount'))
+            current[book_id] = [rank, price, discount]
+            if previous is None:
+                continue
+
+            event = {
+                'list': list_name, 'book_id': book_id, 'title': entry.get('title'),
+                'rank': rank, 'price': price, 'discount': discount,
+                'timestamp': entry.get('timestamp') or detected_at,
+            }
+            old = previous.get(book_id)
+            if old is None:
+                if self.top_n is None or (rank is not None and rank <= self.top_n):
+                    events.append({'type': 'new_entry', **event})
+                continue
+            old_rank, old_price, _ = old
+            if rank is not None and old_rank is not None and abs(rank - old_rank) >= self.rank_threshold:
+                events.append({'type': 'rank_change', **event, 'previous_rank': old_rank, 'delta': old_rank - rank})
+            if price is not None and old_price is not None and price != old_price:
+                events.append({'type': 'price_change', **event, 'previous_price': old_price})
+
+        if previous is not None and len(current) < len(previous) * self.min_list_ratio:
+            # 榜單只取得一部分時缺少的書不一定掉出榜單，保留其狀態等下一次完整的榜單再比較
+            self.logger.warning(f"{list_name} 只有 {len(current)} 筆，少於上一次的 {len(previous)} 筆，略過掉出榜單的比較")
+            self.state.lists[list_name] = {**previous, **current}
+            return events
+        if previous is not None:
+            events += [
+                {'type': 'dropped', 'list': list_name, 'book_id': book_id, 'previous_rank': old[0], 'timestamp': detected_at}
+                for book_id, old in previous.items() if book_id not in current
+            ]
+        self.state.lists[list_name] = current
+        return events
+
+
+class WebhookSink:
+    """把每個榜單的事件以一個 JSON 陣列 POST 到 url；失敗只記錄，不中斷爬取"""
+
+    def __init__(self, url, timeout=DEFAULT_WEBHOOK_TIMEOUT, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._pending = []
+
+    def write_many(self, events):
+        self._pending += events
+
+    def flush(self):
+        if not self._pending:
+            return
+        try:
+            response = self.session.post(self.url, json=self._pending, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.error(f"送出 {len(self._pending)} 筆事件到 webhook 失敗: {str(e)}")
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self.session.close()
+
+
+class ChangeStream:
+    """每個榜單解析後比較狀態並輸出事件，每 snapshot_every 個榜單保存一次狀態"""
+
+    def __init__(self, detector, sinks, snapshot_every=1):
+        self.detector = detector
+        self.sinks = sinks
+        self.snapshot_every = max(snapshot_every, 1)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._unsaved = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """依 config['change_events'] 建立，未啟用時回傳 None"""
+        config = config or {}
+        events_config = config.get('change_events') or {}
+        if not events_config.get('enabled'):
+            return None
+        base_dir = config.get('base_dir', 'data')
+        state = RankingState(events_config.get('state') or os.path.join(base_dir, 'ranking_state.json'))
+        detector = ChangeDetector(
+            state,
+            rank_threshold=events_config.get('rank_threshold', DEFAULT_RANK_THRESHOLD),
+            top_n=events_config.get('top_n', DEFAULT_TOP_N),
+            min_list_ratio=events_config.get('min_list_ratio', DEFAULT_MIN_LIST_RATIO),
+        )
+        path = events_config.get('path') or os.path.join(base_dir, 'output', 'ranking_events.jsonl')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        sinks = [JsonlSink(path, append=True)]
+        if events_config.get('webhook'):
+            sinks.append(WebhookSink(events_config['webhook'], events_config.get('webhook_timeout', DEFAULT_WEBHOOK_TIMEOUT)))
+        return cls(detector, sinks, events_config.get('snapshot_every', 1))
+
+    def process(self, list_name, entries):
+        """比較一個榜單並輸出事件，回傳事件列表"""
+        events = self.detector.diff(list_name, entries)
+        for sink in self.sinks:
+            sink.write_many(events)
+            sink.flush()
+        self._unsaved += 1
+        if self._unsaved >= self.snapshot_every:
+            self.snapshot()
+        if events:
+            self.logger.info(f"{list_name} 產生 {len(events)} 筆變動事件")
+        return events
+
+    def snapshot(self):
+        self.detector.state.save()
+        self._unsaved = 0
+
+    def close(self):
+        if self._unsaved:
+            self.snapshot()
+        for sink in self.sinks:
+            sink.close()
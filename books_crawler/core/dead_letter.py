@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class DeadLetterList:
+    """重試用盡仍失敗的網址，逐筆附加到 JSONL 檔，之後可取出重新爬取"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        config = config or {}
+        retry_config = config.get('retry') or {}
+        return cls(retry_config.get('dead_letter') or os.path.join(config.get('base_dir', 'data'), 'dead_letters.jsonl'))
+
+    def add(self, url, error, status=None, attempts=1):
+        entry = {
+            'url': url,
+            'status': status,
+            'error': str(error),
+            'attempts': attempts,
+            'failed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def entries(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def pop_all(self, pattern=None, statuses=None):
+        """取出網址含有 pattern 的項目（None 表示全部），其餘項目留在清單中，回傳不重複的網址
+
+        指定 statuses 時只取出狀態碼在其中或沒有狀態碼（連線錯誤、逾時）的項目；
+        404、410 等永久錯誤留在清單中，不會每次都重新爬取。
+        """
+        def wanted(entry):
+            if pattern is not None and pattern not in entry['url']:
+                return False
+            return statuses is None or entry.get('status') is None or entry['status'] in statuses
+
+        with self._lock:
+            entries = self.entries()
+            taken = [entry for entry in entries if wanted(entry)]
+            kept = [entry for entry in entries if not wanted(entry)]
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in kept)
+            os.replace(tmp_path, self.path)
+        return list(dict.fromkeys(entry['url'] for entry in taken))
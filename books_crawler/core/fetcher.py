@@ -0,0 +1,432 @@
+"""抓取引擎：每主機速率預算、重試與併發抓取
+
+``AsyncFetcher`` 以 asyncio 排程併發請求，但請求本身仍由 requests 送出、以
+``run_in_executor`` 交給執行緒池執行，而不是改用 aiohttp/httpx 等非同步客戶端。
+連線池（keep-alive）、HTTP 快取（``CachingAdapter``）、錄製與重播（``ReplayAdapter``）
+都是 requests 的 transport adapter，``read_until`` 的串流截斷也依賴 requests 的回應物件；
+改用非同步客戶端必須重寫這整層。併發數由 ``fetch.concurrency`` 決定（預設 4），
+執行緒數等於併發數，實際的請求頻率仍由每主機速率預算限制。
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from .http_cache import build_cached_response, partial_key
+from .metrics import BACKOFF_SECONDS, DEAD_LETTERS, METRICS, RETRIES, SLEEP_SECONDS
+
+# 預設與舊版 random.uniform(1, 3) 的平均間隔相同：每台主機每 2 秒一個請求
+DEFAULT_RATE = 0.5
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 10
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+# 自適應速率（AIMD）：回應正常時每次加 increase，壅塞（429/503、過慢）時乘上 decrease；
+# 未設定 max_rate 時最多只回升到預設的禮貌速率
+DEFAULT_MAX_RATE = DEFAULT_RATE
+DEFAULT_MIN_RATE = 0.05
+DEFAULT_INCREASE = 0.02
+DEFAULT_DECREASE = 0.5
+DEFAULT_SLOW_LATENCY = 5.0
+THROTTLE_STATUSES = {429, 503}
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 120.0
+# 重試次數上限為 min_retries + 請求數 × budget_ratio，避免網站異常時重試放大流量
+DEFAULT_BUDGET_RATIO = 0.2
+DEFAULT_MIN_RETRIES = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 600
+
+FetchResult = namedtuple('FetchResult', ['url', 'response', 'error'])
+
+
+def read_until(response, markers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """逐塊讀取串流回應，依序找到所有位元組標記後停止下載
+
+    回應內容截斷在最後一個標記的結尾，之後的內容不再傳輸；找不到標記時讀完整個回應。
+    提前停止時連線會被關閉而不放回連線池。
+    """
+    buffer = bytearray()
+    index = 0
+    position = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            buffer += chunk
+            while index < len(markers):
+                # 從上次搜尋的位置往回退一個標記長度，避免漏掉跨區塊的標記
+                found = buffer.find(markers[index], max(position - len(markers[index]), 0))
+                if found < 0:
+                    position = len(buffer)
+                    break
+                position = found + len(markers[index])
+                index += 1
+            if index == len(markers):
+                del buffer[position:]
+                break
+    finally:
+        response.close()
+    response._content = bytes(buffer)
+    response._content_consumed = True
+    return response
+
+
+def polite_wait(rate_limiter, url):
+    """向速率限制預約一次請求，回傳需要等待的秒數並記錄在指標中"""
+    wait = rate_limiter.reserve(url)
+    if wait > 0:
+        METRICS.inc(SLEEP_SECONDS, wait, host=urlparse(url).netloc)
+    return wait
+
+
+class TokenBucket:
+    """單一主機的 token bucket 速率預算"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """預約一個 token，回傳發送請求前需要等待的秒數"""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate):
+        """調整速率，已累積或預約的 token 依舊速率結算"""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def pause(self, seconds):
+        """下一個請求至少等待 seconds 秒（Retry-After）"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class HostRateLimiter:
+    """依主機分開計算的速率預算，books.com.tw 與 chimingpublishing.com 各自獨立
+
+    adaptive 為 dict 時啟用 AIMD：以設定的速率為起點，回應正常就逐步加速到 max_rate，
+    遇到 429/503 或回應時間超過 slow_latency 就乘上 decrease 降速（不低於 min_rate）。
+    不論是否啟用，Retry-After 都會讓該主機暫停指定的秒數。
+    """
+
+    def __init__(self, rates=None, default_rate=DEFAULT_RATE, adaptive=None):
+        self.rates = dict(rates or {})
+        self.default_rate = self.rates.pop('default', default_rate)
+        self.adaptive = dict(adaptive) if adaptive and adaptive.get('enabled', True) else None
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        fetch_config = (config or {}).get('fetch') or {}
+        return cls(fetch_config.get('rate_limits'), adaptive=fetch_config.get('adaptive'))
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                rate = self.rates.get(host, self.default_rate)
+                self._buckets[host] = TokenBucket(rate)
+            return self._buckets[host]
+
+    def reserve(self, url):
+        """為 url 所屬主機預約一次請求，回傳需要等待的秒數"""
+        return self.bucket(urlparse(url).netloc).reserve()
+
+    def rate(self, url):
+        return self.bucket(urlparse(url).netloc).rate
+
+    def observe(self, url, latency, status=None, retry_after=None):
+        """依一次請求的結果調整該主機的速率；status 為 None 表示連線錯誤"""
+        bucket = self.bucket(urlparse(url).netloc)
+        if retry_after:
+            bucket.pause(retry_after)
+        if not self.adaptive:
+            return
+
+        congested = status in THROTTLE_STATUSES or retry_after or (
+            status is not None and latency > self.adaptive.get('slow_latency', DEFAULT_SLOW_LATENCY)
+        )
+        if congested:
+            rate = max(bucket.rate * self.adaptive.get('decrease', DEFAULT_DECREASE),
+                       self.adaptive.get('min_rate', DEFAULT_MIN_RATE))
+        elif status is not None and status < 400:
+            rate = min(bucket.rate + self.adaptive.get('increase', DEFAULT_INCREASE),
+                       self.adaptive.get('max_rate', DEFAULT_MAX_RATE))
+        else:
+            return
+        if rate != bucket.rate:
+            bucket.set_rate(rate)
+
+
+def parse_retry_after(response):
+    """解析 Retry-After（秒數或 HTTP 日期），回傳秒數或 None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class RetryPolicy:
+    """暫時性錯誤的重試規則：加上隨機抖動的指數退避，並以重試預算限制總重試次數"""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, budget_ratio=DEFAULT_BUDGET_RATIO,
+                 min_retries=DEFAULT_MIN_RETRIES):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        retry_config = (config or {}).get('retry') or {}
+        return cls(**{
+            key: retry_config[key]
+            for key in ('max_attempts', 'base_delay', 'max_delay', 'budget_ratio', 'min_retries')
+            if key in retry_config
+        })
+
+    @staticmethod
+    def is_transient(error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code in RETRY_STATUSES
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def allow_retry(self, attempt):
+        """第 attempt 次嘗試失敗後是否還能重試，允許時會消耗一次預算"""
+        if attempt >= self.max_attempts:
+            return False
+        with self._lock:
+            if self.retries >= self.min_retries + self.requests * self.budget_ratio:
+                return False
+            self.retries += 1
+            return True
+
+    def backoff(self, attempt, retry_after=None):
+        """第 attempt 次失敗後的等待秒數（full jitter），不少於 Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0)
+
+
+class AsyncFetcher:
+    """以 asyncio 併發抓取多個 URL，受併發上限與主機速率預算限制"""
+
+    def __init__(self, session, headers=None, rate_limiter=None,
+                 concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, logger=None,
+                 retry_policy=None, dead_letters=None, sleep=time.sleep, product_ids=None, http_cache=None):
+        self.session = session
+        self.headers = headers or {}
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1)
+        self.dead_letters = dead_letters
+        self.sleep = sleep
+        # 啟用探索時，每個成功抓取的頁面中出現的書籍 ID 都加入全域集合
+        self.product_ids = product_ids
+        # 新鮮的快取在送出請求前就直接回傳；快取 adapter 不保存串流回應，只下載到 stop_markers 的內容由這裡另外快取
+        self.http_cache = http_cache
+
+    @classmethod
+    def from_config(cls, session, headers, config=None, logger=None, rate_limiter=None, **kwargs):
+        fetch_config = (config or {}).get('fetch') or {}
+        return cls(
+            session,
+            headers,
+            rate_limiter=rate_limiter or HostRateLimiter.from_config(config),
+            concurrency=fetch_config.get('concurrency', DEFAULT_CONCURRENCY),
+            timeout=fetch_config.get('timeout', DEFAULT_TIMEOUT),
+            logger=logger,
+            retry_policy=RetryPolicy.from_config(config),
+            **kwargs
+        )
+
+    def fetch(self, url, stop_markers=None):
+        """在速率預算內抓取 url，暫時性錯誤以退避重試
+
+        每次請求的結果回饋給速率限制。重試用盡或預算不足時把網址記入 dead letter
+        並拋出最後一次的例外。快取中仍新鮮的回應直接回傳，不等待也不回饋給速率限制。
+        """
+        response = self._cached(url, stop_markers)
+        if response is not None:
+            return self._harvest(response)
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            attempt += 1
+            self.sleep(polite_wait(self.rate_limiter, url))
+            self.retry_policy.record_request()
+            started = time.perf_counter()
+            try:
+                response = self.get(url, stop_markers)
+            except Exception as e:
+                error_response = getattr(e, 'response', None)
+                status = getattr(error_response, 'status_code', None)
+                retry_after = parse_retry_after(error_response)
+                self.rate_limiter.observe(url, time.perf_counter() - started, status, retry_after)
+
+                if self.retry_policy.is_transient(e) and self.retry_policy.allow_retry(attempt):
+                    delay = self.retry_policy.backoff(attempt, retry_after)
+                    METRICS.inc(RETRIES, host=host, reason=status or type(e).__name__)
+                    METRICS.inc(BACKOFF_SECONDS, delay, host=host)
+                    self.logger.warning(f"第 {attempt} 次抓取失敗，{delay:.1f} 秒後重試: {url}, 錯誤: {str(e)}")
+                    self.sleep(delay)
+                    continue
+
+                if self.dead_letters is not None:
+                    METRICS.inc(DEAD_LETTERS, host=host)
+                    self.dead_letters.add(url, e, status, attempt)
+                raise
+            self.rate_limiter.observe(url, time.perf_counter() - started, response.status_code)
+            return self._harvest(response)
+
+    def _harvest(self, response):
+        if self.product_ids is not None:
+            self.product_ids.add_from_content(response.content)
+        return response
+
+    def _cached(self, url, stop_markers=None):
+        """快取中仍新鮮的回應，沒有時回傳 None；截斷的內容以 partial_key 保存"""
+        if not self.http_cache:
+            return None
+        cached = self.http_cache.lookup(partial_key(url, stop_markers) if stop_markers else url)
+        if not cached or not cached[2]:
+            return None
+        self.http_cache.count('hits')
+        return build_cached_response(url, cached[0], cached[1])
+
+    def get(self, url, stop_markers=None):
+        """抓取單一 URL；指定 stop_markers 時以串流讀取，找到所有標記後即停止下載"""
+        host = urlparse(url).netloc
+        started = time.perf_counter()
+        try:
+            if stop_markers:
+                response = self._get_until(url, stop_markers)
+            else:
+                response = self.session.get(url, headers=self.headers, timeout=self.timeout)
+        except Exception:
+            METRICS.record_fetch(host, time.perf_counter() - started)
+            raise
+
+        size = len(response.content) if response.status_code < 400 or not stop_markers else 0
+        METRICS.record_fetch(host, time.perf_counter() - started, response.status_code, size)
+        response.raise_for_status()
+        return response
+
+    def _get_until(self, url, stop_markers):
+        """串流下載到 stop_markers 為止；有快取時截斷後的內容以 partial_key 保存
+
+        過期的截斷內容以條件式請求重新驗證，304 時沿用快取的內容。
+        """
+        key = partial_key(url, stop_markers) if self.http_cache else None
+        cached = self.http_cache.lookup(key) if key else None
+        headers = dict(self.headers)
+        if cached:
+            if 'ETag' in cached[0]:
+                headers['If-None-Match'] = cached[0]['ETag']
+            if 'Last-Modified' in cached[0]:
+                headers['If-Modified-Since'] = cached[0]['Last-Modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        if response.status_code == 304 and cached:
+            response.close()
+            self.http_cache.count('revalidated')
+            self.http_cache.refresh(key)
+            return build_cached_response(url, cached[0], cached[1])
+        if key:
+            self.http_cache.count('misses')
+        if response.status_code >= 400:
+            response.close()
+            return response
+        read_until(response, stop_markers)
+        if key and response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self.http_cache.store(key, response.headers, response.content)
+        return response
+
+    async def _fetch(self, url, semaphore, executor, stop_markers=None):
+        """抓取單一 URL，requests 的阻塞呼叫與等待交給執行緒池"""
+        loop = asyncio.get_event_loop()
+        async with semaphore:
+            try:
+                response = await loop.run_in_executor(executor, partial(self.fetch, url, stop_markers))
+                return FetchResult(url, response, None)
+            except Exception as e:
+                self.logger.error(f"獲取頁面失敗: {url}, 錯誤: {str(e)}")
+                return FetchResult(url, None, e)
+
+    async def _new_semaphore(self):
+        return asyncio.Semaphore(self.concurrency)
+
+    def iter_fetch(self, urls, stop_markers=None):
+        """批次抓取 urls，依完成順序逐一回傳 FetchResult
+
+        stop_markers 為依序出現的位元組標記，指定時每個頁面只下載到最後一個標記為止。
+        """
+        urls = list(urls)
+        if not urls:
+            return
+
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending = set()
+        try:
+            # Python 3.10 以前的 Semaphore 在建立時綁定 get_event_loop()，須在新的 loop 中執行時建立
+            semaphore = loop.run_until_complete(self._new_semaphore())
+            pending = {
+                loop.create_task(self._fetch(url, semaphore, executor, stop_markers)) for url in urls
+            }
+            while pending:
+                done, pending = loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            # 呼叫端提前停止迭代時取消尚未完成的請求
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            executor.shutdown(wait=True)
+            loop.close()
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+CrawlUnit = namedtuple('CrawlUnit', ['category', 'page', 'url', 'attempts'])
+
+
+class CrawlFrontier:
+    """持久化的爬取進度，以 (分類, 頁數) 為單位記錄 pending / in_flight / done / failed
+
+    程序中斷時 in_flight 的單位會在下次 recover() 時回到 pending，
+    已完成的單位不會重抓。crawl_id 標記同一輪爬取，用於命名輸出檔案。
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS units (
+                category TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (category, page)
+            );
+            CREATE INDEX IF NOT EXISTS idx_units_state ON units (state);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+        self._conn.commit()
+
+    @property
+    def crawl_id(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'crawl_id'").fetchone()
+        return row[0] if row else None
+
+    def reset(self):
+        """清空所有單位並開始新一輪爬取"""
+        crawl_id = datetime.now().strftime('%Y%m%d_%H%M')
+        with self._conn:
+            self._conn.execute('DELETE FROM units')
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('crawl_id', ?)", (crawl_id,))
+        return crawl_id
+
+    def has_unfinished(self):
+        """是否還有待處理、處理中或可重試的單位"""
+        row = self._conn.execute(
+            'SELECT COUNT(*) FROM units WHERE state IN (?, ?) OR (state = ? AND attempts < ?)',
+            (PENDING, IN_FLIGHT, FAILED, self.max_attempts)
+        ).fetchone()
+        return row[0] > 0
+
+    def recover(self):
+        """中斷後恢復：處理中的單位與未超過重試上限的失敗單位回到 pending"""
+        with self._conn:
+            cursor = self._conn.execute(
+                'UPDATE units SET state = ?, updated_at = ? WHERE state = ? OR (state = ? AND attempts < ?)',
+                (PENDING, time.time(), IN_FLIGHT, FAILED, self.max_attempts)
+            )
+        return cursor.rowcount
+
+    def add(self, category, page, url):
+        """加入新的單位，已存在的單位維持原狀態"""
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO units (category, page, url, state, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (category, page, url, PENDING, time.time())
+            )
+
+    def add_many(self, units):
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO units (category, page, url, state, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(category, page, url, PENDING, now) for category, page, url in units]
+            )
+
+    def claim(self, limit=1):
+        """領取最多 limit 個 pending 單位並標記為 in_flight"""
+        with self._conn:
+            rows = self._conn.execute(
+                'SELECT category, page, url, attempts FROM units WHERE state = ? ORDER BY rowid LIMIT ?',
+                (PENDING, limit)
+            ).fetchall()
+            self._conn.executemany(
+                'UPDATE units SET state = ?, attempts = attempts + 1, updated_at = ? WHERE category = ? AND page = ?',
+                [(IN_FLIGHT, time.time(), category, page) for category, page, _, _ in rows]
+            )
+        return [CrawlUnit(category, page, url, attempts + 1) for category, page, url, attempts in rows]
+
+    def _set_state(self, category, page, state):
+        with self._conn:
+            self._conn.execute(
+                'UPDATE units SET state = ?, updated_at = ? WHERE category = ? AND page = ?',
+                (state, time.time(), category, page)
+            )
+
+    def mark_done(self, category, page):
+        self._set_state(category, page, DONE)
+
+    def mark_failed(self, category, page):
+        self._set_state(category, page, FAILED)
+
+    def counts(self):
+        """各狀態的單位數量"""
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        counts.update(self._conn.execute('SELECT state, COUNT(*) FROM units GROUP BY state').fetchall())
+        return counts
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,155 @@
+"""HTML 解析後端
+
+所有擷取邏輯只使用下列共同介面，因此可以在不同後端之間切換：
+
+- ``find(name, attrs=None, string=None, class_=None, **kwargs)`` / ``find_all(...)``
+- ``.text``、``.string``、``get_text(strip=False)``
+- ``node['attr']``、``node.get('attr')``
+
+``html.parser`` 直接使用 BeautifulSoup；``lxml`` 以 lxml.html 建樹，
+並把查詢轉成預先編譯的 XPath，速度快上數倍。未安裝 lxml 時自動退回 ``html.parser``。
+"""
+import logging
+from functools import lru_cache
+from bs4 import BeautifulSoup
+
+from .metrics import METRICS, SOUP_SECONDS
+
+try:
+    import lxml.html
+    from lxml import etree
+    _text_nodes = etree.XPath('.//text()')
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    lxml = None
+
+DEFAULT_BACKEND = 'html.parser'
+BACKENDS = ('html.parser', 'lxml')
+
+logger = logging.getLogger(__name__)
+
+
+def available_backends():
+    """回傳目前環境可用的解析後端"""
+    return [backend for backend in BACKENDS if backend != 'lxml' or lxml is not None]
+
+
+def make_soup(content, backend=DEFAULT_BACKEND):
+    """以指定後端解析 HTML，content 可以是 str 或 bytes"""
+    if backend == 'lxml':
+        if lxml is not None:
+            with METRICS.timer(SOUP_SECONDS, backend=backend):
+                return LxmlNode.from_content(content)
+        logger.warning("未安裝 lxml，改用 html.parser")
+    elif backend != 'html.parser':
+        raise ValueError(f"不支援的解析後端: {backend}")
+    with METRICS.timer(SOUP_SECONDS, backend='html.parser'):
+        return BeautifulSoup(content, 'html.parser')
+
+
+def _class_predicate(class_name):
+    # 與 BeautifulSoup 相同：單一 class 比對其中一個值，含空白時比對完整字串
+    if ' ' in class_name:
+        return "normalize-space(@class)=$class_"
+    return "contains(concat(' ', normalize-space(@class), ' '), concat(' ', $class_, ' '))"
+
+
+@lru_cache(maxsize=256)
+def _compile_query(names, class_name, attr_names):
+    """依查詢條件組出 XPath 並快取編譯結果"""
+    if not names:
+        step = '*'
+    elif len(names) == 1:
+        step = names[0]
+    else:
+        step = '*[' + ' or '.join(f'self::{name}' for name in names) + ']'
+
+    predicates = []
+    if class_name:
+        predicates.append(_class_predicate(class_name))
+    for index, attr_name in enumerate(attr_names):
+        predicates.append(f'@{attr_name}=$attr{index}')
+
+    expression = './/' + step + ''.join(f'[{p}]' for p in predicates)
+    return etree.XPath(expression)
+
+
+class LxmlNode:
+    """以 lxml 元素實作 BeautifulSoup 查詢介面的子集"""
+
+    __slots__ = ('element',)
+
+    _parser = None
+
+    def __init__(self, element):
+        self.element = element
+
+    @classmethod
+    def from_content(cls, content):
+        if isinstance(content, bytes):
+            if cls._parser is None:
+                cls._parser = lxml.html.HTMLParser(encoding='utf-8')
+            parser = cls._parser
+        else:
+            parser = None
+        if not content or not content.strip():
+            content = '<html></html>'
+            parser = None
+        return cls(lxml.html.document_fromstring(content, parser=parser))
+
+    @property
+    def name(self):
+        return self.element.tag
+
+    @property
+    def text(self):
+        return ''.join(_text_nodes(self.element))
+
+    @property
+    def string(self):
+        if len(self.element):
+            return None
+        return self.element.text
+
+    def get_text(self, strip=False):
+        texts = _text_nodes(self.element)
+        if strip:
+            return ''.join(text.strip() for text in texts if text.strip())
+        return ''.join(texts)
+
+    def get(self, key, default=None):
+        return self.element.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.element.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __repr__(self):
+        return f'<LxmlNode {self.element.tag}>'
+
+    def find_all(self, name=None, attrs=None, string=None, class_=None, **kwargs):
+        if isinstance(name, str):
+            names = (name,)
+        else:
+            names = tuple(name or ())
+
+        attrs = dict(attrs or {})
+        attrs.update(kwargs)
+        attr_names = tuple(sorted(attrs))
+        variables = {f'attr{index}': attrs[key] for index, key in enumerate(attr_names)}
+        if class_:
+            variables['class_'] = class_
+
+        query = _compile_query(names, class_, attr_names)
+        nodes = [LxmlNode(element) for element in query(self.element, **variables)]
+        if string is not None:
+            if callable(string):
+                nodes = [node for node in nodes if string(node.string)]
+            else:
+                nodes = [node for node in nodes if node.string == string]
+        return nodes
+
+    def find(self, name=None, attrs=None, string=None, class_=None, **kwargs):
+        nodes = self.find_all(name, attrs=attrs, string=string, class_=class_, **kwargs)
+        return nodes[0] if nodes else None
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# 只保留重新驗證與解碼需要的標頭，body 已由 requests 解壓縮
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+DEFAULT_MAX_SIZE_MB = 500
+
+
+class HttpCache:
+    """磁碟上的 HTTP 回應快取：body 各自存檔，索引與 LRU 資訊存 SQLite
+
+    ttl 規則依序以正規表示式比對 URL，第一個符合的規則決定新鮮期限（秒）；
+    沒有符合的規則時使用 default_ttl。過期的項目會以條件式請求重新驗證。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_SIZE_MB * 1024 * 1024, ttl_rules=None, default_ttl=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_rules = [(re.compile(rule['pattern']), rule['seconds']) for rule in ttl_rules or []]
+        self.default_ttl = default_ttl
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)')
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """依 config['cache'] 建立快取，未啟用時回傳 None"""
+        cache_config = (config or {}).get('cache') or {}
+        if not cache_config.get('enabled'):
+            return None
+        return cls(
+            _cache_dir(config),
+            max_bytes=int(cache_config.get('max_size_mb', DEFAULT_MAX_SIZE_MB) * 1024 * 1024),
+            ttl_rules=cache_config.get('ttl'),
+            default_ttl=cache_config.get('default_ttl', 0)
+        )
+
+    def ttl_for(self, url):
+        for pattern, seconds in self.ttl_rules:
+            if pattern.search(url):
+                return seconds
+        return self.default_ttl
+
+    def _body_path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """回傳 (headers, body, is_fresh)，沒有快取時回傳 None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT headers, stored_at FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+            if not row:
+                return None
+            try:
+                with open(self._body_path(url), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._conn.commit()
+                return None
+            now = time.time()
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+
+        headers, stored_at = json.loads(row[0]), row[1]
+        return headers, body, now - stored_at < self.ttl_for(url)
+
+    def store(self, url, headers, body):
+        """寫入或覆蓋快取項目，超過容量時依 LRU 淘汰"""
+        path = self._body_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        stored_headers = {key: headers[key] for key in STORED_HEADERS if key in headers}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (url, headers, size, stored_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (url, json.dumps(stored_headers), len(body), now, now)
+            )
+            self._conn.commit()
+            self.stats['stored'] += 1
+            self._evict()
+
+    def refresh(self, url):
+        """304 之後重設新鮮期限"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE entries SET stored_at = ?, last_access = ? WHERE url = ?', (now, now, url)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute(
+            'SELECT url, size FROM entries ORDER BY last_access'
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+            total -= size
+            self.stats['evicted'] += 1
+        self._conn.commit()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def summary(self):
+        stats = self.stats
+        requests_total = stats['hits'] + stats['revalidated'] + stats['misses']
+        hit_rate = (stats['hits'] + stats['revalidated']) / requests_total if requests_total else 0
+        return (
+            f"HTTP 快取: 命中 {stats['hits']}，304 重新驗證 {stats['revalidated']}，"
+            f"未命中 {stats['misses']}，命中率 {hit_rate:.1%}，"
+            f"寫入 {stats['stored']}，淘汰 {stats['evicted']}"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def partial_key(url, stop_markers):
+    """只下載到 stop_markers 為止的回應在快取中的鍵；不同標記的截斷內容分開保存"""
+    digest = hashlib.sha1(b'\0'.join(stop_markers)).hexdigest()[:12]
+    return f'{url}#until={digest}'
+
+
+def build_cached_response(url, headers, body, request=None):
+    """由快取內容建立 requests 的 Response，from_cache 為 True"""
+    response = Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response.request = request
+    response._content = body
+    response._content_consumed = True
+    response.from_cache = True
+    return response
+
+
+class CachingAdapter(BaseAdapter):
+    """掛在 requests.Session 上的快取層，包裝實際送出請求的 adapter"""
+
+    def __init__(self, cache, adapter=None):
+        super().__init__()
+        self.cache = cache
+        self.adapter = adapter or HTTPAdapter()
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return self.adapter.send(request, **kwargs)
+
+        url = request.url
+        cached = self.cache.lookup(url)
+        if cached:
+            headers, body, is_fresh = cached
+            if is_fresh:
+                self.cache.count('hits')
+                return self._build_response(request, headers, body)
+            if 'ETag' in headers:
+                request.headers['If-None-Match'] = headers['ETag']
+            if 'Last-Modified' in headers:
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        response = self.adapter.send(request, **kwargs)
+
+        if response.status_code == 304 and cached:
+            self.cache.count('revalidated')
+            self.cache.refresh(url)
+            response.close()
+            return self._build_response(request, cached[0], cached[1])
+
+        if kwargs.get('stream'):
+            # 串流請求可能只讀取部分內容，由抓取引擎以 partial_key 保存、重新驗證與計數截斷後的內容
+            return response
+        self.cache.count('misses')
+        cache_control = response.headers.get('Cache-Control', '')
+        if response.status_code == 200 and 'no-store' not in cache_control:
+            self.cache.store(url, response.headers, response.content)
+        return response
+
+    def _build_response(self, request, headers, body):
+        response = build_cached_response(request.url, headers, body, request)
+        response.connection = self
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def _cache_dir(config):
+    cache_config = config.get('cache') or {}
+    return cache_config.get('dir') or os.path.join(config.get('base_dir', 'data'), 'http_cache')
@@ -0,0 +1,218 @@
+"""JavaScript 物件字面值解析
+
+Chiming 的排行走勢以 Highcharts 設定寫在 ``<script>`` 中，例如
+``series: [{name: "博客來", data: [[Date.UTC(2024, 9, 1), 3]]}]``。
+這裡以單次掃描的遞迴下降解析器直接讀取字面值：鍵可不加引號、字串可用單引號、
+允許結尾逗號與註解，``Date.UTC(年, 月, 日)`` 轉成 ``YYYY-MM-DD`` 字串（月份從 0 起算）。
+字串內容原樣保留，不做任何正規表示式改寫。
+"""
+import re
+
+_WHITESPACE = ' \t\r\n\u00a0\ufeff'
+_NUMBER_START = frozenset('+-0123456789.')
+_NUMBER_CHARS = frozenset('+-0123456789.eExXabcdefABCDEF')
+_IDENTIFIER_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$.')
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+_KEYWORDS = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+
+def _date_utc(year, month=0, day=1, *_):
+    return f'{int(year)}-{int(month) + 1:02d}-{int(day):02d}'
+
+
+CALLS = {
+    'Date.UTC': _date_utc,
+}
+
+
+class JsLiteralParser:
+    """從 text 的 pos 位置解析一個字面值，解析後 pos 停在字面值之後"""
+
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+
+    def error(self, message):
+        return ValueError(f"{message}（位置 {self.pos}）")
+
+    def _skip(self):
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char in _WHITESPACE:
+                self.pos += 1
+            elif text.startswith('//', self.pos):
+                end = text.find('\n', self.pos)
+                self.pos = len(text) if end < 0 else end + 1
+            elif text.startswith('/*', self.pos):
+                end = text.find('*/', self.pos + 2)
+                if end < 0:
+                    raise self.error("註解未結束")
+                self.pos = end + 2
+            else:
+                break
+
+    def _peek(self):
+        self._skip()
+        if self.pos >= len(self.text):
+            raise self.error("字面值未結束")
+        return self.text[self.pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise self.error(f"預期 {char!r}，實際為 {self.text[self.pos]!r}")
+        self.pos += 1
+
+    def parse(self):
+        char = self._peek()
+        if char == '[':
+            return self._array()
+        if char == '{':
+            return self._object()
+        if char in '"\'':
+            return self._string()
+        if char in _NUMBER_START:
+            return self._number()
+        if char in _IDENTIFIER_CHARS:
+            return self._identifier_value()
+        raise self.error(f"無法解析的字元 {char!r}")
+
+    def _array(self):
+        self.pos += 1
+        items = []
+        while self._peek() != ']':
+            items.append(self.parse())
+            if self._peek() == ',':
+                self.pos += 1
+            elif self.text[self.pos] != ']':
+                raise self.error("陣列元素之間缺少逗號")
+        self.pos += 1
+        return items
+
+    def _object(self):
+        self.pos += 1
+        result = {}
+        while self._peek() != '}':
+            char = self.text[self.pos]
+            if char in '"\'':
+                key = self._string()
+            elif char in _NUMBER_START:
+                key = str(self._number())
+            else:
+                key = self._identifier()
+            self._expect(':')
+            result[key] = self.parse()
+            if self._peek() == ',':
+                self.pos += 1
+            elif self.text[self.pos] != '}':
+                raise self.error("物件成員之間缺少逗號")
+        self.pos += 1
+        return result
+
+    def _string(self):
+        text = self.text
+        quote = text[self.pos]
+        self.pos += 1
+        parts = []
+        start = self.pos
+        while True:
+            end = self.pos
+            while end < len(text) and text[end] != quote and text[end] != '\\':
+                end += 1
+            if end >= len(text):
+                self.pos = start
+                raise self.error("字串未結束")
+            parts.append(text[self.pos:end])
+            if text[end] == quote:
+                self.pos = end + 1
+                return ''.join(parts)
+            escaped = text[end + 1:end + 2]
+            if escaped == 'u':
+                parts.append(chr(int(text[end + 2:end + 6], 16)))
+                self.pos = end + 6
+            elif escaped == '\n':
+                # 行尾的反斜線為續行
+                self.pos = end + 2
+            else:
+                parts.append(_ESCAPES.get(escaped, escaped))
+                self.pos = end + 2
+
+    def _number(self):
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] in _NUMBER_CHARS:
+            self.pos += 1
+        token = self.text[start:self.pos]
+        try:
+            if token.lower().startswith(('0x', '-0x', '+0x')):
+                return int(token, 16)
+            if any(char in token for char in '.eE'):
+                return float(token)
+            return int(token)
+        except ValueError:
+            self.pos = start
+            raise self.error(f"無效的數字 {token!r}")
+
+    def _identifier(self):
+        self._skip()
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] in _IDENTIFIER_CHARS:
+            self.pos += 1
+        if start == self.pos:
+            raise self.error("預期識別字")
+        return self.text[start:self.pos]
+
+    def _identifier_value(self):
+        start = self.pos
+        name = self._identifier()
+        if name in _KEYWORDS:
+            return _KEYWORDS[name]
+        if name in CALLS and self._peek() == '(':
+            self.pos += 1
+            args = []
+            while self._peek() != ')':
+                args.append(self.parse())
+                if self._peek() == ',':
+                    self.pos += 1
+            self.pos += 1
+            return CALLS[name](*args)
+        self.pos = start
+        raise self.error(f"不支援的識別字 {name!r}")
+
+
+def parse_literal(text, pos=0):
+    """解析 text 中從 pos 開始的一個字面值"""
+    return JsLiteralParser(text, pos).parse()
+
+
+_SCRIPT_RE = re.compile(r'<script\b[^>]*>(.*?)(?:</script\s*>|$)', re.S | re.I)
+
+
+def _script_blocks(text):
+    """頁面中各個 ``<script>`` 的內容；沒有 script 標籤時視為整段都是 JavaScript"""
+    blocks = [match.group(1) for match in _SCRIPT_RE.finditer(text)]
+    return blocks if blocks else [text]
+
+
+def find_property(text, name, accept=None):
+    """在 ``<script>`` 中找到 ``name:`` 屬性並解析其值，找不到時回傳 None
+
+    鍵可加引號（``"name":``）。無法解析或 accept(value) 為假的候選（例如註解中或其他
+    script 裡同名的屬性）略過，繼續找下一個；所有候選都無法解析時拋出最後一個 ValueError。
+    每個值只在所屬的 script 內解析，不會讀到其他 script。
+    """
+    pattern = re.compile(r'(?:(?<![\w$])' + re.escape(name) + r'|(["\'])' + re.escape(name) + r'\1)\s*:')
+    error = None
+    parsed = False
+    for block in _script_blocks(text):
+        for match in pattern.finditer(block):
+            try:
+                value = parse_literal(block, match.end())
+            except ValueError as e:
+                error = e
+                continue
+            parsed = True
+            if accept is None or accept(value):
+                return value
+    if error is not None and not parsed:
+        raise error
+    return None
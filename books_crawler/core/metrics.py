@@ -0,0 +1,257 @@
+"""爬取過程的效能指標
+
+整個程序共用一個 ``METRICS``：抓取延遲、收到的位元組數、HTTP 狀態碼、
+各頁面版型的解析時間、產生的紀錄數與禮貌等待時間。指標可用 Prometheus
+文字格式寫入 textfile（給 node_exporter 收集）或由內建的 HTTP 端點提供，
+執行結束時 ``summary()`` 產生摘要，用來判斷瓶頸在網路、解析還是速率限制。
+
+解析子程序中記錄的指標以 ``snapshot()`` 帶回主程序後 ``merge()``。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+PREFIX = 'books_crawler'
+
+FETCH_SECONDS = 'fetch_seconds'
+RESPONSE_BYTES = 'response_bytes'
+HTTP_RESPONSES = 'http_responses'
+SOUP_SECONDS = 'soup_seconds'
+PARSE_SECONDS = 'parse_seconds'
+RECORDS = 'records'
+SLEEP_SECONDS = 'politeness_sleep_seconds'
+RETRIES = 'retries'
+BACKOFF_SECONDS = 'backoff_sleep_seconds'
+DEAD_LETTERS = 'dead_letters'
+
+HISTOGRAMS = {
+    FETCH_SECONDS: ("每個請求從送出到讀完內容的時間", (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)),
+    SOUP_SECONDS: ("建立解析樹的時間", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)),
+    PARSE_SECONDS: ("從解析樹擷取資料的時間", (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)),
+}
+COUNTERS = {
+    RESPONSE_BYTES: "收到的回應內容位元組數",
+    HTTP_RESPONSES: "依狀態碼統計的回應數，連線錯誤記為 error",
+    RECORDS: "解析出的紀錄數",
+    SLEEP_SECONDS: "為遵守每主機速率限制而等待的秒數",
+    RETRIES: "暫時性錯誤的重試次數",
+    BACKOFF_SECONDS: "重試前退避等待的秒數",
+    DEAD_LETTERS: "重試用盡後記入 dead letter 的網址數",
+}
+
+
+def _label_key(labels):
+    # 標籤值一律轉成字串，狀態碼 200 與 'error' 才能一起排序輸出
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    inner = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                     for name, value in pairs)
+    return '{' + inner + '}'
+
+
+class MetricsRegistry:
+    """執行緒安全的計數器與直方圖集合"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._counters = {}
+            # (名稱, 標籤) -> [各區間計數..., 總和, 次數]
+            self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, _label_key(labels))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_fetch(self, host, seconds, status='error', size=0):
+        self.observe(FETCH_SECONDS, seconds, host=host)
+        self.inc(HTTP_RESPONSES, host=host, status=status)
+        if size:
+            self.inc(RESPONSE_BYTES, size, host=host)
+
+    def record_parse(self, page_type, seconds, records):
+        self.observe(PARSE_SECONDS, seconds, page_type=page_type)
+        self.inc(RECORDS, records, page_type=page_type)
+
+    def snapshot(self):
+        """可跨程序傳遞的目前數值"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {key: list(state) for key, state in self._histograms.items()},
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, state in snapshot['histograms'].items():
+                current = self._histograms.setdefault(key, [0] * len(state))
+                for i, value in enumerate(state):
+                    current[i] += value
+
+    def counter_total(self, name, **match):
+        """名稱相同且標籤符合 match 的計數器總和"""
+        with self._lock:
+            return sum(
+                value for (key_name, key), value in self._counters.items()
+                if key_name == name and all(dict(key).get(k) == str(v) for k, v in match.items())
+            )
+
+    def histogram_totals(self, name):
+        """依標籤回傳 (次數, 總和)"""
+        with self._lock:
+            return {
+                key: (state[-1], state[-2])
+                for (key_name, key), state in self._histograms.items() if key_name == name
+            }
+
+    def render(self):
+        """Prometheus 文字格式"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            full_name = f'{PREFIX}_{name}'
+            lines += [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} histogram']
+            for (key_name, key), state in sorted(snapshot['histograms'].items()):
+                if key_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, state):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+                lines.append(f'{full_name}_bucket{_format_labels(key, [("le", "+Inf")])} {state[-1]}')
+                lines.append(f'{full_name}_sum{_format_labels(key)} {state[-2]}')
+                lines.append(f'{full_name}_count{_format_labels(key)} {state[-1]}')
+        for name, help_text in COUNTERS.items():
+            full_name = f'{PREFIX}_{name}_total'
+            lines += [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} counter']
+            for (key_name, key), value in sorted(snapshot['counters'].items()):
+                if key_name == name:
+                    lines.append(f'{full_name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """寫入 node_exporter textfile collector 使用的 .prom 檔"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """執行結束時的摘要，各項時間加總用來比較網路、解析與等待的比重"""
+        elapsed = time.time() - self.started
+        fetch = self.histogram_totals(FETCH_SECONDS)
+        soup = self.histogram_totals(SOUP_SECONDS)
+        parse = self.histogram_totals(PARSE_SECONDS)
+        requests_count = sum(count for count, _ in fetch.values())
+        fetch_seconds = sum(total for _, total in fetch.values())
+        parse_seconds = sum(total for _, total in soup.values()) + sum(total for _, total in parse.values())
+        sleep_seconds = self.counter_total(SLEEP_SECONDS)
+        backoff_seconds = self.counter_total(BACKOFF_SECONDS)
+
+        lines = [
+            f"執行 {elapsed:.1f} 秒，請求 {requests_count} 次，"
+            f"收到 {self.counter_total(RESPONSE_BYTES) / 1024:.0f} KB，"
+            f"紀錄 {self.counter_total(RECORDS)} 筆",
+            f"累計時間：抓取 {fetch_seconds:.1f} 秒、解析 {parse_seconds:.1f} 秒、"
+            f"禮貌等待 {sleep_seconds:.1f} 秒、重試退避 {backoff_seconds:.1f} 秒",
+        ]
+        retries = self.counter_total(RETRIES)
+        if retries:
+            lines.append(f"重試 {retries} 次，記入 dead letter {self.counter_total(DEAD_LETTERS)} 個網址")
+        for key, (count, total) in sorted(fetch.items()):
+            lines.append(f"  {dict(key)['host']}: {count} 次，平均 {total / count * 1000:.0f} ms")
+        with self._lock:
+            statuses = sorted(
+                (dict(key)['status'], value) for (name, key), value in self._counters.items()
+                if name == HTTP_RESPONSES
+            )
+        if statuses:
+            merged = {}
+            for status, value in statuses:
+                merged[status] = merged.get(status, 0) + value
+            lines.append("  狀態碼: " + "，".join(f"{status}={value}" for status, value in merged.items()))
+        for key, (count, total) in sorted(parse.items()):
+            page_type = dict(key)['page_type']
+            records = self.counter_total(RECORDS, page_type=page_type)
+            lines.append(f"  {page_type}: {count} 頁，平均解析 {total / count * 1000:.1f} ms，{records} 筆")
+        return '\n'.join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """只有 GET /metrics 回傳指標，其他路徑與方法一律 404"""
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/metrics':
+            self._not_found()
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = _not_found
+
+    def log_message(self, format, *args):
+        pass
+
+
+METRICS = MetricsRegistry()
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def start_http_server(port, addr=''):
+    """在背景執行緒提供 /metrics 端點，同一個埠只啟動一次"""
+    with _servers_lock:
+        if port not in _servers:
+            server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            _servers[port] = server
+        return _servers[port]
@@ -0,0 +1,140 @@
+"""排行榜的分區 Parquet 資料集
+
+每次執行的排行榜資料寫成一個小檔，依 ``list=<榜單>/date=<日期>`` 分區
+（Hive 風格，可直接用 pyarrow.dataset / pandas / DuckDB 讀取），
+``compact`` 會把同一分區的小檔合併成一個檔案。需要安裝 pyarrow。
+"""
+import argparse
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from .records import to_int
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    pa = None
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+COMPACTED_PREFIX = 'compacted-'
+
+
+def ranking_schema():
+    return pa.schema([
+        ('rank', pa.int32()),
+        ('book_id', pa.string()),
+        ('title', pa.string()),
+        ('author', pa.string()),
+        ('url', pa.string()),
+        ('img_url', pa.string()),
+        ('discount', pa.int32()),
+        ('price', pa.int32()),
+        ('timestamp', pa.timestamp('s')),
+    ])
+
+
+def _partition_value(value):
+    return str(value).replace('/', '_')
+
+
+class RankingDataset:
+    """以榜單與日期分區的排行榜歷史資料集"""
+
+    def __init__(self, root):
+        if pa is None:
+            raise ImportError("Parquet 輸出需要安裝 pyarrow")
+        self.root = root
+        self.schema = ranking_schema()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def from_config(cls, config):
+        config = config or {}
+        root = (config.get('parquet') or {}).get('root') or os.path.join(config.get('base_dir', 'data'), 'rankings')
+        return cls(root)
+
+    def _to_table(self, rows):
+        columns = {name: [] for name in self.schema.names}
+        for row in rows:
+            columns['rank'].append(to_int(row.get('rank')))
+            columns['discount'].append(to_int(row.get('discount')))
+            columns['price'].append(to_int(row.get('price')))
+            columns['timestamp'].append(datetime.strptime(row['timestamp'], TIMESTAMP_FORMAT))
+            for name in ('book_id', 'title', 'author', 'url', 'img_url'):
+                columns[name].append(row.get(name))
+        return pa.table(columns, schema=self.schema)
+
+    def partition_dir(self, list_name, date):
+        return os.path.join(self.root, f'list={_partition_value(list_name)}', f'date={date}')
+
+    def append(self, list_name, rows):
+        """把一次執行的排行榜寫成所屬分區中的新檔案，回傳檔案路徑"""
+        if not rows:
+            return None
+        table = self._to_table(rows)
+        run_time = datetime.strptime(rows[0]['timestamp'], TIMESTAMP_FORMAT)
+        directory = self.partition_dir(list_name, run_time.strftime('%Y-%m-%d'))
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, f"part-{run_time.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+        return path
+
+    def compact(self, min_files=2):
+        """合併每個分區的小檔，回傳合併過的分區數"""
+        compacted = 0
+        for directory, _, filenames in os.walk(self.root):
+            files = sorted(name for name in filenames if name.endswith('.parquet'))
+            if len(files) < min_files:
+                continue
+            paths = [os.path.join(directory, name) for name in files]
+            table = pa.concat_tables([pq.read_table(path, schema=self.schema) for path in paths])
+            table = table.sort_by([('timestamp', 'ascending'), ('rank', 'ascending')])
+
+            target = os.path.join(directory, f"{COMPACTED_PREFIX}{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(table, f'{target}.tmp')
+            os.replace(f'{target}.tmp', target)
+            for path in paths:
+                os.remove(path)
+            compacted += 1
+            self.logger.info(f"已合併 {directory} 的 {len(paths)} 個檔案")
+        return compacted
+
+    def dataset(self):
+        """以 pyarrow.dataset 開啟整個資料集，分區欄位 list、date 可用於篩選"""
+        return ds.dataset(
+            self.root,
+            format='parquet',
+            schema=self.schema.append(pa.field('list', pa.string())).append(pa.field('date', pa.string())),
+            partitioning='hive'
+        )
+
+    def query(self, list_name=None, book_id=None, columns=None):
+        """讀取符合條件的排行資料，只掃描相關分區"""
+        expression = None
+        if list_name is not None:
+            expression = ds.field('list') == _partition_value(list_name)
+        if book_id is not None:
+            condition = ds.field('book_id') == book_id
+            expression = condition if expression is None else expression & condition
+        return self.dataset().to_table(columns=columns, filter=expression)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排行榜 Parquet 資料集工具")
+    parser.add_argument('command', choices=['compact'])
+    parser.add_argument('--root', default=os.path.join('data', 'rankings'))
+    parser.add_argument('--min-files', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        count = RankingDataset(args.root).compact(min_files=args.min_files)
+        print(f"已合併 {count} 個分區")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .metrics import METRICS
+
+
+def _parse_with_metrics(parse_func, content, kwargs):
+    """在子程序中解析，連同本次解析記錄的指標一起交回主程序"""
+    METRICS.reset()
+    result = parse_func(content, **kwargs)
+    return result, METRICS.snapshot()
+
+
+class ParsePipeline:
+    """抓取與解析分離的管線：抓取交給 AsyncFetcher，解析交給子程序池
+
+    parse_func 必須是模組層級函式，接收原始 bytes 並回傳可序列化的 dict，
+    BeautifulSoup 物件不會跨越程序邊界。max_workers 為 0 時在目前程序內解析。
+    """
+
+    def __init__(self, fetcher, max_workers=None, logger=None):
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+
+    def run(self, urls, parse_func, stop_markers=None, **kwargs):
+        """依解析完成順序回傳 (url, result)，抓取或解析失敗時 result 為 None
+
+        stop_markers 會交給抓取引擎，只下載並解析頁面開頭到最後一個標記為止的部分。
+        """
+        if self.max_workers == 0:
+            yield from self._run_inline(urls, parse_func, stop_markers, **kwargs)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+            for fetch_result in self.fetcher.iter_fetch(urls, stop_markers):
+                if fetch_result.error is not None:
+                    yield fetch_result.url, None
+                    continue
+                future = pool.submit(_parse_with_metrics, parse_func, fetch_result.response.content, kwargs)
+                futures[future] = fetch_result.url
+
+                # 抓取仍在進行時，先交出已經解析完成的結果
+                for future in [f for f in futures if f.done()]:
+                    yield self._result(futures.pop(future), future)
+
+            for future in as_completed(futures):
+                yield self._result(futures[future], future)
+
+    def _run_inline(self, urls, parse_func, stop_markers=None, **kwargs):
+        for fetch_result in self.fetcher.iter_fetch(urls, stop_markers):
+            if fetch_result.error is not None:
+                yield fetch_result.url, None
+                continue
+            try:
+                yield fetch_result.url, parse_func(fetch_result.response.content, **kwargs)
+            except Exception as e:
+                self.logger.error(f"解析頁面失敗: {fetch_result.url}, 錯誤: {str(e)}")
+                yield fetch_result.url, None
+
+    def _result(self, url, future):
+        try:
+            result, snapshot = future.result()
+            METRICS.merge(snapshot)
+            return url, result
+        except Exception as e:
+            self.logger.error(f"解析頁面失敗: {url}, 錯誤: {str(e)}")
+            return url, None
@@ -1,20 +1,74 @@
 import re
 
-class BookInfoParser:
-    patterns = {
-        "title": r"書名：(.+?)(?=，(?:簡體版書名|原文名稱|語言|ISBN|出版社|作者|譯者|出版日期|類別))",
-        "simplified_title": r"簡體版書名：(.+?)(?=，(?:原文名稱|語言|ISBN|出版社|作者|譯者|出版日期|類別))",
-        "original_title": r"原文名稱：([^，]+)",
-        "language": r"語言：([^，]+)",
-        "isbn": r"ISBN：(\d+)",
-        "pages": r"頁數：(\d+)",
-        "publisher": r"出版社：([^，]+)",
-        "author": r"作者：([^，]+)",
-        "translator": r"譯者：([^，]+)",
-        "publication_date": r"出版日期：([\d/]+)",
-        "category": r"類別：([^，]+)"
-    }
+# meta description 的欄位名稱對應輸出欄位
+META_FIELDS = {
+    "書名": "title",
+    "簡體版書名": "simplified_title",
+    "原文名稱": "original_title",
+    "語言": "language",
+    "ISBN": "isbn",
+    "頁數": "pages",
+    "出版社": "publisher",
+    "作者": "author",
+    "譯者": "translator",
+    "出版日期": "publication_date",
+    "類別": "category",
+}
+
+# 可能含逗號的欄位取到下一個欄位為止，其他欄位只取到第一個逗號
+_FREE_TEXT_FIELDS = {"title", "simplified_title"}
+_VALUE_PATTERNS = {
+    "isbn": re.compile(r"\d+"),
+    "pages": re.compile(r"\d+"),
+    "publication_date": re.compile(r"[\d/]+"),
+}
+_SIMPLIFIED_SUFFIX = re.compile(r"【簡體版書名：([^】]+)】")
+
+
+def parse_meta(meta_text):
+    """單次掃描解析「欄位：值，」格式的 meta description
+
+    以「，」切段後逐段判斷：段落開頭是已知欄位名稱時開始新欄位，否則視為前一個欄位的延續，
+    因此書名內的逗號與【簡體版書名：…】不會切斷書名。
+    """
+    if not meta_text:
+        return None
+
+    result = {}
+    key = None
+    for segment in meta_text.split("，"):
+        name, sep, value = segment.partition("：")
+        field = META_FIELDS.get(name) if sep else None
+        if field and field not in result:
+            key = field
+            result[key] = value
+        elif key in _FREE_TEXT_FIELDS:
+            result[key] += "，" + segment
+        else:
+            # 其他欄位的延續段落與重複出現的欄位都略過
+            key = None
+
+    for key in list(result):
+        value = result[key]
+        if key in _VALUE_PATTERNS:
+            value_match = _VALUE_PATTERNS[key].match(value)
+            value = value_match.group() if value_match else ""
+        value = value.strip()
+        if value:
+            result[key] = value
+        else:
+            del result[key]
+
+    if "title" in result:
+        simplified_title_match = _SIMPLIFIED_SUFFIX.search(result["title"])
+        if simplified_title_match:
+            result["simplified_title"] = simplified_title_match.group(1).strip()
+            result["title"] = _SIMPLIFIED_SUFFIX.sub("", result["title"]).strip()
 
+    return result
+
+
+class BookInfoParser:
     def __init__(self, meta_text=None):
         self.meta_text = meta_text
 
@@ -22,23 +76,12 @@ class BookInfoParser:
         self.meta_text = meta_text
 
     def parse_book_info(self):
-        if not self.meta_text:
-            return None
-
-        result = {}
+        return parse_meta(self.meta_text)
 
-        for key, pattern in self.patterns.items():
-            match = re.search(pattern, self.meta_text)
-            if match:
-                result[key] = match.group(1).strip()
-
-        if "title" in result:
-            simplified_title_match = re.search(r"【簡體版書名：([^】]+)】", result["title"])
-            if simplified_title_match:
-                result["simplified_title"] = simplified_title_match.group(1).strip()
-                result["title"] = re.sub(r"【簡體版書名：[^】]+】", "", result["title"]).strip()
-
-        return result
+    @staticmethod
+    def parse_many(meta_texts):
+        """批次解析多筆 meta description，無內容的項目回傳 None"""
+        return [parse_meta(meta_text) for meta_text in meta_texts]
 
     @staticmethod
     def run_tests():
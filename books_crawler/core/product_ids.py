@@ -0,0 +1,265 @@
+"""全站去重的書籍 ID 集合
+
+分類列表每頁約 20 本書，同一本書又會出現在多個分類中；以分類逐頁巡訪找書
+既耗請求也重複。這裡把 sitemap 與所有已抓取頁面（排行榜、列表、書籍頁的
+相關商品）中出現的 ``/products/<ID>`` 收集到一個全域集合，書籍頁面的爬取改由
+不重複的 ID 驅動。
+
+集合以排序、定寬（每個 ID 10 bytes）的檔案保存，查詢時以 mmap 二分搜尋；
+前面加一層 bloom filter，大多數新 ID 不必讀檔即可判定不存在。新增的 ID 先留在
+記憶體，累積 flush_size 筆後與檔案合併排序寫回；寫回時以檔案鎖與其他程序互斥。
+"""
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 沒有 fcntl，只能單一程序寫入
+    fcntl = None
+
+PRODUCT_URL = 'https://www.books.com.tw/products/{}'
+PRODUCT_ID_PATTERN = re.compile(rb'/products/([0-9A-Z]{10})(?![0-9A-Za-z])')
+ID_WIDTH = 10
+BOOK_ID_PATTERN = re.compile(r'[0-9A-Z]{10}$')
+DEFAULT_CAPACITY = 1000000
+DEFAULT_ERROR_RATE = 0.01
+DEFAULT_FLUSH_SIZE = 10000
+
+
+def harvest_ids(content):
+    """從頁面原始內容取出所有書籍 ID（去除重複，保留出現順序）"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return list(dict.fromkeys(match.decode('ascii') for match in PRODUCT_ID_PATTERN.findall(content)))
+
+
+class BloomFilter:
+    """固定大小的 bloom filter，以 blake2b 的兩個 64 位元雜湊做 double hashing"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('ascii'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def save(self, path, count=0):
+        """寫入檔案，count 為寫入時已加入的鍵數，載入時用來確認與資料一致"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(f'{self.capacity} {self.error_rate} {count}\n'.encode('ascii'))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """回傳 (bloom filter, 保存時的鍵數)"""
+        with open(path, 'rb') as f:
+            capacity, error_rate, count = f.readline().split()
+            bloom = cls(int(capacity), float(error_rate))
+            bits = bytearray(f.read())
+        if len(bits) != len(bloom.bits):
+            raise ValueError(f"bloom filter 檔案大小不符: {path}")
+        bloom.bits = bits
+        return bloom, int(count)
+
+
+class ProductIdSet:
+    """排序定寬檔案保存的書籍 ID 集合，可在多個抓取執行緒間共用
+
+    path 為 ID 檔，bloom filter 存在 ``<path>.bloom``；bloom filter 遺失、損毀或
+    ID 數超過容量時由 ID 檔重建（容量加倍）。
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, flush_size=DEFAULT_FLUSH_SIZE):
+        self.path = path
+        self.bloom_path = f'{path}.bloom'
+        self.error_rate = error_rate
+        self.flush_size = flush_size
+        self._lock = threading.RLock()
+        self._pending = set()
+        self._file = None
+        self._map = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._open()
+        self.bloom = self._load_bloom(capacity)
+
+    @classmethod
+    def from_config(cls, config):
+        """依 config['discovery'] 建立集合，未啟用時回傳 None"""
+        config = config or {}
+        discovery_config = config.get('discovery') or {}
+        if not discovery_config.get('enabled'):
+            return None
+        path = discovery_config.get('path') or os.path.join(config.get('base_dir', 'data'), 'product_ids.bin')
+        return cls(
+            path,
+            capacity=discovery_config.get('capacity', DEFAULT_CAPACITY),
+            error_rate=discovery_config.get('error_rate', DEFAULT_ERROR_RATE),
+        )
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % ID_WIDTH:
+            raise ValueError(f"ID 檔大小不是 {ID_WIDTH} 的倍數: {self.path}")
+        # 空檔案無法 mmap
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._stored = size // ID_WIDTH
+
+    def _close_file(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def _load_bloom(self, capacity):
+        try:
+            bloom, count = BloomFilter.load(self.bloom_path)
+            # 寫回 ID 檔後、保存 bloom filter 前中斷時兩者不一致，改由 ID 檔重建
+            if count == self._stored and bloom.capacity >= self._stored:
+                return bloom
+        except (OSError, ValueError):
+            pass
+        return self._rebuild_bloom(max(capacity, self._stored * 2))
+
+    def _rebuild_bloom(self, capacity):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for book_id in self._iter_stored():
+            bloom.add(book_id)
+        return bloom
+
+    def _iter_stored(self):
+        for index in range(self._stored):
+            yield self._stored_at(index)
+
+    def _stored_at(self, index):
+        offset = index * ID_WIDTH
+        return self._map[offset:offset + ID_WIDTH].decode('ascii')
+
+    def _stored_contains(self, book_id):
+        low, high = 0, self._stored
+        while low < high:
+            middle = (low + high) // 2
+            if self._stored_at(middle) < book_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self._stored and self._stored_at(low) == book_id
+
+    def __contains__(self, book_id):
+        with self._lock:
+            if book_id not in self.bloom:
+                return False
+            return book_id in self._pending or self._stored_contains(book_id)
+
+    def __len__(self):
+        return self._stored + len(self._pending)
+
+    def __iter__(self):
+        """先寫回記憶體中的 ID，再依排序逐一回傳
+
+        另外開啟 ID 檔讀取，迭代期間其他執行緒寫回新的 ID 不影響本次迭代。
+        """
+        with self._lock:
+            self.flush()
+            f = open(self.path, 'rb')
+        with f:
+            while True:
+                chunk = f.read(ID_WIDTH * 4096)
+                if not chunk:
+                    break
+                for offset in range(0, len(chunk), ID_WIDTH):
+                    yield chunk[offset:offset + ID_WIDTH].decode('ascii')
+
+    def add(self, book_id):
+        """加入一個 ID，回傳是否為新的 ID"""
+        if not BOOK_ID_PATTERN.match(book_id):
+            raise ValueError(f"書籍 ID 必須是 {ID_WIDTH} 個數字或大寫字母: {book_id!r}")
+        with self._lock:
+            if book_id in self:
+                return False
+            self._pending.add(book_id)
+            self.bloom.add(book_id)
+            if len(self._pending) >= self.flush_size:
+                self.flush()
+            return True
+
+    def add_many(self, book_ids):
+        """加入多個 ID，回傳其中新的 ID 數"""
+        with self._lock:
+            return sum(self.add(book_id) for book_id in book_ids)
+
+    def add_from_content(self, content):
+        """加入頁面原始內容中出現的所有書籍 ID，回傳新的 ID 數"""
+        return self.add_many(harvest_ids(content))
+
+    def flush(self):
+        """把記憶體中的新 ID 與 ID 檔合併排序寫回，並保存 bloom filter
+
+        多個程序可能共用同一個 ID 檔：寫回期間持有 ``<path>.lock`` 的排他鎖，
+        並在鎖內重新讀取目前的 ID 檔再合併，不會覆蓋其他程序寫回的 ID。
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                self._close_file()
+                expected = self._stored
+                self._open()
+                # 其他程序在這段期間寫回過 ID，合併時一併加入 bloom filter
+                changed = self._stored != expected
+                tmp_path = f'{self.path}.tmp'
+                previous = None
+                with open(tmp_path, 'wb') as f:
+                    for book_id in heapq.merge(self._iter_stored(), sorted(self._pending)):
+                        if book_id == previous:
+                            continue
+                        previous = book_id
+                        if changed:
+                            self.bloom.add(book_id)
+                        f.write(book_id.encode('ascii'))
+                self._close_file()
+                os.replace(tmp_path, self.path)
+                self._pending.clear()
+                self._open()
+                if self._stored > self.bloom.capacity:
+                    self.bloom = self._rebuild_bloom(self._stored * 2)
+                self.bloom.save(self.bloom_path, self._stored)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(f'{self.path}.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._close_file()
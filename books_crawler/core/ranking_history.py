@@ -0,0 +1,213 @@
+"""排行榜的差異歷史
+
+每小時的排行榜通常只有少數名次變動，不再每次保存 100 本書的完整快照：
+
+- ``books``：書名、作者、網址、封面等靜態欄位，以 book_id 為鍵只存一份
+- ``runs``：每次執行（榜單, 時間）
+- ``changes``：相對於同一榜單上一次執行有變動的 (book_id, rank, price, discount)，
+  rank 為 NULL 表示該書在這次執行掉出榜單；榜單筆數少於上一次的 min_list_ratio 時視為
+  抓取不完整，缺少的書籍沿用上一次的名次
+
+任一次執行的完整排行由每本書在該次執行之前最後一筆變動重建，
+``(book_id, list, run_id)`` 索引讓單本書的名次走勢不必掃描整份歷史。
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+from .change_events import DEFAULT_MIN_LIST_RATIO
+from .records import to_int
+
+DEFAULT_PATH = os.path.join('data', 'ranking_history.sqlite')
+BOOK_FIELDS = ('title', 'author', 'url', 'img_url')
+
+
+class RankingHistory:
+    """以 SQLite 保存排行榜變動，可重建任一次執行的排行"""
+
+    def __init__(self, path=DEFAULT_PATH, min_list_ratio=DEFAULT_MIN_LIST_RATIO):
+        self.path = path
+        # 榜單筆數少於上一次的 min_list_ratio 時視為抓取不完整，缺少的書籍不記為掉出榜單
+        self.min_list_ratio = min_list_ratio
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS books (
+                book_id TEXT PRIMARY KEY,
+                title TEXT,
+                author TEXT,
+                url TEXT,
+                img_url TEXT
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                list TEXT NOT NULL,
+                run_ts TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_list ON runs (list, run_ts);
+            CREATE TABLE IF NOT EXISTS changes (
+                list TEXT NOT NULL,
+                run_id INTEGER NOT NULL,
+                book_id TEXT NOT NULL,
+                rank INTEGER,
+                price INTEGER,
+                discount INTEGER,
+                PRIMARY KEY (list, run_id, book_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_changes_book ON changes (book_id, list, run_id);
+            CREATE INDEX IF NOT EXISTS idx_changes_latest ON changes (list, book_id, run_id);
+        ''')
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        config = config or {}
+        history_config = config.get('history') or {}
+        path = history_config.get('path') or os.path.join(config.get('base_dir', 'data'), 'ranking_history.sqlite')
+        return cls(path, history_config.get('min_list_ratio', DEFAULT_MIN_LIST_RATIO))
+
+    def _run_id(self, list_name, run_ts=None):
+        """run_ts 當時或之前最近一次執行的 run_id，未指定時為最新一次"""
+        if run_ts is None:
+            row = self._conn.execute(
+                'SELECT run_id FROM runs WHERE list = ? ORDER BY run_ts DESC, run_id DESC LIMIT 1', (list_name,)
+            ).fetchone()
+        else:
+            row = self._conn.execute(
+                'SELECT run_id FROM runs WHERE list = ? AND run_ts <= ? ORDER BY run_ts DESC, run_id DESC LIMIT 1',
+                (list_name, run_ts)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _state(self, list_name, run_id):
+        """各書在 run_id 當時的 (rank, price, discount)，不含已掉出榜單的書"""
+        rows = self._conn.execute('''
+            SELECT c.book_id, c.rank, c.price, c.discount
+            FROM changes c
+            JOIN (
+                SELECT book_id, MAX(run_id) AS run_id FROM changes
+                WHERE list = ? AND run_id <= ? GROUP BY book_id
+            ) latest ON latest.book_id = c.book_id AND latest.run_id = c.run_id
+            WHERE c.list = ? AND c.rank IS NOT NULL
+        ''', (list_name, run_id, list_name)).fetchall()
+        return {book_id: (rank, price, discount) for book_id, rank, price, discount in rows}
+
+    def append(self, list_name, rows):
+        """記錄一次執行，只寫入與上一次執行不同的名次與價格，回傳寫入的變動筆數"""
+        if not rows:
+            return 0
+        run_ts = rows[0]['timestamp']
+        current = {}
+        books = []
+        for row in rows:
+            book_id = row.get('book_id') or row.get('url')
+            if not book_id:
+                continue
+            current[book_id] = (to_int(row.get('rank')), to_int(row.get('price')), to_int(row.get('discount')))
+            books.append((book_id,) + tuple(row.get(name) for name in BOOK_FIELDS))
+
+        previous_run = self._run_id(list_name)
+        previous = self._state(list_name, previous_run) if previous_run is not None else {}
+        with self._conn:
+            # 靜態欄位只保留最新值
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO books (book_id, title, author, url, img_url) VALUES (?, ?, ?, ?, ?)', books
+            )
+            run_id = self._conn.execute(
+                'INSERT INTO runs (list, run_ts, size) VALUES (?, ?, ?)', (list_name, run_ts, len(current))
+            ).lastrowid
+            changes = [
+                (list_name, run_id, book_id) + values
+                for book_id, values in current.items() if previous.get(book_id) != values
+            ]
+            if len(current) >= len(previous) * self.min_list_ratio:
+                changes += [
+                    (list_name, run_id, book_id, None, None, None)
+                    for book_id in previous if book_id not in current
+                ]
+            self._conn.executemany(
+                'INSERT INTO changes (list, run_id, book_id, rank, price, discount) VALUES (?, ?, ?, ?, ?, ?)', changes
+            )
+        return len(changes)
+
+    def snapshot(self, list_name, run_ts=None):
+        """重建 run_ts 當時（未指定時為最新）的排行，欄位與 get_bestsellers 相同"""
+        run_id = self._run_id(list_name, run_ts)
+        if run_id is None:
+            return []
+        timestamp = self._conn.execute('SELECT run_ts FROM runs WHERE run_id = ?', (run_id,)).fetchone()[0]
+        state = self._state(list_name, run_id)
+        books = {}
+        ids = list(state)
+        # SQLite 參數數量有上限，分批查詢
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self._conn.execute(
+                f'SELECT book_id, title, author, url, img_url FROM books WHERE book_id IN ({placeholders})', chunk
+            ):
+                books[row[0]] = dict(zip(BOOK_FIELDS, row[1:]))
+
+        rows = []
+        for book_id, (rank, price, discount) in state.items():
+            rows.append({
+                'rank': rank,
+                'book_id': book_id,
+                **books.get(book_id, {}),
+                'discount': discount,
+                'price': price,
+                'timestamp': timestamp,
+            })
+        return sorted(rows, key=lambda row: row['rank'])
+
+    def trajectory(self, book_id, list_name=None):
+        """單本書的名次變化點 [(榜單, 時間, 名次, 價格)]，名次為 None 表示掉出榜單
+
+        兩個變化點之間的執行名次不變。
+        """
+        query = '''
+            SELECT c.list, r.run_ts, c.rank, c.price FROM changes c
+            JOIN runs r ON r.run_id = c.run_id
+            WHERE c.book_id = ?
+        '''
+        params = [book_id]
+        if list_name is not None:
+            query += ' AND c.list = ?'
+            params.append(list_name)
+        return self._conn.execute(query + ' ORDER BY c.list, r.run_ts', params).fetchall()
+
+    def runs(self, list_name):
+        return [row[0] for row in self._conn.execute(
+            'SELECT run_ts FROM runs WHERE list = ? ORDER BY run_ts', (list_name,)
+        )]
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排行榜差異歷史查詢")
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    snapshot_parser = subparsers.add_parser('snapshot', help="重建某次執行的排行")
+    snapshot_parser.add_argument('list')
+    snapshot_parser.add_argument('--at', help="時間（%%Y-%%m-%%d %%H:%%M:%%S），預設為最新一次")
+    trajectory_parser = subparsers.add_parser('trajectory', help="單本書的名次走勢")
+    trajectory_parser.add_argument('book_id')
+    trajectory_parser.add_argument('--list')
+    args = parser.parse_args()
+
+    history = RankingHistory(args.path)
+    try:
+        if args.command == 'snapshot':
+            print(json.dumps(history.snapshot(args.list, args.at), ensure_ascii=False, indent=2))
+        else:
+            for list_name, run_ts, rank, price in history.trajectory(args.book_id, args.list):
+                print(f"{list_name}\t{run_ts}\t{'-' if rank is None else rank}\t{'' if price is None else price}")
+    finally:
+        history.close()
+
+if __name__ == "__main__":
+    main()
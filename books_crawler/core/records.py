@@ -0,0 +1,175 @@
+"""精簡的紀錄型別
+
+列表頁、排行榜與書籍頁面的紀錄原本是自由格式的 dict：每筆都重複保存欄位名稱，
+價格、折扣與頁數也以字串保存。整棵分類樹的列表爬取會同時持有數百萬筆紀錄，
+這裡改用 ``__slots__`` 類別：
+
+- 固定欄位，不為每筆紀錄建立 ``__dict__``
+- 數值欄位在建立時轉成整數一次，'未知' 等無法轉換的值為 None
+- 出版社、類別、作者等重複率高的字串以 ``sys.intern`` 共用
+
+紀錄實作唯讀的 Mapping 介面（值為 None 的欄位視為不存在），原本使用 dict 的
+``record.get()``、``{**record}``、``csv.DictWriter`` 都不需修改；JSON 輸出以
+``json_default`` 轉換。大量紀錄可用 ``write_jsonl``、``write_csv`` 與 ``to_arrow``
+直接依欄位順序序列化，不必先轉成 dict。
+"""
+import csv
+import json
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    pa = None
+
+
+def to_int(value):
+    """把 '79'、'300' 轉成整數，'未知' 或空值轉成 None"""
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Record(Mapping):
+    """固定欄位的紀錄，子類別以 FIELDS 定義欄位順序"""
+
+    __slots__ = ()
+    FIELDS = ()
+    INTEGER_FIELDS = frozenset()
+    INTERNED_FIELDS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 依欄位順序一次取出所有值，序列化時不必逐欄呼叫 getattr
+        cls._values = attrgetter(*cls.FIELDS) if len(cls.FIELDS) > 1 else (lambda record: (getattr(record, cls.FIELDS[0]),))
+
+    def __init__(self, **values):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, None)
+        for name, value in values.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """由解析結果的 dict 建立，忽略不屬於此型別的欄位；data 為 None 時回傳 None"""
+        if data is None:
+            return None
+        record = cls()
+        for name in cls.FIELDS:
+            if name in data:
+                record[name] = data[name]
+        return record
+
+    def __setitem__(self, name, value):
+        if name not in self.FIELDS:
+            raise KeyError(name)
+        if name in self.INTEGER_FIELDS:
+            value = to_int(value)
+        elif name in self.INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+
+    def __getitem__(self, name):
+        if name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                return value
+        raise KeyError(name)
+
+    def __iter__(self):
+        return (name for name in self.FIELDS if getattr(self, name) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()!r})'
+
+    def to_dict(self):
+        return {name: value for name, value in zip(self.FIELDS, self._values(self)) if value is not None}
+
+    def to_row(self):
+        """依 FIELDS 順序的值，缺少的欄位為 None"""
+        return self._values(self)
+
+
+class ListItem(Record):
+    """列表頁的一本書"""
+
+    __slots__ = ('product_name', 'url')
+    FIELDS = __slots__
+
+
+class RankingEntry(Record):
+    """排行榜的一筆排名"""
+
+    __slots__ = ('rank', 'title', 'url', 'book_id', 'author', 'img_url', 'discount', 'price', 'timestamp')
+    FIELDS = __slots__
+    INTEGER_FIELDS = frozenset({'rank', 'discount', 'price'})
+    # 同一次執行的所有排名時間相同，作者也常在多個榜單重複出現
+    INTERNED_FIELDS = frozenset({'author', 'timestamp'})
+
+
+class BookDetail(Record):
+    """書籍頁面 meta description 的欄位（ISBN 為識別碼，保留字串）"""
+
+    __slots__ = (
+        'title', 'simplified_title', 'original_title', 'language', 'isbn', 'pages',
+        'publisher', 'author', 'translator', 'publication_date', 'category',
+    )
+    FIELDS = __slots__
+    INTEGER_FIELDS = frozenset({'pages'})
+    INTERNED_FIELDS = frozenset({'language', 'publisher', 'category', 'publication_date'})
+
+
+def json_default(value):
+    """json.dump 的 default，讓紀錄可直接序列化"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"無法序列化 {type(value).__name__}")
+
+
+def write_jsonl(records, file, record_type):
+    """每行一筆 JSON，每筆都包含 record_type 的所有欄位（缺少的欄位為 null），回傳筆數"""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    fields = record_type.FIELDS
+    values = record_type._values
+    count = 0
+    for record in records:
+        file.write(encode(dict(zip(fields, values(record)))))
+        file.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(records, file, record_type, header=True):
+    """以 record_type.FIELDS 為標頭寫入 CSV，缺少的欄位留空，回傳筆數"""
+    writer = csv.writer(file)
+    if header:
+        writer.writerow(record_type.FIELDS)
+    rows = [record_type._values(record) for record in records]
+    writer.writerows(rows)
+    return len(rows)
+
+
+def arrow_schema(record_type):
+    return pa.schema([
+        (name, pa.int32() if name in record_type.INTEGER_FIELDS else pa.string())
+        for name in record_type.FIELDS
+    ])
+
+
+def to_arrow(records, record_type):
+    """轉成 pyarrow.Table（需安裝 pyarrow），逐欄建立而不經過 dict"""
+    if pa is None:
+        raise ImportError("Arrow 輸出需要安裝 pyarrow")
+    records = list(records)
+    return pa.table(
+        {name: [getattr(record, name) for record in records] for name in record_type.FIELDS},
+        schema=arrow_schema(record_type)
+    )
@@ -0,0 +1,158 @@
+"""離線錄製／重播的 HTTP 傳輸層
+
+``ReplayAdapter`` 掛在 ``requests.Session`` 上取代真正的網路連線：
+
+- ``replay``：從 ``FixtureStore`` 回傳儲存的回應，找不到時回傳 404
+- ``record``：照常連線，並把每個回應存入 ``FixtureStore`` 供之後重播
+
+``FixtureStore`` 先以完整網址比對錄製的回應，再依序比對 routes（正規表示式 → 檔案），
+因此同一個範例頁面可以代表所有分頁或所有書籍。``sample_store()`` 使用 repo 內附的
+``網頁html範例/`` 頁面，讓所有爬蟲不需網路即可完整執行。
+
+    replay:
+      dir: "data/fixtures"   # 省略時使用內附範例頁面
+      mode: "replay"         # 或 record
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SAMPLE_DIR = os.path.join(REPO_DIR, '網頁html範例')
+FIXTURE_DIR = os.path.join(REPO_DIR, 'tests', 'fixtures')
+
+HTML_HEADERS = {'Content-Type': 'text/html; charset=utf-8'}
+
+# 內附範例頁面對應的網址，依序比對
+SAMPLE_ROUTES = [
+    (r'/web/sys_(tdrntb|pretopb|saletopb|newtopb)/', os.path.join(SAMPLE_DIR, '排行榜ＡＢ版範例20241024.html')),
+    (r'/web/sys_sublistb/', os.path.join(SAMPLE_DIR, '書籍分類目錄20241024.html')),
+    (r'/web/(books_bmidm_1302|sys_bbotm/)', os.path.join(SAMPLE_DIR, '書籍頁面列表Ｂ版.html')),
+    (r'/web/books_bmidm_', os.path.join(SAMPLE_DIR, '書籍頁面列表範例.html')),
+    (r'/products/', os.path.join(SAMPLE_DIR, '書籍單頁B版.html')),
+    (r'chimingpublishing\.com/monster/book/', os.path.join(FIXTURE_DIR, 'chiming_book.html')),
+]
+
+INDEX_FILE = 'index.json'
+
+
+class FixtureStore:
+    """錄製的回應與網址路由，儲存在目錄下的 index.json"""
+
+    def __init__(self, root, routes=None):
+        self.root = root
+        self.responses = {}
+        self.routes = []
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._load()
+        for pattern, path in routes or []:
+            self.add_route(pattern, path)
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        self.responses = index.get('responses', {})
+        for route in index.get('routes', []):
+            self.add_route(route['pattern'], os.path.join(self.root, route['file']))
+
+    def add_route(self, pattern, path, status=200, headers=None):
+        self.routes.append((re.compile(pattern), {'path': path, 'status': status, 'headers': headers or HTML_HEADERS}))
+
+    def _read(self, path):
+        if path not in self._bodies:
+            with open(path, 'rb') as f:
+                self._bodies[path] = f.read()
+        return self._bodies[path]
+
+    def lookup(self, url):
+        """回傳 (status, headers, body)，找不到時回傳 None"""
+        with self._lock:
+            entry = self.responses.get(url)
+            if entry:
+                path = os.path.join(self.root, entry['file'])
+                return entry['status'], entry['headers'], self._read(path)
+            for pattern, route in self.routes:
+                if pattern.search(url):
+                    return route['status'], route['headers'], self._read(route['path'])
+        return None
+
+    def record(self, url, status, headers, body):
+        filename = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.body'
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(self.root, filename), 'wb') as f:
+                f.write(body)
+            self.responses[url] = {'file': filename, 'status': status, 'headers': headers}
+            self._save()
+
+    def _save(self):
+        index = {'responses': self.responses}
+        tmp_path = os.path.join(self.root, INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.root, INDEX_FILE))
+
+
+def sample_store():
+    """以 repo 內附範例頁面建立的重播資料"""
+    return FixtureStore(SAMPLE_DIR, routes=SAMPLE_ROUTES)
+
+
+class ReplayAdapter(BaseAdapter):
+    """以 FixtureStore 重播或錄製回應的 transport adapter"""
+
+    def __init__(self, store, mode='replay', adapter=None):
+        super().__init__()
+        if mode not in ('replay', 'record'):
+            raise ValueError(f"不支援的重播模式: {mode}")
+        self.store = store
+        self.mode = mode
+        self.adapter = adapter or (HTTPAdapter() if mode == 'record' else None)
+        self.served = 0
+
+    @classmethod
+    def from_config(cls, config):
+        replay_config = (config or {}).get('replay') or {}
+        store = FixtureStore(replay_config['dir']) if replay_config.get('dir') else sample_store()
+        return cls(store, replay_config.get('mode', 'replay'))
+
+    def send(self, request, **kwargs):
+        if self.mode == 'record':
+            response = self.adapter.send(request, **kwargs)
+            self.store.record(request.url, response.status_code, dict(response.headers), response.content)
+            return response
+
+        self.served += 1
+        fixture = self.store.lookup(request.url)
+        if fixture is None:
+            return self._build_response(request, 404, {}, b'')
+        status, headers, body = fixture
+        return self._build_response(request, status, headers, body)
+
+    def _build_response(self, request, status, headers, body):
+        response = Response()
+        response.status_code = status
+        response.reason = 'OK' if status < 400 else 'Not Found'
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        if self.adapter:
+            self.adapter.close()
@@ -0,0 +1,155 @@
+"""多個爬蟲共用的執行資源
+
+一次執行中爬取多個榜單或頁面時，共用同一個 ``SharedResources``：
+連線池（keep-alive，避免每個榜單重新建立 TCP/TLS 連線）、每主機速率預算、預先載入的
+User-Agent 池與日誌設定都只建立一次，再注入各個爬蟲實例。
+
+requests 不支援 HTTP/2，同一主機的請求改以 keep-alive 連線池重複使用連線。
+設定 ``config['replay']`` 時改由 ``ReplayAdapter`` 提供回應，不需網路即可執行。
+"""
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+import yaml
+from fake_useragent import UserAgent
+from requests.adapters import HTTPAdapter
+
+from .dead_letter import DeadLetterList
+from .fetcher import DEFAULT_CONCURRENCY, HostRateLimiter
+from .http_cache import CachingAdapter, HttpCache
+from .metrics import METRICS, start_http_server
+from .product_ids import ProductIdSet
+from .replay import ReplayAdapter
+
+DEFAULT_CONFIG_PATH = 'books_crawler/config/config.yaml'
+DEFAULT_UA_POOL_SIZE = 20
+# 抓取時已有每主機速率限制，不需要過大的連線池
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_LOG_LEVEL = 'INFO'
+# 連線與 User-Agent 載入細節在 DEBUG 時會淹沒爬蟲本身的日誌
+QUIET_LOGGERS = ('urllib3', 'fake_useragent', 'filelock', 'asyncio')
+
+# UserAgent() 會讀取整份瀏覽器資料，每次 .random 也要過濾整份清單，
+# 因此整個程序只預先抽出一次 User-Agent 池
+_user_agents = []
+_ua_lock = threading.Lock()
+
+
+def read_yaml_config(file_path):
+    """讀取 YAML 配置文件"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return yaml.safe_load(file)
+    except Exception as e:
+        logging.error(f"讀取配置文件時出錯: {str(e)}")
+        return None
+
+
+def _load_user_agents(size):
+    with _ua_lock:
+        if len(_user_agents) < size:
+            ua = UserAgent()
+            _user_agents.extend(ua.random for _ in range(size - len(_user_agents)))
+        return _user_agents[:size]
+
+
+def build_session(config=None, http_cache=None):
+    """建立共用連線池的 session，有啟用快取時在連線池外包一層快取
+
+    config['replay'] 為 replay 模式時不建立連線池，record 模式則在連線池外錄製回應。
+    """
+    config = config or {}
+    fetch_config = config.get('fetch') or {}
+    pool_size = max(fetch_config.get('concurrency', DEFAULT_CONCURRENCY), 1)
+    replay = ReplayAdapter.from_config(config) if config.get('replay') else None
+    if replay and replay.mode == 'replay':
+        adapter = replay
+    else:
+        adapter = HTTPAdapter(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=pool_size)
+        if http_cache:
+            adapter = CachingAdapter(http_cache, adapter)
+        if replay:
+            replay.adapter = adapter
+            adapter = replay
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _no_sleep(seconds):
+    pass
+
+
+class SharedResources:
+    """一次執行中所有爬蟲共用的 session、速率限制、User-Agent 池、dead letter 清單、書籍 ID 集合與日誌設定
+
+    sleep 為禮貌等待與重試退避使用的函式，未指定時重播模式不等待，其餘使用 time.sleep。
+    rate_limiter 未指定時依 config['fetch'] 建立；共用同一個實例的爬蟲共用主機速率預算。
+    """
+
+    def __init__(self, config=None, log_name='books_crawler', ua_pool_size=DEFAULT_UA_POOL_SIZE, sleep=None,
+                 rate_limiter=None):
+        self.config = config or {}
+        self.base_dir = self.config.get('base_dir', 'data')
+        self.log_dir = os.path.join(self.base_dir, 'logs')
+        self.output_dir = os.path.join(self.base_dir, 'output')
+        for dir_path in [self.log_dir, self.output_dir]:
+            os.makedirs(dir_path, exist_ok=True)
+
+        self.setup_logging(log_name)
+        self.setup_metrics()
+        self.http_cache = HttpCache.from_config(self.config)
+        self.dead_letters = DeadLetterList.from_config(self.config)
+        self.product_ids = ProductIdSet.from_config(self.config)
+        self.session = build_session(self.config, self.http_cache)
+        self.rate_limiter = rate_limiter or HostRateLimiter.from_config(self.config)
+        self.sleep = sleep or (_no_sleep if self.replaying else time.sleep)
+        self.ua_pool_size = ua_pool_size
+        self._user_agents = None
+
+    @property
+    def replaying(self):
+        replay_config = self.config.get('replay')
+        return bool(replay_config) and replay_config.get('mode', 'replay') == 'replay'
+
+    def setup_logging(self, log_name):
+        """設定日誌檔，等級由 config['log_level'] 決定；第三方套件只記錄 WARNING 以上"""
+        timestamp = datetime.now().strftime('%Y%m%d')
+        logging.basicConfig(
+            filename=os.path.join(self.log_dir, f'{log_name}_{timestamp}.log'),
+            level=self.config.get('log_level', DEFAULT_LOG_LEVEL),
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    def setup_metrics(self):
+        """依 config['metrics'] 啟動 /metrics 端點並決定 textfile 位置"""
+        metrics_config = self.config.get('metrics') or {}
+        self.metrics_textfile = metrics_config.get('textfile')
+        if metrics_config.get('port'):
+            start_http_server(metrics_config['port'])
+
+    def export_metrics(self):
+        if self.metrics_textfile:
+            METRICS.write_textfile(self.metrics_textfile)
+
+    def user_agent(self):
+        """從預先載入的 User-Agent 池隨機取一個"""
+        if self._user_agents is None:
+            self._user_agents = _load_user_agents(self.ua_pool_size)
+        return random.choice(self._user_agents)
+
+    def close(self):
+        self.session.close()
+        if self.http_cache is not None:
+            self.http_cache.close()
+        if self.product_ids is not None:
+            self.product_ids.close()
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_MAX_AGE_DAYS = 7
+
+
+class SeenIndex:
+    """以 book_id 為鍵的持久化索引，記錄書籍頁面最後抓取時間與解析結果的雜湊"""
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE_DAYS * 86400):
+        self.path = path
+        self.max_age = max_age
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS seen (
+                book_id TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                changed_at REAL NOT NULL,
+                content_hash TEXT NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """依 config['seen_index'] 建立索引，未啟用時回傳 None"""
+        config = config or {}
+        index_config = config.get('seen_index') or {}
+        if not index_config.get('enabled'):
+            return None
+        path = index_config.get('path') or os.path.join(config.get('base_dir', 'data'), 'seen_index.sqlite')
+        return cls(path, max_age=index_config.get('max_age_days', DEFAULT_MAX_AGE_DAYS) * 86400)
+
+    @staticmethod
+    def content_hash(data):
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def filter_stale(self, book_ids, now=None):
+        """回傳從未抓取過或超過 max_age 的 book_id，保留輸入順序並去除重複"""
+        now = time.time() if now is None else now
+        unique_ids = list(dict.fromkeys(book_ids))
+        fetched = {}
+        # SQLite 參數數量有上限，分批查詢
+        for start in range(0, len(unique_ids), 500):
+            chunk = unique_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            fetched.update(self._conn.execute(
+                f'SELECT book_id, fetched_at FROM seen WHERE book_id IN ({placeholders})', chunk
+            ).fetchall())
+        return [
+            book_id for book_id in unique_ids
+            if book_id not in fetched or now - fetched[book_id] >= self.max_age
+        ]
+
+    def record(self, book_id, data, now=None):
+        """記錄一次抓取結果，回傳內容是否與上次不同（新書也視為不同）"""
+        now = time.time() if now is None else now
+        new_hash = self.content_hash(data)
+        row = self._conn.execute('SELECT content_hash FROM seen WHERE book_id = ?', (book_id,)).fetchone()
+        changed = row is None or row[0] != new_hash
+        if changed:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO seen (book_id, fetched_at, changed_at, content_hash) VALUES (?, ?, ?, ?)',
+                (book_id, now, now, new_hash)
+            )
+        else:
+            self._conn.execute('UPDATE seen SET fetched_at = ? WHERE book_id = ?', (now, book_id))
+        self._conn.commit()
+        return changed
+
+    def close(self):
+        self._conn.close()
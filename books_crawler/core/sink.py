@@ -0,0 +1,140 @@
+import abc
+import csv
+import json
+import logging
+import os
+
+from .records import json_default
+
+DEFAULT_BATCH_SIZE = 100
+
+
+class RecordSink(abc.ABC):
+    """逐筆寫入紀錄的串流輸出
+
+    紀錄先寫入 ``<path>.part``，每 batch_size 筆 flush 並 fsync 一次；
+    正常 close 時才原子地改名為最終檔名。中途發生例外或程序中斷時，
+    已 fsync 的紀錄會留在 .part 檔中，不會整批遺失。
+
+    append 為 True 時直接附加到最終檔案（用於可續傳的爬取），不做改名。
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, append=False):
+        self.path = path
+        self.append = append
+        self.part_path = path if append else f'{path}.part'
+        self.batch_size = batch_size
+        self.count = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._pending = 0
+        self._file = self._open(self.part_path, 'a' if append else 'w')
+
+    def _open(self, path, mode):
+        return open(path, mode, encoding='utf-8', newline='')
+
+    @abc.abstractmethod
+    def _write_record(self, record):
+        """把一筆紀錄寫入 self._file"""
+
+    def write(self, record):
+        self._write_record(record)
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """把目前批次寫入磁碟"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        """寫完最後一批並改名為最終檔名"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if not self.append:
+            os.replace(self.part_path, self.path)
+        self.logger.info(f"已寫入 {self.count} 筆紀錄到 {self.path}")
+
+    def abort(self):
+        """保留 .part 檔中已寫入的紀錄，不改名"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self.logger.warning(f"寫入中斷，已保存 {self.count} 筆紀錄於 {self.part_path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class JsonlSink(RecordSink):
+    """每行一筆 JSON 紀錄"""
+
+    def _write_record(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=json_default))
+        self._file.write('\n')
+
+
+class CsvSink(RecordSink):
+    """固定標頭的 CSV 輸出
+
+    未指定 fieldnames 時以第一筆紀錄的欄位為標頭；之後紀錄多出的欄位不寫入並記錄警告
+    （每個欄位只警告一次），缺少的欄位留空，確保整個檔案的欄位一致。需要完整欄位時
+    應事先指定 fieldnames，或先收集所有紀錄再以 save_data 取欄位聯集輸出。
+    """
+
+    def __init__(self, path, fieldnames=None, batch_size=DEFAULT_BATCH_SIZE, append=False):
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self._writer = None
+        self._dropped = set()
+        self._has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if self._has_header and not self.fieldnames:
+            # 附加時沿用既有檔案的標頭
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                self.fieldnames = next(csv.reader(f))
+        super().__init__(path, batch_size, append)
+
+    def _open(self, path, mode):
+        return open(path, mode, encoding='utf-8' if self._has_header else 'utf-8-sig', newline='')
+
+    def _write_record(self, record):
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(record.keys())
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=self.fieldnames, restval='', extrasaction='ignore'
+            )
+            if not self._has_header:
+                self._writer.writeheader()
+        dropped = [key for key in record if key not in self._writer.fieldnames and key not in self._dropped]
+        if dropped:
+            self._dropped.update(dropped)
+            self.logger.warning(f"{self.path} 的標頭沒有欄位 {dropped}，這些欄位不會寫入")
+        self._writer.writerow(record)
+
+
+SINKS = {
+    'jsonl': JsonlSink,
+    'csv': CsvSink,
+}
+
+
+def open_sink(path, format_type='jsonl', **kwargs):
+    """依格式建立串流輸出"""
+    if format_type not in SINKS:
+        raise ValueError(f"不支援的輸出格式: {format_type}")
+    return SINKS[format_type](path, **kwargs)
@@ -0,0 +1,438 @@
+"""多台機器共用的爬取任務佇列
+
+任務以租約（lease）方式領取：worker 領取後必須在租約到期前 ack，
+否則任務會回到佇列由其他 worker 重新處理。每次領取有各自的租約憑證，
+任務被重新領取後，原 worker 的 ack/nack 不再生效。加入任務時可指定 key，
+相同 key 的任務只會加入一次。佇列同時提供共用的結果區與跨 worker 的
+每主機速率限制（429/503 與 Retry-After 讓所有 worker 一起暫停該主機），
+兩種後端介面相同：
+
+- ``SQLiteTaskQueue``：單機多程序或測試用
+- ``RedisTaskQueue``：多台機器共用，需要安裝 redis（測試可用 fakeredis）
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from .fetcher import DEFAULT_RATE, THROTTLE_STATUSES
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - 依安裝環境而定
+    redis = None
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# 429/503 沒有 Retry-After 時，所有 worker 暫停該主機的秒數
+DEFAULT_THROTTLE_PAUSE = 30
+
+# lease 為這次領取的租約憑證，ack/nack 時比對
+Task = namedtuple('Task', ['task_id', 'kind', 'payload', 'attempts', 'lease'], defaults=(None,))
+
+
+def _host_interval(url, rates):
+    host = urlparse(url).netloc
+    rate = rates.get(host, rates.get('default', DEFAULT_RATE))
+    return host, 1.0 / rate
+
+
+def _pause_seconds(status, retry_after):
+    """一次請求的結果要讓所有 worker 暫停該主機的秒數，0 表示不暫停"""
+    if retry_after:
+        return retry_after
+    return DEFAULT_THROTTLE_PAUSE if status in THROTTLE_STATUSES else 0
+
+
+class SQLiteTaskQueue:
+    """以 SQLite 實作的任務佇列，多個程序可同時開啟同一個檔案"""
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL,
+                worker TEXT,
+                lease TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, lease_until);
+            CREATE TABLE IF NOT EXISTS task_keys (
+                key TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                host TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            );
+        ''')
+        # 舊版建立的檔案沒有租約憑證欄位
+        if 'lease' not in {row[1] for row in self._conn.execute('PRAGMA table_info(tasks)')}:
+            self._conn.execute('ALTER TABLE tasks ADD COLUMN lease TEXT')
+
+    def put_many(self, kind, payloads, keys=None):
+        """加入任務，回傳實際加入的數量
+
+        keys 與 payloads 一一對應；曾以相同 key 加入過的任務略過，例如第 1 頁的租約過期
+        被重新執行時，不會再次加入第 2~N 頁。
+        """
+        payloads = list(payloads)
+        keys = list(keys) if keys is not None else [None] * len(payloads)
+        added = 0
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            for payload, key in zip(payloads, keys):
+                if key is not None and not self._conn.execute(
+                    'INSERT OR IGNORE INTO task_keys (key) VALUES (?)', (key,)
+                ).rowcount:
+                    continue
+                self._conn.execute(
+                    'INSERT INTO tasks (kind, payload) VALUES (?, ?)',
+                    (kind, json.dumps(payload, ensure_ascii=False))
+                )
+                added += 1
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def put(self, kind, payload):
+        self.put_many(kind, [payload])
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """領取一個待處理或租約已過期的任務，沒有任務時回傳 None
+
+        租約過期且嘗試次數已達上限的任務標記為 failed，不再重新領取。
+        """
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute(
+                "UPDATE tasks SET state = 'failed', lease_until = NULL, worker = NULL, lease = NULL "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = self._conn.execute(
+                '''SELECT id, kind, payload, attempts FROM tasks
+                   WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)
+                   ORDER BY id LIMIT 1''',
+                (now,)
+            ).fetchone()
+            lease = uuid.uuid4().hex
+            if row:
+                self._conn.execute(
+                    "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_until = ?, worker = ?, lease = ? "
+                    "WHERE id = ?",
+                    (now + lease_seconds, worker_id, lease, row[0])
+                )
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        if not row:
+            return None
+        return Task(row[0], row[1], json.loads(row[2]), row[3] + 1, lease)
+
+    def ack(self, task):
+        """完成任務，回傳是否生效；任務已被其他 worker 重新領取時不動作"""
+        return bool(self._conn.execute(
+            'DELETE FROM tasks WHERE id = ? AND lease = ?', (task.task_id, task.lease)
+        ).rowcount)
+
+    def nack(self, task):
+        """處理失敗：未超過重試上限時放回佇列，否則標記為 failed；任務已被重新領取時不動作"""
+        return bool(self._conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_until = NULL, worker = NULL, lease = NULL WHERE id = ? AND lease = ?",
+            (self.max_attempts, task.task_id, task.lease)
+        ).rowcount)
+
+    def push_results(self, kind, records):
+        self._conn.execute('BEGIN IMMEDIATE')
+        self._conn.executemany(
+            'INSERT INTO results (kind, record) VALUES (?, ?)',
+            [(kind, json.dumps(record, ensure_ascii=False)) for record in records]
+        )
+        self._conn.execute('COMMIT')
+
+    def pop_results(self, limit=1000):
+        """取出並刪除最多 limit 筆結果，回傳 (kind, record) 列表"""
+        self._conn.execute('BEGIN IMMEDIATE')
+        rows = self._conn.execute('SELECT id, kind, record FROM results ORDER BY id LIMIT ?', (limit,)).fetchall()
+        if rows:
+            self._conn.execute('DELETE FROM results WHERE id <= ?', (rows[-1][0],))
+        self._conn.execute('COMMIT')
+        return [(kind, json.loads(record)) for _, kind, record in rows]
+
+    def counts(self):
+        counts = {'pending': 0, 'leased': 0, 'failed': 0}
+        counts.update(self._conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall())
+        return counts
+
+    def rate_limiter(self, rates=None):
+        return SQLiteRateLimiter(self._conn, rates)
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteRateLimiter:
+    """所有開啟同一個 SQLite 檔案的 worker 共用的每主機速率限制"""
+
+    def __init__(self, conn, rates=None):
+        self._conn = conn
+        self.rates = dict(rates or {})
+
+    def reserve(self, url):
+        """預約下一個可用的請求時間，回傳需要等待的秒數"""
+        host, interval = _host_interval(url, self.rates)
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        row = self._conn.execute('SELECT next_at FROM rate_limits WHERE host = ?', (host,)).fetchone()
+        start = max(now, row[0] if row else 0)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO rate_limits (host, next_at) VALUES (?, ?)', (host, start + interval)
+        )
+        self._conn.execute('COMMIT')
+        return start - now
+
+    def observe(self, url, latency, status=None, retry_after=None):
+        """429/503 或 Retry-After 時延後該主機的下一個請求時間，所有 worker 一起暫停
+
+        共用速率本身維持固定，不做自適應調整。
+        """
+        pause = _pause_seconds(status, retry_after)
+        if not pause:
+            return
+        host = urlparse(url).netloc
+        self._conn.execute('BEGIN IMMEDIATE')
+        self._conn.execute('INSERT OR IGNORE INTO rate_limits (host, next_at) VALUES (?, 0)', (host,))
+        self._conn.execute(
+            'UPDATE rate_limits SET next_at = MAX(next_at, ?) WHERE host = ?', (time.time() + pause, host)
+        )
+        self._conn.execute('COMMIT')
+
+
+# 收回過期租約、取出任務與建立租約在同一個 Lua script 中完成，worker 在中途當掉也不會遺失任務。
+# 任務雜湊已被刪除（租約過期後才 ack）的 ID 直接略過；嘗試次數已達上限的任務標記為 failed。
+# 任務雜湊的鍵由 prefix 組成而非經由 KEYS 傳入，不支援 Redis Cluster。
+LEASE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+while true do
+    local id = redis.call('LPOP', KEYS[1])
+    if not id then
+        return nil
+    end
+    local key = ARGV[5] .. ':task:' .. id
+    if redis.call('EXISTS', key) == 1 then
+        local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+        if attempts >= tonumber(ARGV[4]) then
+            redis.call('SADD', KEYS[3], id)
+        else
+            redis.call('ZADD', KEYS[2], ARGV[2], id)
+            redis.call('HSET', key, 'worker', ARGV[3], 'lease', ARGV[6])
+            attempts = redis.call('HINCRBY', key, 'attempts', 1)
+            local fields = redis.call('HMGET', key, 'kind', 'payload')
+            return {id, fields[1], fields[2], attempts}
+        end
+    end
+end
+"""
+
+# ack/nack 只在租約憑證相符時生效，租約過期後被其他 worker 重新領取的任務不受影響
+ACK_SCRIPT = """
+local key = ARGV[2] .. ':task:' .. ARGV[1]
+if redis.call('HGET', key, 'lease') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('DEL', key)
+return 1
+"""
+
+NACK_SCRIPT = """
+local key = ARGV[3] .. ':task:' .. ARGV[1]
+if redis.call('HGET', key, 'lease') ~= ARGV[4] then
+    return 0
+end
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('SADD', KEYS[3], ARGV[1])
+else
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# 有 key 的任務以 SADD 判斷是否加入過；ARGV 為 kind、prefix，之後每三個一組 (task_id, key, payload)
+PUT_SCRIPT = """
+local added = 0
+for i = 3, #ARGV, 3 do
+    if ARGV[i + 1] == '' or redis.call('SADD', KEYS[2], ARGV[i + 1]) == 1 then
+        redis.call('HSET', ARGV[2] .. ':task:' .. ARGV[i], 'kind', ARGV[1], 'payload', ARGV[i + 2], 'attempts', 0)
+        redis.call('RPUSH', KEYS[1], ARGV[i])
+        added = added + 1
+    end
+end
+return added
+"""
+
+
+class RedisTaskQueue:
+    """以 Redis 實作的任務佇列，介面與 SQLiteTaskQueue 相同"""
+
+    def __init__(self, client, prefix='books_crawler', max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self._lease_script = client.register_script(LEASE_SCRIPT)
+        self._ack_script = client.register_script(ACK_SCRIPT)
+        self._nack_script = client.register_script(NACK_SCRIPT)
+        self._put_script = client.register_script(PUT_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if redis is None:
+            raise ImportError("Redis 佇列需要安裝 redis")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def put_many(self, kind, payloads, keys=None):
+        payloads = list(payloads)
+        if not payloads:
+            return 0
+        keys = list(keys) if keys is not None else [None] * len(payloads)
+        args = [kind, self.prefix]
+        for payload, key in zip(payloads, keys):
+            args += [uuid.uuid4().hex, key or '', json.dumps(payload, ensure_ascii=False)]
+        return self._put_script(keys=[self._key('pending'), self._key('task_keys')], args=args)
+
+    def put(self, kind, payload):
+        self.put_many(kind, [payload])
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        lease = uuid.uuid4().hex
+        result = self._lease_script(
+            keys=[self._key('pending'), self._key('leases'), self._key('failed')],
+            args=[now, now + lease_seconds, worker_id, self.max_attempts, self.prefix, lease],
+        )
+        if result is None:
+            return None
+        task_id, kind, payload, attempts = [
+            value.decode() if isinstance(value, bytes) else value for value in result
+        ]
+        return Task(task_id, kind, json.loads(payload), int(attempts), lease)
+
+    def ack(self, task):
+        return bool(self._ack_script(keys=[self._key('leases')], args=[task.task_id, self.prefix, task.lease]))
+
+    def nack(self, task):
+        """處理失敗：未超過重試上限時放回佇列，否則標記為 failed；任務已被重新領取時不動作"""
+        return bool(self._nack_script(
+            keys=[self._key('pending'), self._key('leases'), self._key('failed')],
+            args=[task.task_id, self.max_attempts, self.prefix, task.lease],
+        ))
+
+    def push_results(self, kind, records):
+        if not records:
+            return
+        self.client.rpush(self._key('results'), *[
+            json.dumps({'kind': kind, 'record': record}, ensure_ascii=False) for record in records
+        ])
+
+    def pop_results(self, limit=1000):
+        pipe = self.client.pipeline()
+        pipe.lrange(self._key('results'), 0, limit - 1)
+        pipe.ltrim(self._key('results'), limit, -1)
+        items, _ = pipe.execute()
+        results = [json.loads(item) for item in items]
+        return [(item['kind'], item['record']) for item in results]
+
+    def counts(self):
+        return {
+            'pending': self.client.llen(self._key('pending')),
+            'leased': self.client.zcard(self._key('leases')),
+            'failed': self.client.scard(self._key('failed')),
+        }
+
+    def rate_limiter(self, rates=None):
+        return RedisRateLimiter(self.client, self.prefix, rates)
+
+    def close(self):
+        self.client.close()
+
+
+class RedisRateLimiter:
+    """所有連到同一個 Redis 的 worker 共用的每主機速率限制（各機器時鐘需同步）"""
+
+    def __init__(self, client, prefix='books_crawler', rates=None):
+        self.client = client
+        self.prefix = prefix
+        self.rates = dict(rates or {})
+
+    def reserve(self, url):
+        host, interval = _host_interval(url, self.rates)
+        key = f'{self.prefix}:rate:{host}'
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    now = time.time()
+                    start = max(now, float(pipe.get(key) or 0))
+                    pipe.multi()
+                    pipe.set(key, start + interval, ex=max(int(start + interval - now) + 60, 60))
+                    pipe.execute()
+                    return start - now
+                except redis.WatchError:
+                    continue
+
+    def observe(self, url, latency, status=None, retry_after=None):
+        """429/503 或 Retry-After 時延後該主機的下一個請求時間，所有 worker 一起暫停"""
+        pause = _pause_seconds(status, retry_after)
+        if not pause:
+            return
+        key = f'{self.prefix}:rate:{urlparse(url).netloc}'
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    now = time.time()
+                    next_at = max(now + pause, float(pipe.get(key) or 0))
+                    pipe.multi()
+                    pipe.set(key, next_at, ex=int(next_at - now) + 60)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+
+def open_queue(url, **kwargs):
+    """依網址開啟佇列：redis://... 使用 Redis，其他視為 SQLite 檔案路徑"""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisTaskQueue.from_url(url, **kwargs)
+    return SQLiteTaskQueue(url, **kwargs)
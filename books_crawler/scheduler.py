@@ -0,0 +1,175 @@
+"""依排行榜設定中的 frequency 排程爬取
+
+每個榜單依 frequency 決定週期，並以榜單名稱的雜湊值在週期內分配固定的起始偏移，
+讓 ~70 個 daily 榜單分散在一天之中而不是同時發出請求。已在目前週期內爬取過的
+榜單會被略過；同時到期的榜單透過批次抓取引擎併發爬取，共用同一組主機速率預算。
+沒有取得資料的榜單以指數退避重試；新的狀態檔中從未執行過的榜單也依同一個偏移
+分散在第一個小時內，不會在啟動時一起到期。
+
+    python -m books_crawler.scheduler          # 常駐執行
+    python -m books_crawler.scheduler --once   # 只執行目前到期的榜單
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+from .scrapers.bestseller_scraper import BestsellerOutput, BestsellerScraper, iter_bestsellers, read_yaml_config
+
+FREQUENCY_SECONDS = {
+    'hourly': 3600,
+    'daily': 86400,
+    'weekly': 7 * 86400,
+}
+
+MAX_SLEEP_SECONDS = 300
+# 失敗的榜單以指數退避重試：60 秒、120 秒…，最長不超過該榜單的週期
+RETRY_BASE_SECONDS = 60
+# 狀態檔剛建立時，從未執行過的榜單依名稱雜湊分散在這段時間內首次執行
+FIRST_RUN_SPREAD_SECONDS = 3600
+
+
+class BestsellerScheduler:
+    """依 frequency 規劃每個榜單下一次執行時間的排程器"""
+
+    def __init__(self, config, state_path=None, clock=time.time):
+        self.config = config
+        self.jobs = config.get('urls') or []
+        self.clock = clock
+        self.state_path = state_path or os.path.join(config.get('base_dir', 'data'), 'scheduler_state.json')
+        self.logger = logging.getLogger(self.__class__.__name__)
+        state = self._load_state()
+        # 舊版狀態檔只有 {榜單: 上次執行時間}
+        if 'last_runs' not in state:
+            state = {'last_runs': state}
+        self.last_runs = state['last_runs']
+        self.failures = state.get('failures') or {}
+        self.created_at = state.get('created_at') or self.clock()
+        self._scraper = None
+        self._output = None
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.error(f"讀取排程狀態失敗: {str(e)}")
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': self.created_at, 'last_runs': self.last_runs, 'failures': self.failures,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def interval(job):
+        return FREQUENCY_SECONDS.get(job.get('frequency'), FREQUENCY_SECONDS['daily'])
+
+    def offset(self, job):
+        """榜單在週期內的固定起始偏移，由名稱雜湊決定"""
+        digest = hashlib.sha1(job['category'].encode('utf-8')).hexdigest()
+        return int(digest, 16) % self.interval(job)
+
+    def window_start(self, job, now):
+        """目前所在週期的起點"""
+        interval = self.interval(job)
+        offset = self.offset(job)
+        return (now - offset) // interval * interval + offset
+
+    def next_run(self, job, now=None):
+        """榜單下一次應執行的時間
+
+        目前週期尚未執行時為週期起點；從未執行過的榜單為狀態建立後依偏移分散的首次執行時間；
+        上次失敗時不早於退避後的重試時間。
+        """
+        now = self.clock() if now is None else now
+        category = job['category']
+        start = self.window_start(job, now)
+        if category not in self.last_runs:
+            start = max(start, self.created_at + self.offset(job) % FIRST_RUN_SPREAD_SECONDS)
+        elif self.last_runs[category] >= start:
+            return start + self.interval(job)
+        if category in self.failures:
+            start = max(start, self.failures[category]['retry_at'])
+        return start
+
+    def record_failure(self, job, now):
+        """記錄一次失敗，下次重試時間依連續失敗次數指數退避"""
+        failure = self.failures.get(job['category'], {'count': 0})
+        count = failure['count'] + 1
+        delay = min(RETRY_BASE_SECONDS * 2 ** (count - 1), self.interval(job))
+        self.failures[job['category']] = {'count': count, 'retry_at': now + delay}
+        return delay
+
+    def due_jobs(self, now=None):
+        now = self.clock() if now is None else now
+        return [job for job in self.jobs if self.next_run(job, now) <= now]
+
+    def run_due(self, now=None):
+        """併發爬取所有到期的榜單並保存，回傳執行的榜單數"""
+        now = self.clock() if now is None else now
+        due = self.due_jobs(now)
+        if not due:
+            return 0
+
+        if self._scraper is None:
+            self._scraper = BestsellerScraper(None, None, self.config)
+            self._output = BestsellerOutput(self.config)
+        self.logger.info(f"本次到期的榜單: {[job['category'] for job in due]}")
+
+        jobs = {job['category']: job for job in due}
+        for category, bestsellers in iter_bestsellers(due, self.config, scraper=self._scraper):
+            if not bestsellers:
+                # 失敗的榜單不記錄執行時間，退避後重試
+                delay = self.record_failure(jobs[category], now)
+                self.logger.warning(f"{category} 沒有取得資料，{delay} 秒後重試")
+            else:
+                self._output.save(self._scraper, category, bestsellers)
+                self.last_runs[category] = now
+                self.failures.pop(category, None)
+            self._save_state()
+        self._scraper.report_stats()
+        return len(due)
+
+    def seconds_until_next(self, now=None):
+        now = self.clock() if now is None else now
+        if not self.jobs:
+            return MAX_SLEEP_SECONDS
+        next_time = min(self.next_run(job, now) for job in self.jobs)
+        return min(max(next_time - now, 0), MAX_SLEEP_SECONDS)
+
+    def run_forever(self):
+        while True:
+            try:
+                self.run_due()
+            except Exception as e:
+                self.logger.error(f"排程執行失敗: {str(e)}")
+            time.sleep(max(self.seconds_until_next(), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依 frequency 排程爬取排行榜")
+    parser.add_argument('--config', default='books_crawler/config/book_bestseller_scraper_config.yaml')
+    parser.add_argument('--once', action='store_true', help="只執行目前到期的榜單後結束")
+    args = parser.parse_args()
+
+    config = read_yaml_config(args.config)
+    if not config:
+        return
+
+    scheduler = BestsellerScheduler(config)
+    if args.once:
+        scheduler.run_due()
+    else:
+        scheduler.run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,39 @@
 from books_crawler.core.base_scraper import BaseScraper
-import yaml
+from books_crawler.core.change_events import ChangeStream
+from books_crawler.core.database import BookDatabase
+from books_crawler.core.html_backend import DEFAULT_BACKEND, make_soup
+from books_crawler.core.metrics import METRICS
+from books_crawler.core.parquet_store import RankingDataset
+from books_crawler.core.product_ids import PRODUCT_URL
+from books_crawler.core.ranking_history import RankingHistory
+from books_crawler.core.records import RankingEntry
+from books_crawler.core.resources import SharedResources, read_yaml_config
+from books_crawler.scrapers.detail_scraper import BookDetailScraper
 import logging
+import time
 from datetime import datetime
 
 
 class BestsellerScraper(BaseScraper):
-    def __init__(self, category, base_url, config=None):
-        super().__init__(config)
+    def __init__(self, category, base_url, config=None, resources=None):
+        super().__init__(config, resources)
         self.category = category
         self.base_url = base_url
         
-    def _extract_book_id(self, url):
-        """從URL中提取書籍ID"""
-        try:
-            if "products" in url:
-                return url.split("/")[-1].split("?")[0]
-            return None
-        except Exception as e:
-            self.logger.error(f"提取書籍ID時出錯: {str(e)}")
-            return None
-            
     def get_bestsellers(self):
         """爬取暢銷榜資料"""
         soup = self._get_soup(self.base_url)
         if not soup:
             return []
             
+        return self.parse_bestsellers(soup)
+
+    def parse_bestsellers(self, soup):
+        """解析排行榜頁面，兼容Ａ版與Ｂ版"""
         books_data = []
         current_time = datetime.now()
+        started = time.perf_counter()
+        page_type = 'bestseller_b'
         
         try:
             book_items = soup.find_all('li', class_='item')
@@ -35,6 +41,8 @@ class BestsellerScraper(BaseScraper):
             for book in book_items:
                 try:
                     is_type02_bd_a = book.find('div', class_='type02_bd-a')
+                    if is_type02_bd_a:
+                        page_type = 'bestseller_a'
                     book_data = self._parse_type_a(book) if is_type02_bd_a else self._parse_type_b(book)
                     
                     if book_data:
@@ -45,6 +53,7 @@ class BestsellerScraper(BaseScraper):
                     self.logger.error(f"處理單本書籍資料時出錯: {str(e)}")
                     continue
                     
+            METRICS.record_parse(page_type, time.perf_counter() - started, len(books_data))
             return books_data
             
         except Exception as e:
@@ -60,23 +69,24 @@ class BestsellerScraper(BaseScraper):
             price_elem = book.find('li', class_='price_a')
             img_elem = book.find('img', class_='cover')
             
-            if not all([rank_elem, book_link, book_link.find('a')]):
+            title_link = book_link.find('a') if book_link else None
+            if not all([rank_elem, title_link]):
                 return None
                 
-            book_data = {
-                'rank': int(rank_elem.text.strip()),
-                'title': book_link.find('a').text.strip(),
-                'url': book_link.find('a')['href'],
-                'book_id': self._extract_book_id(book_link.find('a')['href']),
-                'author': author_elem.find('a').text.strip() if author_elem and author_elem.find('a') else "未知",
-                'img_url': img_elem['src'] if img_elem else None
-            }
+            author_link = author_elem.find('a') if author_elem else None
+            book_data = RankingEntry(
+                rank=int(rank_elem.text.strip()),
+                title=title_link.text.strip(),
+                url=title_link['href'],
+                book_id=self._extract_book_id(title_link['href']),
+                author=author_link.text.strip() if author_link else "未知",
+                img_url=img_elem['src'] if img_elem else None
+            )
             
             if price_elem:
-                book_data.update({
-                    'discount': price_elem.find('b').text.strip() if price_elem.find('b') else "未知",
-                    'price': price_elem.find_all('b')[-1].text.strip() if price_elem.find_all('b') else "未知"
-                })
+                prices = price_elem.find_all('b')
+                book_data['discount'] = prices[0].text.strip() if prices else None
+                book_data['price'] = prices[-1].text.strip() if prices else None
                 
             return book_data
             
@@ -93,23 +103,24 @@ class BestsellerScraper(BaseScraper):
             price_elem = book.find('p', class_='price')
             img_elem = book.find('img', class_='cover')
             
-            if not all([rank_elem, book_link, book_link.find('a')]):
+            title_link = book_link.find('a') if book_link else None
+            if not all([rank_elem, title_link]):
                 return None
                 
-            book_data = {
-                'rank': int(rank_elem.text.strip()),
-                'title': book_link.find('a').text.strip(),
-                'url': book_link.find('a')['href'],
-                'book_id': self._extract_book_id(book_link.find('a')['href']),
-                'author': author_elem.text.replace('作者：', '').strip() if author_elem else "未知",
-                'img_url': img_elem['src'] if img_elem else None
-            }
+            book_data = RankingEntry(
+                rank=int(rank_elem.text.strip()),
+                title=title_link.text.strip(),
+                url=title_link['href'],
+                book_id=self._extract_book_id(title_link['href']),
+                author=author_elem.text.replace('作者：', '').strip() if author_elem else "未知",
+                img_url=img_elem['src'] if img_elem else None
+            )
             
             if price_elem:
-                book_data.update({
-                    'discount': price_elem.find('span').text.replace('折優惠價', '').strip() if price_elem.find('span') else "未知",
-                    'price': price_elem.find('b').text.strip() if price_elem.find('b') else "未知"
-                })
+                discount_elem = price_elem.find('span')
+                price_b = price_elem.find('b')
+                book_data['discount'] = discount_elem.text.replace('折優惠價', '').strip() if discount_elem else None
+                book_data['price'] = price_b.text.strip() if price_b else None
                 
             return book_data
             
@@ -117,34 +128,161 @@ class BestsellerScraper(BaseScraper):
             self.logger.error(f"解析B版結構時出錯: {str(e)}")
             return None
 
-def read_yaml_config(file_path):
-    """讀取 YAML 配置文件"""
+def iter_bestsellers(items, config=None, scraper=None):
+    """批次爬取多個排行榜，依完成順序回傳 (category, books)
+
+    多個榜單設定相同網址時只抓取一次，每個榜單各自回傳一份資料。
+    """
+    categories = {}
+    for item in items:
+        categories.setdefault(item['url'], []).append(item['category'])
+    scraper = scraper or BestsellerScraper(None, None, config)
+
+    for url, result in scraper._fetch_and_parse(categories, parse_bestseller_html):
+        books = result['books'] if result else []
+        for category in categories[url]:
+            yield category, [dict(book) for book in books]
+
+def parse_bestseller_html(content, backend=DEFAULT_BACKEND):
+    """解析排行榜原始內容，只回傳可跨程序傳遞的資料"""
+    scraper = BestsellerScraper.parser()
+    return {'books': scraper.parse_bestsellers(make_soup(content, backend))}
+
+class BestsellerOutput:
+    """依 config['output_formats'] 保存每次爬取的排行榜"""
+
+    def __init__(self, config):
+        self.output_formats = config.get('output_formats') or ['json']
+        self.dataset = None
+        self.history = RankingHistory.from_config(config) if 'history' in self.output_formats else None
+        self.database = BookDatabase.from_config(config) if 'database' in self.output_formats else None
+        # 變動事件不是輸出格式，由 config['change_events'] 啟用
+        self.changes = ChangeStream.from_config(config)
+        if 'parquet' in self.output_formats:
+            try:
+                self.dataset = RankingDataset.from_config(config)
+            except ImportError as e:
+                logging.warning(f"略過 Parquet 輸出: {str(e)}")
+
+    def save(self, scraper, category, bestsellers, detect_changes=True):
+        """保存一個榜單；detect_changes 為 False 表示變動事件已由 detect_changes 輸出過"""
+        if not bestsellers:
+            return
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+        for format_type in ('json', 'csv'):
+            if format_type in self.output_formats:
+                scraper.save_data(
+                    bestsellers,
+                    f'{category}_bestsellers_{timestamp}.{format_type}',
+                    format_type=format_type
+                )
+        if self.dataset:
+            self.dataset.append(category, bestsellers)
+        if self.history:
+            changed = self.history.append(category, bestsellers)
+            scraper.logger.info(f"{category} 排行變動 {changed} 筆")
+        if self.database:
+            self.database.add_ranking(category, bestsellers)
+        if detect_changes:
+            self.detect_changes(category, bestsellers)
+
+    def detect_changes(self, category, bestsellers):
+        """比較榜單並輸出變動事件；需要補充書籍資料時在補充前呼叫，事件不必等整批補充完成"""
+        if self.changes and bestsellers:
+            self.changes.process(category, bestsellers)
+
+    def close(self):
+        if self.history:
+            self.history.close()
+        if self.database:
+            self.database.close()
+        if self.changes:
+            self.changes.close()
+
+def enrich_rankings(rankings, detail_scraper):
+    """為所有榜單的每一筆排行補上書籍頁面的資料與分類路徑
+
+    rankings 為 {榜單: 排行列表}。同一本書常同時出現在多個榜單，先收集所有榜單的
+    book_id 去除重複，每本書只併發抓取一次（以不含追蹤參數的網址抓取，跨榜單與跨執行
+    都能命中 HTTP 快取），再把結果附加到每一筆排行；排行本身的欄位優先。
+    回傳新的 {榜單: 排行列表}，抓取失敗的書籍維持原本的欄位。
+    """
+    book_ids = list(dict.fromkeys(
+        row['book_id'] for rows in rankings.values() for row in rows if row.get('book_id')
+    ))
+    urls = {PRODUCT_URL.format(book_id): book_id for book_id in book_ids}
+    details = {}
+    for url, book_data in detail_scraper.crawl_details(urls, skip_seen=False):
+        if book_data:
+            details[urls[url]] = book_data
+
+    entries = sum(len(rows) for rows in rankings.values())
+    detail_scraper.logger.info(
+        f"{len(rankings)} 個榜單共 {entries} 筆排行，{len(book_ids)} 本不重複書籍，取得 {len(details)} 本書籍資料"
+    )
+    return {
+        category: [{**details.get(row.get('book_id'), {}), **row} for row in rows]
+        for category, rows in rankings.items()
+    }
+
+def run_bestsellers(config, resources=None):
+    """依序爬取 config['urls'] 中的所有榜單，所有榜單共用同一組連線池、User-Agent 池與日誌設定
+
+    config['enrich_details'] 為 True 時，變動事件在每個榜單爬完時就輸出，所有榜單正常爬完後
+    再以 enrich_rankings 補上書籍資料並保存，補充失敗時保存未補充的資料。中途發生例外或
+    中斷時不再補充（補充需要抓取所有書籍頁面），已爬取的榜單以未補充的資料保存後重新拋出；
+    輸出一定會關閉。
+    """
+    resources = resources or SharedResources(config, log_name='bestsellerscraper')
+    output = BestsellerOutput(config)
+    enrich = config.get('enrich_details', False)
+    rankings = {}
+    crawler = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+        for item in config['urls']:
+            category = item['category']
+            url = item['url']
+
+            crawler = BestsellerScraper(category, url, config, resources=resources)
+            bestsellers = crawler.get_bestsellers()
+            if enrich:
+                output.detect_changes(category, bestsellers)
+                rankings[category] = bestsellers
+            else:
+                output.save(crawler, category, bestsellers)
+        if rankings:
+            _save_enriched(output, crawler, rankings, BookDetailScraper(config, resources=resources))
+    except BaseException:
+        if rankings:
+            crawler.logger.warning(f"爬取中斷，保存 {len(rankings)} 個未補充書籍資料的榜單")
+            try:
+                _save_rankings(output, crawler, rankings)
+            except Exception as e:
+                crawler.logger.error(f"保存已爬取的榜單失敗: {str(e)}")
+        raise
+    finally:
+        output.close()
+        if crawler:
+            crawler.report_stats()
+
+def _save_enriched(output, crawler, rankings, detail_scraper):
+    try:
+        rankings.update(enrich_rankings(rankings, detail_scraper))
     except Exception as e:
-        logging.error(f"讀取配置文件時出錯: {str(e)}")
-        return None
+        crawler.logger.error(f"補充書籍資料失敗，保存未補充的排行: {str(e)}")
+    _save_rankings(output, crawler, rankings)
+
+def _save_rankings(output, crawler, rankings):
+    """保存並移出 rankings 中的榜單，已保存的榜單不會因之後的例外再保存一次"""
+    for category in list(rankings):
+        output.save(crawler, category, rankings.pop(category), detect_changes=False)
 
 def main():
     config = read_yaml_config('books_crawler/config/book_bestseller_scraper_config.yaml')
     if not config:
         return
         
-    for item in config['urls']:
-        category = item['category']
-        url = item['url']
-        
-        crawler = BestsellerScraper(category, url, config)
-        bestsellers = crawler.get_bestsellers()
-        
-        if bestsellers:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-            crawler.save_data(
-                bestsellers,
-                f'{category}_bestsellers_{timestamp}.json',
-                format_type="json"
-            )
+    run_bestsellers(config)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,72 +1,90 @@
 from ..core.base_scraper import BaseScraper
-import json
-import re
+from ..core.database import BookDatabase, book_id_from_url
+from ..core.html_backend import DEFAULT_BACKEND
+from ..core.js_literal import find_property
+from ..core.metrics import METRICS
+from ..core.resources import DEFAULT_CONFIG_PATH, read_yaml_config
+import argparse
+import logging
+import time
 from datetime import datetime
 
+CHIMING_URL = 'https://www.chimingpublishing.com/monster/book/{}'
+SERIES_PROPERTY = 'series'
+# 排行走勢在 Highcharts 設定的 series 中，讀到該段 script 結束就中斷下載；
+# 先找 Highcharts 才不會停在其他 script 裡同名的屬性
+STOP_MARKERS = (b'Highcharts', b'series', b'</script>')
+
 class ChimingBestsellerScraper(BaseScraper):
-    def __init__(self, base_url, config=None):
-        super().__init__(config)
+    def __init__(self, base_url, config=None, resources=None):
+        super().__init__(config, resources)
         self.base_url = base_url
         self.headers['Referer'] = 'https://www.chimingpublishing.com'
 
-    def _extract_ranking_data(self, soup):
-        """從解析後的soup中提取排行榜數據"""
-        try:
-            ranking_data = []
-            script_tag = soup.find('script', string=lambda text: text and 'series' in text)
+    def get_bestsellers(self):
+        """爬取暢銷榜資料"""
+        for _, series in self.poll([self.base_url]):
+            return series or []
+        return []
+
+    def poll(self, urls):
+        """併發抓取多本書的排行走勢，依完成順序回傳 (url, series)，失敗時 series 為 None"""
+        for url, result in self._fetch_and_parse(urls, parse_chiming_html, STOP_MARKERS):
+            yield url, result['series'] if result else None
 
-            if not script_tag:
-                self.logger.error("未找到包含排行榜數據的script標籤")
-                return ranking_data
-            
-            start_index = script_tag.string.index('series:') + len('series: ')
-            end_index = script_tag.string.rindex(']') + 1
-            series_data = script_tag.string[start_index:end_index]
-            
-            def replace_date_utc(match):
-                params = match.group(1).split(', ')
-                year = int(params[0])
-                month = int(params[1])
-                day = int(params[2])
-                return f'"{year}-{month + 1:02d}-{day:02d}"'
+def _is_series(value):
+    """是否為 Highcharts 的 series 設定：每一項都有 name 與 data"""
+    return isinstance(value, list) and all(
+        isinstance(series, dict) and 'name' in series and 'data' in series for series in value
+    )
 
-            series_data = re.sub(r'Date\.UTC\((.*?)\)', replace_date_utc, series_data)
-            series_data = re.sub(r'(\w+):', r'"\1":', series_data)
-            series_list = json.loads(series_data)
+def extract_series(text, logger=None):
+    """從頁面原始內容取出 Highcharts 的 series，回傳 [{'name', 'data'}]"""
+    try:
+        series_list = find_property(text, SERIES_PROPERTY, accept=_is_series)
+    except ValueError as e:
+        (logger or logging.getLogger(__name__)).error(f"提取排行榜數據時出錯: {str(e)}")
+        return []
+    if series_list is None:
+        (logger or logging.getLogger(__name__)).error("未找到包含排行榜數據的script標籤")
+        return []
+    return [{'name': series['name'], 'data': series['data']} for series in series_list]
 
-            for series in series_list:
-                rank_info = {
-                    'name': series['name'],
-                    'data': series['data']
-                }
-                ranking_data.append(rank_info)
+def parse_chiming_html(content, backend=DEFAULT_BACKEND):
+    """直接從原始位元組取出排行走勢，不建立整份頁面的解析樹（backend 不使用）"""
+    started = time.perf_counter()
+    text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+    series = extract_series(text)
+    METRICS.record_parse('chiming', time.perf_counter() - started, len(series))
+    return {'series': series}
 
-            return ranking_data
-            
-        except Exception as e:
-            self.logger.error(f"提取排行榜數據時出錯: {str(e)}")
-            return []
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chiming 排行走勢")
+    parser.add_argument('book_ids', nargs='*', default=['0011001520'])
+    parser.add_argument('--ids-file', help="每行一個 book_id")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH)
+    args = parser.parse_args(argv)
 
-    def get_bestsellers(self):
-        """爬取暢銷榜資料"""
-        soup = self._get_soup(self.base_url)
-        if not soup:
-            return []
-            
-        return self._extract_ranking_data(soup)
+    book_ids = list(args.book_ids)
+    if args.ids_file:
+        with open(args.ids_file, 'r', encoding='utf-8') as f:
+            book_ids += [line.strip() for line in f if line.strip()]
 
-def main():
-    base_url = "https://www.chimingpublishing.com/monster/book/0011001520"
-    scraper = ChimingBestsellerScraper(base_url)
-    bestsellers = scraper.get_bestsellers()
-    
-    if bestsellers:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-        scraper.save_data(
-            bestsellers,
-            f'chiming_bestsellers_{timestamp}.json',
-            format_type="json"
-        )
+    scraper = ChimingBestsellerScraper(None, read_yaml_config(args.config) or {})
+    database = BookDatabase.from_config(scraper.config)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+    urls = [CHIMING_URL.format(book_id) for book_id in dict.fromkeys(book_ids)]
+    with scraper.open_sink(f'chiming_bestsellers_{timestamp}.jsonl') as sink:
+        for url, series in scraper.poll(urls):
+            if not series:
+                continue
+            book_id = book_id_from_url(url)
+            sink.write({'book_id': book_id, 'series': series})
+            if database:
+                database.add_series(book_id, series)
+    if database:
+        database.close()
+    scraper.report_stats()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,17 +1,43 @@
 from ..core.base_scraper import BaseScraper
+from ..core.database import BookDatabase
+from ..core.fetcher import RETRY_STATUSES
 from ..core.parser import BookInfoParser
+from ..core.html_backend import DEFAULT_BACKEND, make_soup
+from ..core.metrics import METRICS
+from ..core.records import BookDetail
+from ..core.resources import DEFAULT_CONFIG_PATH, read_yaml_config
+from ..core.seen_index import SeenIndex
 from datetime import datetime
+import time
+
+# 書籍資料在 <head> 的 meta description，分類在頁面後段的 ul.sort
+HEAD_END = b'</head>'
+CATEGORY_START = b'<ul class="sort"'
+CATEGORY_END = b'</ul>'
 
 class BookDetailScraper(BaseScraper):
-    def __init__(self, config=None):
-        super().__init__(config)
+    def __init__(self, config=None, resources=None):
+        super().__init__(config, resources)
         self.url = None
         self.soup = None
+        self.seen_index = SeenIndex.from_config(self.config)
+        detail_config = self.config.get('detail') or {}
+        # stream 為 True 時只下載到需要的元素為止；categories 為 False 時只需要 <head>
+        self.stream = detail_config.get('stream', False)
+        self.include_categories = detail_config.get('categories', True)
+        
+    @property
+    def stop_markers(self):
+        if not self.stream:
+            return None
+        if self.include_categories:
+            return (HEAD_END, CATEGORY_START, CATEGORY_END)
+        return (HEAD_END,)
         
     def set_url(self, url):
         """設定新的目標 URL 並取得解析的 BeautifulSoup 物件"""
         self.url = url
-        self.soup = self._get_soup(url)
+        self.soup = self._get_soup(url, self.stop_markers)
         
     def extract_basic_info(self):
         """提取基本書籍資料"""
@@ -24,7 +50,7 @@ class BookDetailScraper(BaseScraper):
             if meta_description:
                 content = meta_description.get('content')
                 book_info_parser = BookInfoParser(meta_text=content)
-                return book_info_parser.parse_book_info()
+                return BookDetail.from_dict(book_info_parser.parse_book_info())
         except Exception as e:
             self.logger.error(f"提取書籍資訊失敗: {str(e)}")
             return None
@@ -45,16 +71,16 @@ class BookDetailScraper(BaseScraper):
                     li_text = li.get_text(strip=True).replace('本書分類：', '')
                     
                     # 分割類別路徑
-                    categories = li_text.split('>')
+                    path = li_text.split('>')
                     
                     # 清理每個類別名稱
-                    categories = [
+                    path = [
                         name.strip().replace('/', '_')
-                        for name in categories
+                        for name in path
                     ]
                     
                     # 將每個分類名稱列表加入 categories 字典
-                    categories['detail_category'].append(categories)
+                    categories['detail_category'].append(path)
 
             return categories
         except Exception as e:
@@ -62,9 +88,84 @@ class BookDetailScraper(BaseScraper):
             self.logger.error(f"提取書籍類別資料失敗: {str(e)}")
             return None
 
-    
+    def extract_book(self, include_categories=True):
+        """提取書籍資料與（需要時）分類，回傳 (book_info, categories)"""
+        started = time.perf_counter()
+        book_info = self.extract_basic_info()
+        categories = self.extract_category_detail() if include_categories else None
+        METRICS.record_parse('detail', time.perf_counter() - started, 1 if book_info else 0)
+        return book_info, categories
+
+    def crawl_details(self, urls, skip_seen=True):
+        """批次爬取多個書籍頁面，依完成順序回傳 (url, book_data)，失敗的頁面 book_data 為 None
+
+        啟用 seen_index 且 skip_seen 為 True 時只抓取從未抓取過或已過期的書籍；
+        需要每本書的資料時（例如補充排行榜）傳入 False，重複的頁面交給 HTTP 快取。
+        """
+        if self.seen_index and skip_seen:
+            urls = self._filter_seen(urls)
+            
+        changed = 0
+        for url, result in self._fetch_and_parse(
+            urls, parse_detail_html, self.stop_markers, include_categories=self.include_categories
+        ):
+            if not result or not result['book_info']:
+                yield url, None
+                continue
+            book_data = {**result['book_info'], **(result.get('categories') or {})}
+            
+            book_id = self._extract_book_id(url)
+            if self.seen_index and book_id:
+                changed += self.seen_index.record(book_id, book_data)
+            yield url, book_data
+            
+        if self.seen_index:
+            self.logger.info(f"本次抓取中有 {changed} 本書籍為新書或內容有變更")
+
+    def _filter_seen(self, urls):
+        """依 seen_index 略過近期已抓取的書籍，同一本書只保留第一個網址"""
+        urls_by_id = {}
+        for url in urls:
+            urls_by_id.setdefault(self._extract_book_id(url) or url, url)
+            
+        stale_ids = self.seen_index.filter_stale(urls_by_id)
+        self.logger.info(f"略過 {len(urls_by_id) - len(stale_ids)} 本近期已抓取的書籍，待抓取 {len(stale_ids)} 本")
+        return [urls_by_id[book_id] for book_id in stale_ids]
+
+
+def detail_fragment(content, include_categories=True):
+    """只保留解析需要的 <head> 與分類區塊，找不到標記時回傳原內容"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    head_end = content.find(HEAD_END)
+    if head_end < 0:
+        return content
+    fragment = content[:head_end + len(HEAD_END)]
+    if include_categories:
+        start = content.find(CATEGORY_START, head_end)
+        end = content.find(CATEGORY_END, start) if start >= 0 else -1
+        if end < 0:
+            return content
+        fragment += b'<body>' + content[start:end + len(CATEGORY_END)] + b'</body></html>'
+    return fragment
+
+def parse_detail_html(content, backend=DEFAULT_BACKEND, include_categories=True):
+    """解析書籍頁面原始內容，只回傳可跨程序傳遞的資料
+
+    只解析 <head> 與分類區塊，不需要分類時只解析 <head>。
+    """
+    scraper = BookDetailScraper.parser()
+    scraper.soup = make_soup(detail_fragment(content, include_categories), backend)
+    book_info, categories = scraper.extract_book(include_categories)
+    result = {'book_info': book_info}
+    if include_categories:
+        result['categories'] = categories
+    return result
 
 def main(config=None):
+    """config 未指定時讀取 books_crawler/config/config.yaml"""
+    if config is None:
+        config = read_yaml_config(DEFAULT_CONFIG_PATH) or {}
     target_urls = [
         "https://www.books.com.tw/products/0011001522?sloc=main",
         "https://www.books.com.tw/products/0010922997?sloc=ms2_6",
@@ -73,21 +174,23 @@ def main(config=None):
         "https://www.books.com.tw/products/0011004419?loc=P_0003_001"
     ]
     
-    all_books_data = []
-    for url in target_urls:
-        scraper = BookDetailScraper(config)
-        scraper.set_url(url)
-        book_info_data = scraper.extract_basic_info()
-        book_category_data = scraper.extract_category_detail()
-        if book_info_data:
-            all_books_data.append({**book_info_data, **book_category_data})
-    
+    scraper = BookDetailScraper(config)
+    # 上次重試用盡的書籍頁面一併重新爬取，這次仍失敗時會再記入 dead letter；404 等永久錯誤不重新爬取
+    retry_urls = scraper.resources.dead_letters.pop_all('/products/', statuses=RETRY_STATUSES)
+    database = BookDatabase.from_config(scraper.config)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-    scraper.save_data(
-        all_books_data,
-        f'book_details_{timestamp}.json',
-        format_type="json"
-    )
+    with scraper.open_sink(f'book_details_{timestamp}.jsonl') as sink:
+        for url, book_data in scraper.crawl_details(target_urls + retry_urls):
+            if book_data:
+                sink.write(book_data)
+                if database:
+                    book_id = scraper._extract_book_id(url)
+                    database.add_books([{**book_data, 'book_id': book_id, 'url': url}])
+                    if 'detail_category' in book_data:
+                        database.add_categories(book_id, book_data['detail_category'])
+    if database:
+        database.close()
+    scraper.report_stats()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
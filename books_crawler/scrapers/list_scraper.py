@@ -1,14 +1,26 @@
 from ..core.base_scraper import BaseScraper
+from ..core.database import BookDatabase
+from ..core.html_backend import DEFAULT_BACKEND, make_soup
+from ..core.frontier import CrawlFrontier
+from ..core.metrics import METRICS
+from ..core.records import ListItem
+from ..core.resources import DEFAULT_CONFIG_PATH, read_yaml_config
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 import pandas as pd
 from typing import Dict, List, Tuple
 import json
+import logging
+import os
+import time
+
+CATEGORIES_FILE = 'books_crawler/config/book_list_categories.json'
+CHANGES_FILE = 'books_crawler/config/category_changes.json'
 
 class BookListScraper(BaseScraper):
-    def __init__(self, category, base_url, config=None):
-        super().__init__(config)
+    def __init__(self, category, base_url, config=None, resources=None):
+        super().__init__(config, resources)
         self.category = category
         self.base_url = base_url
 
@@ -59,27 +71,36 @@ class BookListScraper(BaseScraper):
 
     def parse_book_info(self, item_div):
         """解析單本書的資訊"""
-        book = {}
-        title_link_a = item_div.find('h4').find('a')
+        book = ListItem()
+        title = item_div.find('h4')
+        title_link_a = title.find('a') if title else None
         if title_link_a:
             book['product_name'] = title_link_a.text.strip()
             book['url'] = title_link_a['href']
         return book
 
     def crawl_page(self, url: str, first_page: bool = False):
-        """爬取單一頁面的資訊"""
+        """爬取單一頁面的資訊，抓取失敗時書籍列表為 None"""
         soup = self._get_soup(url)
         if not soup:
-            return [], None, None
+            return None, None, None
             
         category_metadata, total_pages = None, None
         if first_page:
             category_metadata = self.get_category_metadata(soup)
             total_pages = self.get_total_pages(soup)
         
+        books = self.parse_page(soup)
+        return books, category_metadata, total_pages
+
+    def parse_page(self, soup):
+        """解析列表頁中的所有書籍，兼容Ａ版與Ｂ版"""
         books = []
+        started = time.perf_counter()
+        page_type = 'list_a'
         book_items = soup.find_all('div', class_='item')
         if not book_items:
+            page_type = 'list_b'
             book_items = soup.find_all('li', class_='item')
             
         for item in book_items:
@@ -87,49 +108,242 @@ class BookListScraper(BaseScraper):
             if book_info:
                 books.append(book_info)
         
-        return books, category_metadata, total_pages
+        METRICS.record_parse(page_type, time.perf_counter() - started, len(books))
+        return books
+
+    def crawl_pages(self, urls: List[str]):
+        """批次爬取多個列表頁，依完成順序回傳 (url, books)，失敗的頁面 books 為 None"""
+        for url, result in self._fetch_and_parse(urls, parse_list_html):
+            yield url, result['books'] if result else None
 
-    def crawl_all_pages(self, base_url: str):
-        """爬取所有頁面的資訊"""
+    def build_page_url(self, base_url: str, page: int) -> str:
+        """替換 page 查詢參數，產生指定頁數的網址"""
+        parsed_url = urlparse(base_url)
+        query_params = parse_qs(parsed_url.query)
+        query_params['page'] = [str(page)]
+        new_query = urlencode(query_params, doseq=True)
+        return urlunparse(parsed_url._replace(query=new_query))
+
+    def crawl_all_pages(self, base_url: str, parallel: bool = False, sink=None):
+        """爬取所有頁面的資訊
+
+        parallel 為 True 時，取得總頁數後將第 2~N 頁交給併發抓取引擎，
+        併發數由 config['fetch']['concurrency'] 控制。不論是否併發，失敗的頁面都記錄在
+        self.failed_pages，其餘頁面的書籍仍依頁碼順序回傳；第 1 頁失敗時不再爬取其他頁。
+
+        指定 sink 時每頁解析完就依頁碼順序寫入 sink，不在記憶體中累積，
+        回傳的書籍列表為空。
+        """
+        self.failed_pages = []
         all_books = []
+        emit = sink.write_many if sink else all_books.extend
+        
         books, metadata, total_pages = self.crawl_page(base_url, first_page=True)
-        all_books.extend(books)
+        if books is None:
+            # 第 1 頁失敗時無法得知總頁數
+            self.failed_pages.append(1)
+            self._warn_failed_pages()
+            return all_books, None
         category_metadata = metadata
+        total_pages = total_pages or 1
+        emit(books)
 
-        parsed_url = urlparse(base_url)
-        query_params = parse_qs(parsed_url.query)
+        if parallel:
+            self._crawl_pages_parallel(base_url, total_pages, emit)
+            return all_books, category_metadata
 
         for page in range(2, total_pages + 1):
-            query_params['page'] = [str(page)]
-            new_query = urlencode(query_params, doseq=True)
-            page_url = urlunparse(parsed_url._replace(query=new_query))
+            page_url = self.build_page_url(base_url, page)
             
             self.logger.info(f"正在爬取第 {page} 頁，共 {total_pages} 頁")
             books, _, _ = self.crawl_page(page_url)
-            all_books.extend(books)
+            if books is None:
+                self.failed_pages.append(page)
+            emit(books or [])
             
+        self._warn_failed_pages()
         return all_books, category_metadata
 
-def main():
+    def _crawl_pages_parallel(self, base_url: str, total_pages: int, emit):
+        """併發爬取第 2~N 頁，暫存提早完成的頁面，依頁碼順序交給 emit"""
+        page_numbers = {
+            self.build_page_url(base_url, page): page
+            for page in range(2, total_pages + 1)
+        }
+        buffered = {}
+        next_page = 2
+        completed = 1
+        
+        for page_url, books in self.crawl_pages(page_numbers):
+            page = page_numbers[page_url]
+            completed += 1
+            if books is None:
+                self.failed_pages.append(page)
+            buffered[page] = books or []
+            while next_page in buffered:
+                emit(buffered.pop(next_page))
+                next_page += 1
+            self.logger.info(f"已完成 {completed} 頁，共 {total_pages} 頁")
+        
+        self.failed_pages.sort()
+        self._warn_failed_pages()
+
+    def _warn_failed_pages(self):
+        if self.failed_pages:
+            self.logger.warning(f"{self.category} 有 {len(self.failed_pages)} 頁爬取失敗: {self.failed_pages}")
+
+def parse_list_html(content, first_page: bool = False, backend: str = DEFAULT_BACKEND) -> Dict:
+    """解析列表頁原始內容，只回傳可跨程序傳遞的資料"""
+    scraper = BookListScraper.parser()
+    soup = make_soup(content, backend)
+    result = {'books': scraper.parse_page(soup)}
+    if first_page:
+        result['category_metadata'] = scraper.get_category_metadata(soup)
+        result['total_pages'] = scraper.get_total_pages(soup)
+    return result
+
+def iter_category_units(categories: List[Dict], include_leaves: bool = False):
+    """列出要爬取的 (名稱, 網址)：預設為第二層分類，include_leaves 時改用第三層葉分類"""
+    for category in categories:
+        for subcategory in category['subcategories']:
+            leaves = subcategory.get('subcategories') or []
+            if include_leaves and leaves:
+                for leaf in leaves:
+                    yield f"{subcategory['name']}_{leaf['name']}", leaf['link']
+            else:
+                yield subcategory['name'], subcategory['link']
+
+def changed_category_units(categories: List[Dict], changed, include_leaves: bool = False):
+    """從 iter_category_units 的單位中選出有變動的 (名稱, 網址)
+
+    changed 為 category_changes.json 中新增或變更的網址路徑；有葉分類時差異以葉分類記錄，
+    不含葉分類時，葉分類的變動選取其所屬的第二層分類。
+    """
+    def is_changed(node):
+        return urlparse(node['link']).path.rstrip('/') in changed
+
+    for category in categories:
+        for subcategory in category['subcategories']:
+            leaves = subcategory.get('subcategories') or []
+            if include_leaves and leaves:
+                for leaf in leaves:
+                    if is_changed(leaf):
+                        yield f"{subcategory['name']}_{leaf['name']}", leaf['link']
+            elif any(is_changed(node) for node in [subcategory] + leaves):
+                yield subcategory['name'], subcategory['link']
+
+def known_total_pages(categories: List[Dict]) -> Dict[str, int]:
+    """分類文件中由 category_utils discover 記錄的總頁數，{網址: 總頁數}"""
+    pages = {}
+    for category in categories:
+        for subcategory in category['subcategories']:
+            for node in [subcategory] + (subcategory.get('subcategories') or []):
+                if node.get('total_pages'):
+                    pages[node['link']] = node['total_pages']
+    return pages
+
+def crawl_frontier(scraper: BookListScraper, frontier: CrawlFrontier, batch_size: int = 1, database=None):
+    """持續從 frontier 領取 (分類, 頁數) 單位爬取，直到沒有待處理的單位
+
+    第 1 頁完成後才把第 2~N 頁加入 frontier。每頁的書籍附加到該分類的輸出檔並
+    flush 後才標記為 done；若程序恰好在兩者之間中斷，該頁恢復後會重抓一次。
+    指定 database 時書籍也會 upsert 到資料庫，這一批單位在資料庫交易提交後才標記為 done。
+    """
+    sinks = {}
+    try:
+        while True:
+            units = frontier.claim(batch_size)
+            if not units:
+                break
+            units_by_url = {unit.url: unit for unit in units}
+            done = []
+            
+            for url, result in scraper._fetch_and_parse(units_by_url, parse_list_html, first_page=True):
+                unit = units_by_url[url]
+                if result is None:
+                    frontier.mark_failed(unit.category, unit.page)
+                    continue
+                    
+                if unit.page == 1:
+                    frontier.add_many(
+                        (unit.category, page, scraper.build_page_url(url, page))
+                        for page in range(2, (result['total_pages'] or 1) + 1)
+                    )
+                    
+                if unit.category not in sinks:
+                    sinks[unit.category] = scraper.open_sink(
+                        f'{unit.category}_category_book_list_{frontier.crawl_id}.jsonl', append=True
+                    )
+                sink = sinks[unit.category]
+                sink.write_many(result['books'])
+                sink.flush()
+                if database:
+                    database.add_books(result['books'])
+                    done.append(unit)
+                else:
+                    frontier.mark_done(unit.category, unit.page)
+                
+            if database:
+                # 緩衝中的書籍尚未寫入時中斷，這些頁面恢復後會重抓
+                database.flush()
+                for unit in done:
+                    frontier.mark_done(unit.category, unit.page)
+            scraper.logger.info(f"爬取進度: {frontier.counts()}")
+    finally:
+        for sink in sinks.values():
+            sink.close()
+
+def main(parallel=False, resume=True, include_leaves=False, changed_only=False, config=None):
+    """changed_only 為 True 時只爬取 category_changes.json 中新增或變更的分類
+
+    config 未指定時讀取 books_crawler/config/config.yaml。
+    """
     categories = None
+    changed = None
+    if config is None:
+        config = read_yaml_config(DEFAULT_CONFIG_PATH) or {}
     
     try:
-        with open('books_crawler/config/book_list_categories.json', 'r', encoding='utf-8') as f:
+        with open(CATEGORIES_FILE, 'r', encoding='utf-8') as f:
             categories = json.load(f)
+        if changed_only:
+            with open(CHANGES_FILE, 'r', encoding='utf-8') as f:
+                changes = json.load(f)
+            changed = set(changes['added']) | set(changes['changed'])
     except Exception as e:
         logging.error(f"載入分類文件失敗: {str(e)}")
+        return
     
-    for category in categories:
-        for subcategory in category['subcategories']:
-            base_url = subcategory['link']
-            crawler = BookListScraper(subcategory['name'], base_url)
-            all_books, category_metadata = crawler.crawl_all_pages(base_url)            
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-            crawler.save_data(
-                all_books,
-                f'{crawler.category}_category_book_list_{timestamp}.json',
-                format_type="json"
-            )
+    crawler = BookListScraper(None, None, config)
+    frontier = CrawlFrontier(os.path.join(crawler.base_dir, 'list_frontier.sqlite'))
+    
+    # 上一輪未完成時從中斷處繼續，否則開始新一輪
+    if resume and frontier.has_unfinished():
+        recovered = frontier.recover()
+        crawler.logger.info(f"從 {frontier.crawl_id} 的進度繼續爬取，恢復 {recovered} 個單位")
+    else:
+        frontier.reset()
+        if changed is None:
+            units = list(iter_category_units(categories, include_leaves))
+        else:
+            units = list(changed_category_units(categories, changed, include_leaves))
+        # 已知總頁數的分類一開始就加入所有頁面，併發抓取不必等第 1 頁完成
+        total_pages = known_total_pages(categories)
+        frontier.add_many(
+            (name, page, link if page == 1 else crawler.build_page_url(link, page))
+            for name, link in units
+            for page in range(1, total_pages.get(link, 1) + 1)
+        )
+    
+    batch_size = crawler.fetcher.concurrency * 2 if parallel else 1
+    database = BookDatabase.from_config(crawler.config)
+    try:
+        crawl_frontier(crawler, frontier, batch_size=batch_size, database=database)
+    finally:
+        frontier.close()
+        if database:
+            database.close()
+        crawler.report_stats()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,126 @@
+"""由 sitemap 與已抓取頁面建立書籍 ID 集合，再依不重複的 ID 爬取書籍頁面
+
+sitemap 一個檔案可列出上萬個商品網址，遠多於列表頁每頁的 20 本書；
+config['discovery']['sitemaps'] 未指定時讀取 robots.txt 的 ``Sitemap:``。
+啟用 discovery 後，排行榜、列表與書籍頁面的抓取也會把頁面中出現的書籍 ID
+加入同一個集合（見 ``core/product_ids.py``）。
+
+    python -m books_crawler.scrapers.sitemap_scraper sitemap
+    python -m books_crawler.scrapers.sitemap_scraper details --limit 5000
+    python -m books_crawler.scrapers.sitemap_scraper stats
+"""
+from ..core.base_scraper import BaseScraper
+from ..core.database import BookDatabase
+from ..core.html_backend import DEFAULT_BACKEND
+from ..core.product_ids import PRODUCT_URL, ProductIdSet, harvest_ids
+from ..core.resources import DEFAULT_CONFIG_PATH, read_yaml_config
+from .detail_scraper import BookDetailScraper
+from datetime import datetime
+from itertools import islice
+import argparse
+import gzip
+import html
+import os
+import re
+
+ROBOTS_URL = 'https://www.books.com.tw/robots.txt'
+LOC_PATTERN = re.compile(rb'<loc>\s*([^<\s]+)\s*</loc>')
+SITEMAP_LINE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+DEFAULT_BATCH_SIZE = 1000
+
+class SitemapScraper(BaseScraper):
+    def __init__(self, config=None, resources=None, product_ids=None):
+        """product_ids 未指定時使用共用資源的集合，未啟用 discovery 時在 base_dir 建立"""
+        super().__init__(config, resources)
+        self.product_ids = product_ids or self.resources.product_ids or ProductIdSet(
+            os.path.join(self.base_dir, 'product_ids.bin')
+        )
+        self.discovery_config = self.config.get('discovery') or {}
+
+    def sitemap_urls(self):
+        """config 指定的 sitemap，未指定時讀取 robots.txt"""
+        if self.discovery_config.get('sitemaps'):
+            return list(self.discovery_config['sitemaps'])
+        try:
+            return sitemaps_from_robots(self.fetcher.fetch(ROBOTS_URL).text)
+        except Exception as e:
+            self.logger.error(f"讀取 robots.txt 失敗: {str(e)}")
+            return []
+
+    def crawl(self, urls=None):
+        """逐層抓取 sitemap（索引檔中的子 sitemap 在下一層併發抓取），回傳新增的書籍 ID 數"""
+        before = len(self.product_ids)
+        pending = list(dict.fromkeys(urls or self.sitemap_urls()))
+        visited = set(pending)
+        while pending:
+            children = []
+            for url, result in self._fetch_and_parse(pending, parse_sitemap_xml):
+                if result is None:
+                    continue
+                self.product_ids.add_many(result['product_ids'])
+                children += [child for child in result['sitemaps'] if child not in visited]
+                visited.update(children)
+            pending = children
+        self.product_ids.flush()
+        added = len(self.product_ids) - before
+        self.logger.info(f"讀取 {len(visited)} 個 sitemap，新增 {added} 個書籍 ID，共 {len(self.product_ids)} 個")
+        return added
+
+def sitemaps_from_robots(text):
+    return SITEMAP_LINE.findall(text)
+
+def parse_sitemap_xml(content, backend=DEFAULT_BACKEND):
+    """解析 sitemap 或 sitemap 索引（可為 gzip），回傳子 sitemap 網址與書籍 ID（backend 不使用）"""
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    locs = [html.unescape(loc.decode('utf-8')) for loc in LOC_PATTERN.findall(content)]
+    if b'<sitemapindex' in content:
+        return {'sitemaps': locs, 'product_ids': []}
+    return {'sitemaps': [], 'product_ids': harvest_ids('\n'.join(locs))}
+
+def crawl_ids(detail_scraper, book_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """依書籍 ID 分批爬取書籍頁面，回傳 (book_id, book_data)；已啟用 seen_index 時略過近期抓取過的書籍"""
+    book_ids = iter(book_ids)
+    while True:
+        batch = list(islice(book_ids, batch_size))
+        if not batch:
+            return
+        urls = {PRODUCT_URL.format(book_id): book_id for book_id in batch}
+        for url, book_data in detail_scraper.crawl_details(urls):
+            yield urls[url], book_data
+
+def main():
+    parser = argparse.ArgumentParser(description="書籍 ID 探索")
+    parser.add_argument('command', nargs='?', default='sitemap', choices=['sitemap', 'details', 'stats'])
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH)
+    parser.add_argument('--sitemap', action='append', help="指定 sitemap 網址，可重複")
+    parser.add_argument('--limit', type=int, help="details 最多爬取的書籍數")
+    args = parser.parse_args()
+
+    config = read_yaml_config(args.config) or {}
+    scraper = SitemapScraper(config)
+    if args.command == 'sitemap':
+        added = scraper.crawl(args.sitemap)
+        print(f"新增 {added} 個書籍 ID，共 {len(scraper.product_ids)} 個")
+    elif args.command == 'details':
+        detail_scraper = BookDetailScraper(config, resources=scraper.resources)
+        database = BookDatabase.from_config(config)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+        with scraper.open_sink(f'book_details_{timestamp}.jsonl') as sink:
+            for book_id, book_data in crawl_ids(detail_scraper, islice(scraper.product_ids, args.limit)):
+                if not book_data:
+                    continue
+                sink.write({**book_data, 'book_id': book_id})
+                if database:
+                    database.add_books([{**book_data, 'book_id': book_id, 'url': PRODUCT_URL.format(book_id)}])
+                    if 'detail_category' in book_data:
+                        database.add_categories(book_id, book_data['detail_category'])
+        if database:
+            database.close()
+    else:
+        print(f"共 {len(scraper.product_ids)} 個書籍 ID：{scraper.product_ids.path}")
+    scraper.report_stats()
+    scraper.product_ids.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,136 @@
-import requests
-from bs4 import BeautifulSoup
+"""分類目錄的探索與增量更新
+
+``generate_categories`` 讀取分類目錄頁（sys_sublistb）建立三層分類結構。
+``discover`` 另外併發抓取每個爬取單位（有第三層時為葉分類，否則為第二層分類）
+的列表第一頁，記錄總頁數與每頁書籍數，並與上一次的 ``book_list_categories.json``
+比對：結構未變且在 max_age_days 內檢查過的單位沿用上次的結果，只抓取新增、
+改變或過期的分支。``plan_work`` 依總頁數把爬取單位平均分配給多個 worker。
+
+    python -m books_crawler.utils.category_utils discover --max-age-days 7
+    python -m books_crawler.utils.category_utils plan --workers 4
+"""
+import argparse
+import heapq
 import json
 import logging
-from typing import List, Dict
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from books_crawler.core.html_backend import DEFAULT_BACKEND
+from books_crawler.scrapers.list_scraper import BookListScraper, parse_list_html
+
+CATEGORIES_PATH = 'books_crawler/config/book_list_categories.json'
+DEFAULT_MAX_AGE_DAYS = 7
+STAT_FIELDS = ('total_pages', 'items_per_page', 'estimated_items', 'checked_at')
+
+
+def link_key(link):
+    """分類網址去掉 loc 等追蹤參數後的路徑，用於比對前後兩次的分類"""
+    return urlparse(link).path.rstrip('/')
+
+
+def iter_units(categories):
+    """依序列出爬取單位節點：有第三層時為葉分類，否則為第二層分類"""
+    for category in categories:
+        for subcategory in category['subcategories']:
+            leaves = subcategory.get('subcategories') or []
+            if leaves:
+                yield from leaves
+            else:
+                yield subcategory
+
+
+def diff_categories(previous, current):
+    """比較兩次分類結構的爬取單位，回傳 {'added', 'removed', 'changed'} 網址路徑列表
+
+    名稱或總頁數不同的單位視為 changed。
+    """
+    before = {link_key(node['link']): node for node in iter_units(previous or [])}
+    after = {link_key(node['link']): node for node in iter_units(current)}
+    return {
+        'added': [key for key in after if key not in before],
+        'removed': [key for key in before if key not in after],
+        'changed': [
+            key for key, node in after.items()
+            if key in before and (
+                node['name'] != before[key]['name']
+                or node.get('total_pages') != before[key].get('total_pages')
+            )
+        ],
+    }
+
+
+def plan_work(categories, workers):
+    """依總頁數把爬取單位分給 workers 個 worker（最長處理時間優先的貪婪分配）
+
+    回傳每個 worker 的 {'pages': 總頁數, 'units': [(名稱, 網址, 總頁數)]}，
+    未探索過總頁數的單位以 1 頁計算。
+    """
+    units = sorted(
+        ((node['name'], node['link'], node.get('total_pages') or 1) for node in iter_units(categories)),
+        key=lambda unit: unit[2], reverse=True
+    )
+    plans = [{'pages': 0, 'units': []} for _ in range(max(workers, 1))]
+    heap = [(0, index) for index in range(len(plans))]
+    for unit in units:
+        pages, index = heapq.heappop(heap)
+        plans[index]['units'].append(unit)
+        plans[index]['pages'] = pages + unit[2]
+        heapq.heappush(heap, (plans[index]['pages'], index))
+    return plans
+
 
 class CategoryGenerator:
-    def __init__(self):
+    def __init__(self, parser_backend: str = DEFAULT_BACKEND, config=None, resources=None):
+        """config 與 resources 交給抓取用的 BookListScraper（共用連線池、逾時、重試與快取）"""
         self.url = 'https://www.books.com.tw/web/sys_sublistb/books/?loc=subject_011'
-        
+        self.parser_backend = parser_backend
+        self.config = config or {}
+        self.resources = resources
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._scraper = None
+
+    @property
+    def scraper(self):
+        """延遲建立，只解析時不建立 session 與日誌檔"""
+        if self._scraper is None:
+            config = {**self.config, 'parser_backend': self.parser_backend}
+            self._scraper = BookListScraper(None, None, config, resources=self.resources)
+        return self._scraper
+
     def generate_categories(self) -> List[Dict]:
         """生成分類結構"""
-        response = requests.get(self.url)
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
+        soup = self.scraper._get_soup(self.url)
+        if soup is None:
+            raise RuntimeError(f"無法取得分類目錄: {self.url}")
+        return self.parse_categories(soup)
+
+    def parse_categories(self, soup) -> List[Dict]:
+        """解析分類目錄頁"""
         categories = []
         for category_div in soup.find_all('div', class_='type02_s004 clearfix'):
             main_category = category_div.find('h4').get_text(strip=True).replace('/', '_')
             main_link = category_div.find('h4').find('a')['href']
-            
+
             main_category_dict = {
                 'name': main_category,
                 'link': main_link,
                 'subcategories': []
             }
-            
+
             for row in category_div.find_all('tr'):
                 subcategory = row.find('h5')
                 if subcategory:
                     subcategory_dict = self._process_subcategory(subcategory, row)
                     main_category_dict['subcategories'].append(subcategory_dict)
-                    
+
             categories.append(main_category_dict)
-            
+
         return categories
-        
+
     def _process_subcategory(self, subcategory, row) -> Dict:
         """處理子分類"""
         subcategory_name = subcategory.get_text(strip=True).replace('/', '_')
@@ -44,7 +140,7 @@ class CategoryGenerator:
             'link': subcategory_link,
             'subcategories': []
         }
-        
+
         ul_element = row.find('td').find('ul')
         if ul_element:
             subcategory_dict['subcategories'] = [
@@ -55,18 +151,103 @@ class CategoryGenerator:
                 for li in ul_element.find_all('li')
                 if li.find('a')
             ]
-            
+
         return subcategory_dict
-        
+
+    def discover(self, previous=None, max_age_days=DEFAULT_MAX_AGE_DAYS, now=None):
+        """重新讀取分類目錄，併發探索需要更新的爬取單位，回傳 (分類結構, 差異)
+
+        previous 為上一次的分類結構；同一網址、同一名稱且 max_age_days 內檢查過的單位
+        沿用上次的總頁數，其餘單位抓取列表第一頁。抓取失敗的單位沿用上次的結果（若有）。
+        """
+        now = time.time() if now is None else now
+        categories = self.generate_categories()
+        known = {link_key(node['link']): node for node in iter_units(previous or [])}
+        pending = {}
+        reused = 0
+        for node in iter_units(categories):
+            old = known.get(link_key(node['link']))
+            if old and old['name'] == node['name'] and self._is_fresh(old, now, max_age_days):
+                node.update({field: old[field] for field in STAT_FIELDS if field in old})
+                reused += 1
+            else:
+                pending[node['link']] = (node, old)
+
+        checked_at = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        failed = 0
+        for url, result in self.scraper._fetch_and_parse(pending, parse_list_html, first_page=True):
+            node, old = pending[url]
+            if result is None:
+                failed += 1
+                if old:
+                    node.update({field: old[field] for field in STAT_FIELDS if field in old})
+                continue
+            total_pages = result['total_pages'] or 1
+            items_per_page = len(result['books'])
+            node.update({
+                'total_pages': total_pages,
+                'items_per_page': items_per_page,
+                # 列表頁沒有總筆數，以每頁筆數 × 總頁數估計（最後一頁可能未滿）
+                'estimated_items': items_per_page * total_pages,
+                'checked_at': checked_at,
+            })
+
+        changes = diff_categories(previous, categories)
+        self.logger.info(
+            f"探索 {len(pending)} 個分類（失敗 {failed} 個），沿用 {reused} 個；"
+            f"新增 {len(changes['added'])}、移除 {len(changes['removed'])}、變更 {len(changes['changed'])}"
+        )
+        return categories, changes
+
+    @staticmethod
+    def _is_fresh(node, now, max_age_days):
+        if 'checked_at' not in node:
+            return False
+        checked = datetime.strptime(node['checked_at'], '%Y-%m-%d %H:%M:%S').timestamp()
+        return now - checked < max_age_days * 86400
+
     def save_categories(self, filename: str = 'book_list_categories.json'):
         """保存分類到文件"""
         categories = self.generate_categories()
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(categories, f, ensure_ascii=False, indent=4)
 
+    def refresh_categories(self, filename: str = CATEGORIES_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """以 discover 增量更新分類文件，差異寫入同目錄的 category_changes.json，回傳差異"""
+        previous = None
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        categories, changes = self.discover(previous, max_age_days)
+        for path, data in [(filename, categories), (changes_path(filename), changes)]:
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(f'{path}.tmp', path)
+        return changes
+
+
+def changes_path(categories_path=CATEGORIES_PATH):
+    return os.path.join(os.path.dirname(categories_path), 'category_changes.json')
+
+
 def main():
-    generator = CategoryGenerator()
-    generator.save_categories()
+    parser = argparse.ArgumentParser(description="分類目錄工具")
+    parser.add_argument('command', nargs='?', default='generate', choices=['generate', 'discover', 'plan'])
+    parser.add_argument('--file', default=CATEGORIES_PATH)
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        CategoryGenerator().save_categories(args.file)
+    elif args.command == 'discover':
+        changes = CategoryGenerator().refresh_categories(args.file, args.max_age_days)
+        print(f"新增 {len(changes['added'])}、移除 {len(changes['removed'])}、變更 {len(changes['changed'])} 個分類")
+    else:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            plans = plan_work(json.load(f), args.workers)
+        for index, plan in enumerate(plans):
+            print(f"worker {index}: {len(plan['units'])} 個分類，{plan['pages']} 頁")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
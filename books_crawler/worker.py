@@ -0,0 +1,214 @@
+"""分散式爬取 worker
+
+多台機器上的 worker 從同一個任務佇列領取任務，解析後把紀錄推到共用的結果區，
+所有 worker 共用同一組每主機速率限制，增加機器不會超過禮貌請求頻率。
+
+    # 建立任務
+    python -m books_crawler.worker --queue redis://host:6379/0 enqueue bestsellers
+    python -m books_crawler.worker --queue redis://host:6379/0 enqueue categories
+    # 每台機器啟動 worker
+    python -m books_crawler.worker --queue redis://host:6379/0 work
+    # 把結果寫成 JSONL
+    python -m books_crawler.worker --queue redis://host:6379/0 drain
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from .core.resources import SharedResources
+from .core.sink import JsonlSink
+from .core.task_queue import DEFAULT_LEASE_SECONDS, open_queue
+from .scrapers.bestseller_scraper import BestsellerScraper, read_yaml_config
+from .scrapers.detail_scraper import BookDetailScraper
+from .scrapers.list_scraper import BookListScraper, iter_category_units
+
+LIST_PAGE = 'list_page'
+DETAIL = 'detail'
+BESTSELLER = 'bestseller'
+
+
+class CrawlWorker:
+    """從共用佇列領取任務並執行的 worker"""
+
+    def __init__(self, queue, config=None, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.queue = queue
+        self.config = config or {}
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.lease_seconds = lease_seconds
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        rates = (self.config.get('fetch') or {}).get('rate_limits')
+        # 改用跨 worker 共用的速率限制
+        self.rate_limiter = queue.rate_limiter(rates)
+        self.resources = SharedResources(self.config, log_name='crawlworker', rate_limiter=self.rate_limiter)
+        self.list_scraper = BookListScraper(None, None, self.config, self.resources)
+        self.detail_scraper = BookDetailScraper(self.config, self.resources)
+        self.bestseller_scraper = BestsellerScraper(None, None, self.config, self.resources)
+        self.handlers = {
+            LIST_PAGE: self.handle_list_page,
+            DETAIL: self.handle_detail,
+            BESTSELLER: self.handle_bestseller,
+        }
+
+    def _get_soup(self, scraper, url):
+        soup = scraper._get_soup(url)
+        if soup is None:
+            raise RuntimeError(f"獲取頁面失敗: {url}")
+        return soup
+
+    def handle_list_page(self, task):
+        payload = task.payload
+        scraper = self.list_scraper
+        soup = self._get_soup(scraper, payload['url'])
+        if payload['page'] == 1:
+            # 以第 1 頁任務 ID 與頁碼為 key，租約過期重新執行第 1 頁時不重複加入後續頁面
+            pages = range(2, scraper.get_total_pages(soup) + 1)
+            self.queue.put_many(LIST_PAGE, [
+                {'category': payload['category'], 'page': page, 'url': scraper.build_page_url(payload['url'], page)}
+                for page in pages
+            ], keys=[f'{LIST_PAGE}:{task.task_id}:{page}' for page in pages])
+        return [{**book, 'category': payload['category']} for book in scraper.parse_page(soup)]
+
+    def handle_detail(self, task):
+        payload = task.payload
+        scraper = self.detail_scraper
+        scraper.url = payload['url']
+        scraper.soup = self._get_soup(scraper, payload['url'])
+        book_info, categories = scraper.extract_book()
+        if not book_info:
+            return []
+        return [{
+            **book_info,
+            **(categories or {}),
+            'book_id': scraper._extract_book_id(payload['url']),
+        }]
+
+    def handle_bestseller(self, task):
+        payload = task.payload
+        scraper = self.bestseller_scraper
+        soup = self._get_soup(scraper, payload['url'])
+        return [{**book, 'category': payload['category']} for book in scraper.parse_bestsellers(soup)]
+
+    def run(self, max_tasks=None, idle_timeout=None, poll_interval=5):
+        """持續處理任務；idle_timeout 秒內沒有任務時結束，None 表示持續等待"""
+        processed = 0
+        idle_since = time.monotonic()
+        while max_tasks is None or processed < max_tasks:
+            task = self.queue.lease(self.worker_id, self.lease_seconds)
+            if task is None:
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                records = self.handlers[task.kind](task)
+                self.queue.push_results(task.kind, records)
+                if not self.queue.ack(task):
+                    self.logger.warning(f"任務 {task.task_id} ({task.kind}) 的租約已被其他 worker 重新領取")
+            except Exception as e:
+                self.logger.error(f"任務 {task.task_id} ({task.kind}) 第 {task.attempts} 次執行失敗: {str(e)}")
+                self.queue.nack(task)
+            processed += 1
+            idle_since = time.monotonic()
+        return processed
+
+    def close(self):
+        """結束時輸出統計並關閉共用資源（寫回收集到的書籍 ID）"""
+        try:
+            self.list_scraper.report_stats()
+        finally:
+            self.resources.close()
+
+
+def enqueue_bestsellers(queue, config):
+    queue.put_many(BESTSELLER, [
+        {'category': item['category'], 'url': item['url']} for item in config['urls']
+    ])
+
+
+def enqueue_categories(queue, categories, include_leaves=False):
+    queue.put_many(LIST_PAGE, [
+        {'category': name, 'page': 1, 'url': link}
+        for name, link in iter_category_units(categories, include_leaves)
+    ])
+
+
+def enqueue_details(queue, urls):
+    queue.put_many(DETAIL, [{'url': url} for url in urls])
+
+
+def drain_results(queue, output_dir, batch_size=1000):
+    """把共用結果區的紀錄依任務種類寫入 JSONL，回傳寫入筆數"""
+    os.makedirs(output_dir, exist_ok=True)
+    sinks = {}
+    total = 0
+    try:
+        while True:
+            results = queue.pop_results(batch_size)
+            if not results:
+                break
+            for kind, record in results:
+                if kind not in sinks:
+                    sinks[kind] = JsonlSink(os.path.join(output_dir, f'{kind}_results.jsonl'), append=True)
+                sinks[kind].write(record)
+            total += len(results)
+    finally:
+        for sink in sinks.values():
+            sink.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分散式爬取 worker")
+    parser.add_argument('--queue', default=os.path.join('data', 'task_queue.sqlite'),
+                        help="redis://... 或 SQLite 檔案路徑")
+    parser.add_argument('--config', default='books_crawler/config/book_bestseller_scraper_config.yaml')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue')
+    enqueue_parser.add_argument('source', choices=['bestsellers', 'categories', 'details'])
+    enqueue_parser.add_argument('--categories', default='books_crawler/config/book_list_categories.json')
+    enqueue_parser.add_argument('--include-leaves', action='store_true')
+    enqueue_parser.add_argument('--urls', help="每行一個書籍網址的檔案")
+
+    work_parser = subparsers.add_parser('work')
+    work_parser.add_argument('--max-tasks', type=int)
+    work_parser.add_argument('--idle-timeout', type=float)
+
+    subparsers.add_parser('drain')
+    subparsers.add_parser('status')
+
+    args = parser.parse_args()
+    config = read_yaml_config(args.config) or {}
+    queue = open_queue(args.queue)
+
+    try:
+        if args.command == 'enqueue':
+            if args.source == 'bestsellers':
+                enqueue_bestsellers(queue, config)
+            elif args.source == 'categories':
+                with open(args.categories, 'r', encoding='utf-8') as f:
+                    enqueue_categories(queue, json.load(f), args.include_leaves)
+            else:
+                with open(args.urls, 'r', encoding='utf-8') as f:
+                    enqueue_details(queue, [line.strip() for line in f if line.strip()])
+        elif args.command == 'work':
+            worker = CrawlWorker(queue, config)
+            try:
+                worker.run(max_tasks=args.max_tasks, idle_timeout=args.idle_timeout)
+            finally:
+                worker.close()
+        elif args.command == 'drain':
+            count = drain_results(queue, os.path.join(config.get('base_dir', 'data'), 'output'))
+            print(f"已寫出 {count} 筆結果")
+        print(queue.counts())
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
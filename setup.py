@@ -10,6 +10,13 @@ setup(
         "fake-useragent>=0.1.11",
         "pyyaml>=5.4.1",
     ],
+    extras_require={
+        "lxml": ["lxml>=4.6.0"],
+        "parquet": ["pyarrow>=7.0.0"],
+        "redis": ["redis>=4.0.0"],
+        "postgres": ["psycopg2-binary>=2.8"],
+        "benchmark": ["pytest-benchmark>=3.4.1"],
+    },
     author="Your Name",
     author_email="your.email@example.com",
     description="博客來書籍資訊爬蟲",
@@ -21,5 +28,5 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 ) 
\ No newline at end of file
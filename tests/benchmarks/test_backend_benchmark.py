@@ -0,0 +1,24 @@
+"""各頁面類型在 html.parser 與 lxml 下的解析量測（只解析，不經過 session 與重播）
+
+    pytest tests/benchmarks/test_backend_benchmark.py --benchmark-only
+
+加速倍數以 ``python -m books_crawler.bench parse`` 直接比較。
+"""
+import os
+import pytest
+from books_crawler.bench import PARSE_PAGES, SAMPLE_DIR
+from books_crawler.core.html_backend import available_backends
+
+pytest.importorskip('pytest_benchmark')
+
+BACKENDS = [backend for backend in ('html.parser', 'lxml') if backend in available_backends()]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('page_type', list(PARSE_PAGES))
+def test_parse_page(benchmark, page_type, backend):
+    filename, parse = PARSE_PAGES[page_type]
+    with open(os.path.join(SAMPLE_DIR, filename), 'rb') as f:
+        content = f.read()
+    assert benchmark(parse, content, backend)
+    benchmark.extra_info['page_type'] = page_type
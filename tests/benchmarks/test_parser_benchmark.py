@@ -0,0 +1,64 @@
+"""BookInfoParser 效能量測
+
+    pytest tests/benchmarks --benchmark-only
+
+records_per_sec 記錄在每個量測的 extra_info 中，可用 --benchmark-json 輸出比較。
+"""
+import os
+import pytest
+from books_crawler.core.html_backend import make_soup
+from books_crawler.core.parser import BookInfoParser, parse_meta
+
+pytest.importorskip('pytest_benchmark')
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '網頁html範例')
+
+META_TEXTS = [
+    "書名：人類大歷史（增訂版）：從野獸到扮演上帝 【簡體版書名：人類簡史】，原文名稱：Sapiens: A Brief History of Humankind，語言：繁體中文，ISBN：9789865258900，頁數：496，出版社：天下文化，作者：哈拉瑞，譯者：林俊宏，出版日期：2022/10/27，類別：人文社科",
+    "書名：人類大歷史 【簡體版書名：人類簡史】，原文名稱：Sapiens，語言：繁體中文，ISBN：9789865258900，出版社：天下文化",
+    "書名：世界上最透明的故事（日本出版界話題作，只有紙本書可以體驗的感動），原文名稱：世界でいちばん透きとおった物語，語言：繁體中文，ISBN：9789573342076，頁數：240，出版社：皇冠，作者：杉井光，譯者：簡捷，出版日期：2024/09/30，類別：文學小說",
+]
+
+BATCH_SIZE = 1000
+
+
+def _sample_meta_texts():
+    """範例頁面中的實際 meta description"""
+    with open(os.path.join(SAMPLE_DIR, '書籍單頁B版.html'), encoding='utf-8') as f:
+        soup = make_soup(f.read())
+    return [soup.find('meta', attrs={'name': 'description'}).get('content')]
+
+
+@pytest.fixture(scope='module')
+def batch():
+    texts = META_TEXTS + _sample_meta_texts()
+    return [texts[i % len(texts)] for i in range(BATCH_SIZE)]
+
+
+def _record_throughput(benchmark, count):
+    benchmark.extra_info['records'] = count
+    benchmark.extra_info['records_per_sec'] = round(count / benchmark.stats.stats.mean)
+
+
+def test_parse_many(benchmark, batch):
+    results = benchmark(BookInfoParser.parse_many, batch)
+    assert all(result['title'] for result in results)
+    _record_throughput(benchmark, len(batch))
+
+
+def test_parse_book_info_per_record(benchmark, batch):
+    parser = BookInfoParser()
+
+    def parse_each():
+        for meta_text in batch:
+            parser.set_meta_text(meta_text)
+            parser.parse_book_info()
+
+    benchmark(parse_each)
+    _record_throughput(benchmark, len(batch))
+
+
+def test_parse_meta_single(benchmark):
+    result = benchmark(parse_meta, META_TEXTS[0])
+    assert result['simplified_title'] == '人類簡史'
+    _record_throughput(benchmark, 1)
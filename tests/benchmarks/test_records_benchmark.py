@@ -0,0 +1,74 @@
+"""紀錄型別與 dict 的序列化量測
+
+    pytest tests/benchmarks/test_records_benchmark.py --benchmark-only
+
+峰值記憶體以 ``python -m books_crawler.bench records`` 在獨立子程序中量測。
+"""
+import csv
+import io
+import json
+import pytest
+from books_crawler.core.records import RankingEntry, to_arrow, write_csv, write_jsonl
+
+pytest.importorskip('pytest_benchmark')
+
+BATCH_SIZE = 10000
+
+
+def _row(i):
+    return {
+        'rank': i % 100 + 1, 'title': f'書名{i}', 'url': f'https://www.books.com.tw/products/{i:010d}',
+        'book_id': f'{i:010d}', 'author': f'作者{i % 500}', 'img_url': f'https://im1.book.com.tw/{i}.jpg',
+        'discount': '79', 'price': str(200 + i % 300), 'timestamp': '2024-10-24 10:00:00',
+    }
+
+
+@pytest.fixture(scope='module')
+def dicts():
+    return [_row(i) for i in range(BATCH_SIZE)]
+
+
+@pytest.fixture(scope='module')
+def records(dicts):
+    return [RankingEntry.from_dict(row) for row in dicts]
+
+
+def _record_throughput(benchmark):
+    benchmark.extra_info['records_per_sec'] = round(BATCH_SIZE / benchmark.stats.stats.mean)
+
+
+def test_jsonl_dict(benchmark, dicts):
+    benchmark(lambda: [json.dumps(row, ensure_ascii=False) for row in dicts])
+    _record_throughput(benchmark)
+
+
+def test_jsonl_record(benchmark, records):
+    benchmark(write_jsonl, records, io.StringIO(), RankingEntry)
+    _record_throughput(benchmark)
+
+
+def test_csv_dict(benchmark, dicts):
+    def run():
+        writer = csv.DictWriter(io.StringIO(), fieldnames=list(dicts[0]))
+        writer.writeheader()
+        writer.writerows(dicts)
+    benchmark(run)
+    _record_throughput(benchmark)
+
+
+def test_csv_record(benchmark, records):
+    benchmark(lambda: write_csv(records, io.StringIO(), RankingEntry))
+    _record_throughput(benchmark)
+
+
+def test_arrow_dict(benchmark, dicts):
+    pa = pytest.importorskip('pyarrow')
+    benchmark(pa.Table.from_pylist, dicts)
+    _record_throughput(benchmark)
+
+
+def test_arrow_record(benchmark, records):
+    pytest.importorskip('pyarrow')
+    table = benchmark(to_arrow, records, RankingEntry)
+    assert table.num_rows == BATCH_SIZE
+    _record_throughput(benchmark)
@@ -0,0 +1,45 @@
+"""多個測試模組共用的假連線與測試資料"""
+from urllib.parse import parse_qs, urlparse
+
+BASE_URL = "https://www.books.com.tw/web/books_bmidm_1208/?o=1&v=1"
+
+def page_html(page, total_pages):
+    items = ''.join(
+        f'<div class="item"><h4><a href="https://www.books.com.tw/products/{page:03d}{i:07d}">書{page}-{i}</a></h4></div>'
+        for i in range(2)
+    )
+    return f'<html>{items}<div class="cnt_page"><span>{total_pages}</span></div></html>'
+
+class FakeResponse:
+
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+class FakeSession:
+
+    def __init__(self, total_pages, failing_pages=()):
+        self.total_pages = total_pages
+        self.failing_pages = set(failing_pages)
+
+    def get(self, url, headers=None, timeout=None):
+        page = int(parse_qs(urlparse(url).query).get('page', ['1'])[0])
+        if page in self.failing_pages:
+            return FakeResponse('', 503)
+        return FakeResponse(page_html(page, self.total_pages))
+
+CATEGORIES = [{
+    'name': '文學小說',
+    'subcategories': [
+        {'name': '翻譯文學', 'link': 'https://www.books.com.tw/web/books_bmidm_0101/?o=1', 'subcategories': [
+            {'name': '日本文學', 'link': 'https://www.books.com.tw/web/sys_bbotm/books/010101/'},
+            {'name': '韓國文學', 'link': 'https://www.books.com.tw/web/sys_bbotm/books/010109/'},
+        ]},
+        {'name': '華文創作', 'link': 'https://www.books.com.tw/web/books_bmidm_0102/?o=1', 'subcategories': []},
+    ]
+}]
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from books_crawler.core.http_cache import CachingAdapter
+from books_crawler.core.replay import ReplayAdapter, sample_store
+from books_crawler.core.resources import SharedResources
+from books_crawler.scrapers import bestseller_scraper
+from books_crawler.scrapers.bestseller_scraper import BestsellerScraper, enrich_rankings, run_bestsellers
+from books_crawler.scrapers.detail_scraper import BookDetailScraper
+
+class TestEnrichRankings(unittest.TestCase):
+    """以內附範例頁面重播，兩個榜單的書籍重複時每本書只抓取一次書籍頁面"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {
+            'base_dir': self.tmp.name,
+            'replay': {'mode': 'replay'},
+            'parser_backend': 'html.parser',
+            'seen_index': {'enabled': True},
+        }
+        self.resources = SharedResources(self.config, ua_pool_size=1)
+
+    def tearDown(self):
+        self.resources.close()
+        self.tmp.cleanup()
+
+    def test_details_fetched_once_per_book(self):
+        rankings = {
+            category: BestsellerScraper(category, url, self.config, resources=self.resources).get_bestsellers()
+            for category, url in [
+                ('7日', 'https://www.books.com.tw/web/sys_saletopb/books/?attribute=7'),
+                ('30日', 'https://www.books.com.tw/web/sys_saletopb/books/?attribute=30'),
+            ]
+        }
+        adapter = self.resources.session.get_adapter('https://')
+        served = adapter.served
+        detail_scraper = BookDetailScraper(self.config, resources=self.resources)
+        # 近期抓取過的書籍仍要補上資料
+        detail_scraper.seen_index.record('0011003391', {}, now=9e9)
+        enriched = enrich_rankings(rankings, detail_scraper)
+
+        self.assertEqual(adapter.served - served, 2)
+        for rows in enriched.values():
+            self.assertEqual([row['rank'] for row in rows], [1, 100])
+            for row in rows:
+                # 排行本身的欄位優先，其餘為書籍頁面的資料
+                self.assertEqual(row['isbn'], '9789861799049')
+                self.assertIn('detail_category', row)
+            self.assertEqual(rows[0]['book_id'], '0011003391')
+
+class TestEnrichCache(unittest.TestCase):
+
+    def test_second_enrichment_is_served_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {
+                'base_dir': tmp, 'parser_backend': 'html.parser', 'detail': {'stream': True},
+                'cache': {'enabled': True, 'ttl': [{'pattern': '/products/', 'seconds': 604800}]},
+            }
+            resources = SharedResources(config, ua_pool_size=1, sleep=lambda seconds: None)
+            origin = ReplayAdapter(sample_store())
+            resources.session.mount('https://', CachingAdapter(resources.http_cache, origin))
+            rankings = {'榜': [{'rank': 1, 'book_id': '0011003391'}]}
+            detail_scraper = BookDetailScraper(config, resources=resources)
+
+            first = enrich_rankings(rankings, detail_scraper)
+            served = origin.served
+            second = enrich_rankings(rankings, detail_scraper)
+            self.assertEqual(origin.served, served)
+            self.assertEqual(first, second)
+            self.assertEqual(second['榜'][0]['isbn'], '9789861799049')
+            resources.close()
+
+class TestRunBestsellers(unittest.TestCase):
+
+    def test_failed_enrichment_saves_plain_rankings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {
+                'base_dir': tmp, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+                'output_formats': ['history'], 'history': {'path': os.path.join(tmp, 'history.sqlite')},
+                'enrich_details': True,
+                'urls': [{'category': '榜', 'url': 'https://www.books.com.tw/web/sys_saletopb/books/01/'}],
+            }
+            resources = SharedResources(config, ua_pool_size=1)
+            with mock.patch.object(bestseller_scraper, 'enrich_rankings', side_effect=RuntimeError("失敗")):
+                run_bestsellers(config, resources)
+            history = bestseller_scraper.RankingHistory(config['history']['path'])
+            self.assertEqual(len(history.runs('榜')), 1)
+            history.close()
+            resources.close()
+
+    def test_json_and_csv_outputs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {
+                'base_dir': tmp, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+                'output_formats': ['json', 'csv'],
+                'urls': [{'category': '榜', 'url': 'https://www.books.com.tw/web/sys_saletopb/books/01/'}],
+            }
+            resources = SharedResources(config, ua_pool_size=1)
+            run_bestsellers(config, resources)
+            resources.close()
+            names = os.listdir(os.path.join(tmp, 'output'))
+            self.assertEqual(sorted(os.path.splitext(name)[1] for name in names), ['.csv', '.json'])
+
+    def test_interrupted_crawl_saves_without_enrichment(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = 'https://www.books.com.tw/web/sys_saletopb/books/01/'
+            config = {
+                'base_dir': tmp, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+                'output_formats': ['history'], 'history': {'path': os.path.join(tmp, 'history.sqlite')},
+                'enrich_details': True,
+                'urls': [{'category': '榜', 'url': url}, {'category': '中斷', 'url': url}],
+            }
+            get_bestsellers = bestseller_scraper.BestsellerScraper.get_bestsellers
+
+            def interrupt(scraper):
+                if scraper.category == '中斷':
+                    raise KeyboardInterrupt
+                return get_bestsellers(scraper)
+
+            resources = SharedResources(config, ua_pool_size=1)
+            with mock.patch.object(bestseller_scraper, 'enrich_rankings') as enrich, \
+                    mock.patch.object(bestseller_scraper.BestsellerScraper, 'get_bestsellers', interrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    run_bestsellers(config, resources)
+            enrich.assert_not_called()
+            history = bestseller_scraper.RankingHistory(config['history']['path'])
+            self.assertEqual(len(history.runs('榜')), 1)
+            history.close()
+            resources.close()
+
+    def test_changes_are_detected_before_enrichment(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state_path = os.path.join(tmp, 'ranking_state.json')
+            config = {
+                'base_dir': tmp, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+                'output_formats': [], 'enrich_details': True,
+                'change_events': {'enabled': True, 'state': state_path},
+                'urls': [{'category': '榜', 'url': 'https://www.books.com.tw/web/sys_saletopb/books/01/'}],
+            }
+            seen = []
+
+            def enrich(rankings, detail_scraper):
+                seen.append(os.path.exists(state_path))
+                return rankings
+
+            resources = SharedResources(config, ua_pool_size=1)
+            with mock.patch.object(bestseller_scraper, 'enrich_rankings', side_effect=enrich):
+                run_bestsellers(config, resources)
+            resources.close()
+            self.assertEqual(seen, [True])
+
+if __name__ == '__main__':
+    unittest.main()
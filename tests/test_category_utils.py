@@ -0,0 +1,77 @@
+import copy
+import tempfile
+import unittest
+from books_crawler.core.resources import SharedResources
+from books_crawler.scrapers.list_scraper import changed_category_units
+from books_crawler.utils.category_utils import CategoryGenerator, diff_categories, iter_units, plan_work
+
+def tree(*units):
+    return [{'name': '中文書', 'link': '/web/books_bmidm_01/', 'subcategories': [
+        {'name': '文學', 'link': '/web/books_bmidm_0101/', 'subcategories': [
+            {'name': name, 'link': f'https://www.books.com.tw{path}?loc=P_{index}', 'total_pages': pages}
+            for index, (name, path, pages) in enumerate(units)
+        ]},
+    ]}]
+
+class TestCategoryDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {'base_dir': self.tmp.name, 'replay': {'mode': 'replay'}}
+        self.resources = SharedResources(self.config, ua_pool_size=1)
+
+    def tearDown(self):
+        self.resources.close()
+        self.tmp.cleanup()
+
+    def test_discover_records_pages_and_reuses_fresh_units(self):
+        generator = CategoryGenerator('lxml', self.config, self.resources)
+        adapter = self.resources.session.get_adapter('https://')
+        categories, changes = generator.discover(now=1_000_000)
+        units = list(iter_units(categories))
+        self.assertEqual(adapter.served, 1 + len(units))
+        self.assertEqual(len(changes['added']), len(units))
+        self.assertEqual((units[0]['total_pages'], units[0]['items_per_page']), (17, 100))
+
+        # 沿用上一次的結果時只重新讀取分類目錄；網址的追蹤參數不同仍視為同一個分類
+        previous = copy.deepcopy(categories)
+        previous[0]['subcategories'][0]['subcategories'][0]['link'] += '&x=1'
+        removed = previous[0]['subcategories'].pop()
+        served = adapter.served
+        categories, changes = generator.discover(previous, now=1_000_000 + 3600)
+        probed = len(list(iter_units([{'subcategories': [removed]}])))
+        self.assertEqual(adapter.served - served, 1 + probed)
+        self.assertEqual(changes, {'added': changes['added'], 'removed': [], 'changed': []})
+        self.assertEqual(len(changes['added']), probed)
+
+class TestCategoryPlanning(unittest.TestCase):
+
+    def test_diff(self):
+        before = tree(('日本文學', '/web/sys_bbotm/books/010101/', 5), ('韓國文學', '/web/sys_bbotm/books/010109/', 3))
+        after = tree(('日本文學', '/web/sys_bbotm/books/010101/', 6), ('亞洲文學', '/web/sys_bbotm/books/010102/', 2))
+        self.assertEqual(diff_categories(before, after), {
+            'added': ['/web/sys_bbotm/books/010102'],
+            'removed': ['/web/sys_bbotm/books/010109'],
+            'changed': ['/web/sys_bbotm/books/010101'],
+        })
+
+    def test_leaf_change_selects_crawl_unit(self):
+        before = tree(('日本文學', '/web/sys_bbotm/books/010101/', 5))
+        after = tree(('日本文學', '/web/sys_bbotm/books/010101/', 5), ('亞洲文學', '/web/sys_bbotm/books/010102/', 2))
+        changes = diff_categories(before, after)
+        changed = set(changes['added']) | set(changes['changed'])
+        # 預設以第二層分類爬取，新增的葉分類選取其所屬的第二層分類
+        self.assertEqual(list(changed_category_units(after, changed)), [('文學', '/web/books_bmidm_0101/')])
+        self.assertEqual(
+            list(changed_category_units(after, changed, include_leaves=True)),
+            [('文學_亞洲文學', 'https://www.books.com.tw/web/sys_bbotm/books/010102/?loc=P_1')]
+        )
+
+    def test_plan_balances_pages(self):
+        categories = tree(*[(f'分類{i}', f'/web/sys_bbotm/books/{i}/', pages) for i, pages in enumerate([7, 6, 4, 3])])
+        plans = plan_work(categories, 2)
+        self.assertEqual(sorted(plan['pages'] for plan in plans), [10, 10])
+        self.assertEqual(sum(len(plan['units']) for plan in plans), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from books_crawler.core.change_events import ChangeDetector, ChangeStream, RankingState, WebhookSink
+
+def entry(book_id, rank, price='300', discount='79'):
+    return {'book_id': book_id, 'rank': str(rank), 'title': f'書{book_id}', 'price': price, 'discount': discount}
+
+class FakeSession:
+
+    def __init__(self, fail=False):
+        self.posts = []
+        self.fail = fail
+
+    def post(self, url, json=None, timeout=None):
+        if self.fail:
+            raise ConnectionError("連線失敗")
+        self.posts.append((url, json))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+class TestChangeDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state = RankingState(os.path.join(self.tmp.name, 'state.json'))
+        self.detector = ChangeDetector(self.state, rank_threshold=5, top_n=10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_first_run_only_builds_state(self):
+        self.assertEqual(self.detector.diff('榜', [entry('A', 1), entry('B', 2)]), [])
+        self.assertEqual(self.state.lists['榜'], {'A': [1, 300, 79], 'B': [2, 300, 79]})
+
+    def test_events(self):
+        self.detector.diff('榜', [entry('A', 1), entry('B', 2), entry('C', 3), entry('D', 20)])
+        events = self.detector.diff('榜', [
+            entry('A', 2), entry('B', 12, price='250'), entry('E', 1), entry('F', 30), entry('D', 20, price='未知'),
+        ])
+        by_type = {(event['type'], event['book_id']): event for event in events}
+        self.assertEqual(set(by_type), {
+            ('rank_change', 'B'), ('price_change', 'B'), ('new_entry', 'E'), ('dropped', 'C'),
+        })
+        self.assertEqual(by_type[('rank_change', 'B')]['delta'], -10)
+        self.assertEqual(by_type[('price_change', 'B')]['previous_price'], 300)
+        self.assertEqual(by_type[('dropped', 'C')]['previous_rank'], 3)
+
+    def test_short_list_skips_dropped(self):
+        self.detector.diff('榜', [entry(book_id, rank) for rank, book_id in enumerate('ABCDEF', 1)])
+        with self.assertLogs('ChangeDetector', level='WARNING'):
+            events = self.detector.diff('榜', [entry('A', 1), entry('G', 2)])
+        self.assertEqual([(event['type'], event['book_id']) for event in events], [('new_entry', 'G')])
+        self.assertEqual(len(self.state.lists['榜']), 7)
+        events = self.detector.diff('榜', [entry(book_id, rank) for rank, book_id in enumerate('ABCDEG', 1)])
+        self.assertEqual([(event['type'], event['book_id']) for event in events], [('dropped', 'F')])
+
+    def test_state_snapshot_round_trip(self):
+        self.detector.diff('榜', [entry('A', 1)])
+        self.state.save()
+        state = RankingState(self.state.path)
+        self.assertEqual(ChangeDetector(state).diff('榜', [entry('A', 1, price='200')])[0]['type'], 'price_change')
+
+class TestChangeStream(unittest.TestCase):
+
+    def test_stream_writes_jsonl_and_webhook(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {'base_dir': tmp, 'change_events': {'enabled': True, 'webhook': 'https://example.com/hook'}}
+            stream = ChangeStream.from_config(config)
+            session = FakeSession()
+            stream.sinks[1].session = session
+            stream.process('榜', [entry('A', 1)])
+            stream.process('榜', [entry('B', 1)])
+            stream.close()
+
+            with open(os.path.join(tmp, 'output', 'ranking_events.jsonl'), encoding='utf-8') as f:
+                events = [json.loads(line) for line in f]
+            self.assertEqual([event['type'] for event in events], ['new_entry', 'dropped'])
+            self.assertEqual(len(session.posts), 1)
+            self.assertEqual(len(session.posts[0][1]), 2)
+            self.assertTrue(os.path.exists(os.path.join(tmp, 'ranking_state.json')))
+
+    def test_disabled(self):
+        self.assertIsNone(ChangeStream.from_config({}))
+
+    def test_webhook_failure_is_logged(self):
+        sink = WebhookSink('https://example.com/hook', session=FakeSession(fail=True))
+        sink.write_many([{'type': 'dropped'}])
+        with self.assertLogs('WebhookSink', level='ERROR'):
+            sink.flush()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from books_crawler.core.database import BookDatabase, open_database
+
+class TestBookDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'books.sqlite')
+        self.db = open_database(f'sqlite:///{self.path}', batch_size=3)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def query(self, sql):
+        return sqlite3.connect(self.path).execute(sql).fetchall()
+
+    def test_books_upsert_keeps_known_fields(self):
+        self.db.add_books([{'product_name': '書名', 'url': 'https://www.books.com.tw/products/0011001522?loc=x'}])
+        self.db.flush()
+        self.db.add_books([{'book_id': '0011001522', 'isbn': '9789861799049', 'pages': '64', 'author': '未知'}])
+        self.db.flush()
+        self.assertEqual(
+            self.query('SELECT book_id, title, isbn, pages, author FROM books'),
+            [('0011001522', '書名', '9789861799049', 64, None)]
+        )
+
+    def test_batches_flush_automatically(self):
+        rows = [
+            {'rank': rank, 'book_id': f'B{rank}', 'title': f'書{rank}', 'price': '未知', 'discount': '79',
+             'timestamp': '2024-10-24 10:00:00'}
+            for rank in range(1, 5)
+        ]
+        self.db.add_ranking('總榜', rows)
+        self.assertEqual(self.db.pending, 0)
+        # 重新寫入同一次執行只更新，不會重複
+        self.db.add_ranking('總榜', rows[:1])
+        self.db.flush()
+        self.assertEqual(self.query('SELECT COUNT(*), MIN(price), MAX(discount) FROM rankings'), [(4, None, 79)])
+
+    def test_categories_replace_per_book(self):
+        self.db.add_categories('0011001522', [['中文書', '藝術'], ['中文書', '繪本', '翻譯']])
+        self.db.flush()
+        self.db.add_categories('0011001522', [['生活風格']])
+        self.db.add_series('0011001520', [{'name': '博客來', 'data': [['2024-10-01', 3], ['2024-10-02', 2]]}])
+        self.db.flush()
+        self.assertEqual(self.query('SELECT path_index, depth, name FROM book_categories'), [(0, 0, '生活風格')])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM chiming_series'), [(2,)])
+
+    def test_from_config(self):
+        self.assertIsNone(BookDatabase.from_config({}))
+
+if __name__ == '__main__':
+    unittest.main()
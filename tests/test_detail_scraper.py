@@ -0,0 +1,35 @@
+import os
+import unittest
+from books_crawler.core.html_backend import make_soup
+from books_crawler.scrapers.detail_scraper import BookDetailScraper, detail_fragment, parse_detail_html
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '網頁html範例')
+
+class TestDetailFragment(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(SAMPLE_DIR, '書籍單頁B版.html'), 'rb') as f:
+            self.content = f.read()
+
+    def test_fragment_parses_same_as_full_page(self):
+        scraper = BookDetailScraper.parser()
+        scraper.soup = make_soup(self.content)
+        result = parse_detail_html(self.content)
+        self.assertEqual(result['book_info'], scraper.extract_basic_info())
+        self.assertEqual(result['categories'], scraper.extract_category_detail())
+        self.assertEqual(result['categories']['detail_category'][0], ['生活風格', '圖文書_繪本', '翻譯圖文書_繪本'])
+
+    def test_head_only(self):
+        fragment = detail_fragment(self.content, include_categories=False)
+        self.assertTrue(fragment.endswith(b'</head>'))
+        self.assertLess(len(fragment), len(self.content) // 50)
+        result = parse_detail_html(self.content, include_categories=False)
+        self.assertEqual(result['book_info']['isbn'], '9789861799049')
+        self.assertNotIn('categories', result)
+
+    def test_missing_markers_keep_full_content(self):
+        content = b'<html><body><ul class="other"></ul></body></html>'
+        self.assertEqual(detail_fragment(content), content)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import io
+import os
+import tempfile
+import unittest
+import requests
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from books_crawler.core.dead_letter import DeadLetterList
+from books_crawler.core.resources import read_yaml_config
+from books_crawler.core.fetcher import DEFAULT_RATE, RETRY_STATUSES, AsyncFetcher, HostRateLimiter, RetryPolicy, TokenBucket, read_until
+
+class FakeResponse:
+
+    def __init__(self, url, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.text = f"<html>{url}</html>"
+        self.content = self.text.encode('utf-8')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+class FakeSession:
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested.append(url)
+        return FakeResponse(url, 500 if url in self.failing else 200)
+
+class CountingStream(io.BytesIO):
+    """記錄實際讀取位元組數的回應內容"""
+
+    def __init__(self, body):
+        super().__init__(body)
+        self.bytes_read = 0
+
+    def read(self, size=-1, **kwargs):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+def streamed_response(body):
+    response = Response()
+    response.status_code = 200
+    response.raw = CountingStream(body)
+    return response
+
+class TestReadUntil(unittest.TestCase):
+
+    def test_stops_after_last_marker(self):
+        body = b'<html><head><meta></head><body>' + b'x' * 100000 + b'<ul class="sort"><li>a</li></ul>' + b'y' * 100000
+        response = read_until(streamed_response(body), (b'</head>',), chunk_size=1024)
+        self.assertEqual(response.content, b'<html><head><meta></head>')
+        self.assertEqual(response.raw.bytes_read, 1024)
+
+        response = read_until(streamed_response(body), (b'</head>', b'<ul class="sort"', b'</ul>'), chunk_size=7)
+        self.assertTrue(response.content.endswith(b'<ul class="sort"><li>a</li></ul>'))
+        self.assertLess(response.raw.bytes_read, len(body))
+
+    def test_reads_everything_when_marker_missing(self):
+        body = b'<html><body>no head end</body></html>'
+        response = read_until(streamed_response(body), (b'</head>',), chunk_size=4)
+        self.assertEqual(response.content, body)
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_first_request_is_free_then_waits(self):
+        bucket = TokenBucket(rate=0.5)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 2.0, places=1)
+        self.assertAlmostEqual(bucket.reserve(), 4.0, places=1)
+
+    def test_hosts_have_separate_budgets(self):
+        limiter = HostRateLimiter({'default': 1, 'www.chimingpublishing.com': 0.25})
+        self.assertEqual(limiter.reserve('https://www.books.com.tw/a'), 0.0)
+        self.assertEqual(limiter.reserve('https://www.chimingpublishing.com/a'), 0.0)
+        self.assertAlmostEqual(limiter.reserve('https://www.books.com.tw/b'), 1.0, places=1)
+        self.assertAlmostEqual(limiter.reserve('https://www.chimingpublishing.com/b'), 4.0, places=1)
+
+class TestAsyncFetcher(unittest.TestCase):
+
+    def test_iter_fetch_returns_every_url(self):
+        urls = [f"https://example.com/{i}" for i in range(5)]
+        session = FakeSession(failing={urls[2]})
+        fetcher = AsyncFetcher(session, rate_limiter=HostRateLimiter({'default': 1000}), concurrency=3)
+        results = {result.url: result for result in fetcher.iter_fetch(urls)}
+        self.assertEqual(set(results), set(urls))
+        self.assertIsNotNone(results[urls[2]].error)
+        self.assertEqual(results[urls[0]].response.text, f"<html>{urls[0]}</html>")
+
+def status_response(status_code, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = b'<html></html>'
+    return response
+
+class ScriptedSession:
+    """依序回傳預先排定的狀態碼，例外物件則直接拋出"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        item = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(item, Exception):
+            raise item
+        return status_response(*item) if isinstance(item, tuple) else status_response(item)
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = HostRateLimiter(
+            {'default': 0.5},
+            adaptive={'max_rate': 0.6, 'min_rate': 0.1, 'increase': 0.05, 'decrease': 0.5, 'slow_latency': 5}
+        )
+        self.url = 'https://www.books.com.tw/a'
+
+    def test_additive_increase_until_max_rate(self):
+        self.limiter.observe(self.url, 0.2, 200)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.55)
+        for _ in range(5):
+            self.limiter.observe(self.url, 0.2, 200)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.6)
+
+    def test_default_max_rate_stays_polite(self):
+        limiter = HostRateLimiter(adaptive={'enabled': True})
+        for _ in range(100):
+            limiter.observe(self.url, 0.2, 200)
+        self.assertAlmostEqual(limiter.rate(self.url), DEFAULT_RATE)
+
+    def test_shipped_configs_do_not_speed_up(self):
+        config_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'books_crawler', 'config')
+        for filename in ('config.yaml', 'book_bestseller_scraper_config.yaml'):
+            fetch_config = read_yaml_config(os.path.join(config_dir, filename))['fetch']
+            self.assertFalse(fetch_config['adaptive']['enabled'])
+            self.assertLessEqual(fetch_config['adaptive']['max_rate'], fetch_config['rate_limits']['default'])
+
+    def test_multiplicative_decrease_on_throttle_or_slow_response(self):
+        self.limiter.observe(self.url, 0.2, 503)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.25)
+        self.limiter.observe(self.url, 8.0, 200)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.125)
+        self.limiter.observe(self.url, 0.2, 429)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.1)
+        # 404 不是壅塞訊號
+        self.limiter.observe(self.url, 0.2, 404)
+        self.assertAlmostEqual(self.limiter.rate(self.url), 0.1)
+
+    def test_retry_after_pauses_host_even_without_adaptive(self):
+        limiter = HostRateLimiter({'default': 100})
+        limiter.observe(self.url, 0.1, 503, retry_after=30)
+        self.assertAlmostEqual(limiter.reserve(self.url), 30, places=0)
+        self.assertEqual(limiter.reserve('https://www.chimingpublishing.com/a'), 0.0)
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dead_letters = DeadLetterList(os.path.join(self.tmp.name, 'dead_letters.jsonl'))
+        self.sleeps = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetcher(self, session, **policy):
+        return AsyncFetcher(
+            session, rate_limiter=HostRateLimiter({'default': 1000}),
+            retry_policy=RetryPolicy(base_delay=1, **policy),
+            dead_letters=self.dead_letters, sleep=self.sleeps.append
+        )
+
+    def test_transient_errors_are_retried_with_retry_after(self):
+        session = ScriptedSession([(503, {'Retry-After': '7'}), requests.ConnectionError('reset'), 200])
+        response = self.fetcher(session).fetch('https://www.books.com.tw/a')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.calls, 3)
+        self.assertIn(7, self.sleeps)
+        self.assertEqual(self.dead_letters.entries(), [])
+
+    def test_exhausted_and_permanent_failures_go_to_dead_letters(self):
+        with self.assertRaises(requests.HTTPError):
+            self.fetcher(ScriptedSession([502]), max_attempts=3).fetch('https://www.books.com.tw/products/1')
+        with self.assertRaises(requests.HTTPError):
+            self.fetcher(ScriptedSession([404])).fetch('https://www.books.com.tw/products/2')
+        entries = self.dead_letters.entries()
+        self.assertEqual([(e['status'], e['attempts']) for e in entries], [(502, 3), (404, 1)])
+        self.assertEqual(self.dead_letters.pop_all('/products/1'), ['https://www.books.com.tw/products/1'])
+        self.assertEqual(len(self.dead_letters.entries()), 1)
+
+    def test_permanent_failures_are_not_retried(self):
+        self.dead_letters.add('https://www.books.com.tw/products/1', 'gone', 410)
+        self.dead_letters.add('https://www.books.com.tw/products/2', 'busy', 503)
+        self.dead_letters.add('https://www.books.com.tw/products/3', requests.ConnectionError('reset'))
+        self.assertEqual(self.dead_letters.pop_all('/products/', statuses=RETRY_STATUSES), [
+            'https://www.books.com.tw/products/2', 'https://www.books.com.tw/products/3',
+        ])
+        self.assertEqual([entry['status'] for entry in self.dead_letters.entries()], [410])
+
+    def test_retry_budget_limits_total_retries(self):
+        fetcher = self.fetcher(ScriptedSession([503]), max_attempts=5, min_retries=2, budget_ratio=0)
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                fetcher.fetch('https://www.books.com.tw/a')
+        self.assertEqual(fetcher.retry_policy.retries, 2)
+        self.assertEqual(fetcher.session.calls, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from books_crawler.core.frontier import DONE, FAILED, PENDING, CrawlFrontier
+from books_crawler.scrapers.list_scraper import BookListScraper, crawl_frontier, iter_category_units
+from tests.helpers import CATEGORIES, FakeSession
+
+class TestCrawlFrontier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.frontier = CrawlFrontier(os.path.join(self.tmp.name, 'frontier.sqlite'))
+        self.frontier.reset()
+
+    def tearDown(self):
+        self.frontier.close()
+        self.tmp.cleanup()
+
+    def test_iter_category_units_with_leaves(self):
+        self.assertEqual([name for name, _ in iter_category_units(CATEGORIES)], ['翻譯文學', '華文創作'])
+        self.assertEqual(
+            [name for name, _ in iter_category_units(CATEGORIES, include_leaves=True)],
+            ['翻譯文學_日本文學', '翻譯文學_韓國文學', '華文創作']
+        )
+
+    def test_recover_requeues_in_flight_units(self):
+        self.frontier.add_many([('翻譯文學', 1, 'u1'), ('華文創作', 1, 'u2')])
+        first, second = self.frontier.claim(2)
+        self.frontier.mark_done(first.category, first.page)
+
+        reopened = CrawlFrontier(self.frontier.path, max_attempts=2)
+        self.assertTrue(reopened.has_unfinished())
+        self.assertEqual(reopened.recover(), 1)
+        unit, = reopened.claim(5)
+        self.assertEqual((unit.category, unit.attempts), ('華文創作', 2))
+        reopened.mark_failed(unit.category, unit.page)
+        self.assertFalse(reopened.has_unfinished())
+        self.assertEqual(reopened.counts(), {PENDING: 0, 'in_flight': 0, DONE: 1, FAILED: 1})
+        reopened.close()
+
+    def test_crawl_frontier_expands_pages_and_resumes(self):
+        config = {'base_dir': self.tmp.name, 'fetch': {'rate_limits': {'default': 1000}}}
+        scraper = BookListScraper(None, None, config)
+        scraper.session = FakeSession(total_pages=3, failing_pages={3})
+        self.frontier.add_many((name, 1, link) for name, link in iter_category_units(CATEGORIES))
+
+        crawl_frontier(scraper, self.frontier, batch_size=4)
+        self.assertEqual(self.frontier.counts()[DONE], 4)
+        self.assertEqual(self.frontier.counts()[FAILED], 2)
+
+        scraper.session.failing_pages.clear()
+        self.frontier.recover()
+        crawl_frontier(scraper, self.frontier, batch_size=4)
+        self.assertEqual(self.frontier.counts()[DONE], 6)
+
+        path = os.path.join(scraper.output_dir, f'翻譯文學_category_book_list_{self.frontier.crawl_id}.jsonl')
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(len([json.loads(line) for line in f]), 6)
+
+    def test_units_marked_done_after_database_commit(self):
+        class FailingDatabase:
+            def add_books(self, records):
+                pass
+
+            def flush(self):
+                raise RuntimeError("寫入失敗")
+
+        config = {'base_dir': self.tmp.name, 'fetch': {'rate_limits': {'default': 1000}}}
+        scraper = BookListScraper(None, None, config)
+        scraper.session = FakeSession(total_pages=1)
+        self.frontier.add_many((name, 1, link) for name, link in iter_category_units(CATEGORIES))
+
+        with self.assertRaises(RuntimeError):
+            crawl_frontier(scraper, self.frontier, batch_size=4, database=FailingDatabase())
+        self.assertEqual(self.frontier.counts()[DONE], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import unittest
+from books_crawler.bench import bench_parse
+from books_crawler.core.html_backend import available_backends, make_soup
+from books_crawler.scrapers.bestseller_scraper import parse_bestseller_html
+from books_crawler.scrapers.detail_scraper import parse_detail_html
+from books_crawler.scrapers.list_scraper import parse_list_html
+from books_crawler.utils.category_utils import CategoryGenerator
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '網頁html範例')
+
+def read_sample(filename):
+    with open(os.path.join(SAMPLE_DIR, filename), 'rb') as f:
+        return f.read()
+
+def without_timestamp(result):
+    return [{k: v for k, v in book.items() if k != 'timestamp'} for book in result['books']]
+
+@unittest.skipUnless('lxml' in available_backends(), "未安裝 lxml")
+class TestBackendParity(unittest.TestCase):
+
+    def assertParity(self, parse):
+        expected = parse('html.parser')
+        self.assertTrue(expected)
+        self.assertEqual(parse('lxml'), expected)
+
+    def test_bestseller_layouts(self):
+        content = read_sample('排行榜ＡＢ版範例20241024.html')
+        self.assertParity(lambda backend: without_timestamp(parse_bestseller_html(content, backend=backend)))
+
+    def test_list_page_a(self):
+        content = read_sample('書籍頁面列表範例.html')
+        self.assertParity(lambda backend: parse_list_html(content, first_page=True, backend=backend))
+
+    def test_list_page_b(self):
+        content = read_sample('書籍頁面列表Ｂ版.html')
+        result = parse_list_html(content, first_page=True, backend='lxml')
+        self.assertEqual(len(result['books']), 100)
+        self.assertEqual(result['total_pages'], 17)
+        self.assertParity(lambda backend: parse_list_html(content, first_page=True, backend=backend))
+
+    def test_detail_page(self):
+        content = read_sample('書籍單頁B版.html')
+        self.assertParity(lambda backend: parse_detail_html(content, backend=backend))
+
+    def test_category_directory(self):
+        content = read_sample('書籍分類目錄20241024.html')
+        self.assertParity(lambda backend: CategoryGenerator(backend).parse_categories(make_soup(content, backend)))
+
+    def test_script_string_lookup(self):
+        html = '<html><script>var a = 1;</script><script>series: [1]</script></html>'
+        for backend in available_backends():
+            soup = make_soup(html, backend)
+            script = soup.find('script', string=lambda text: text and 'series' in text)
+            self.assertEqual(script.string, 'series: [1]')
+
+    def test_parse_bench_times_each_backend(self):
+        results = bench_parse(repeat=1, number=1, names=['bestseller'])
+        self.assertEqual(set(results['bestseller']), {'html.parser', 'lxml'})
+        self.assertTrue(all(ms > 0 for ms in results['bestseller'].values()))
+
+if __name__ == '__main__':
+    unittest.main()
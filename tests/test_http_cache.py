@@ -0,0 +1,133 @@
+import os
+import tempfile
+import time
+import unittest
+import requests
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from books_crawler.core.fetcher import AsyncFetcher
+from books_crawler.core.http_cache import CachingAdapter, HttpCache
+
+class FakeOriginAdapter(BaseAdapter):
+    """模擬支援 ETag 的伺服器"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.body = b'<html>v1</html>'
+        self.etag = '"v1"'
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = Response()
+        response.request = request
+        response.url = request.url
+        if request.headers.get('If-None-Match') == self.etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = self.body
+        response._content_consumed = True
+        response.headers = CaseInsensitiveDict({'ETag': self.etag, 'Content-Type': 'text/html; charset=utf-8'})
+        return response
+
+    def close(self):
+        pass
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = HttpCache(
+            self.tmp.name,
+            ttl_rules=[{'pattern': '/products/', 'seconds': 3600}, {'pattern': '/web/', 'seconds': 0}]
+        )
+        self.origin = FakeOriginAdapter()
+        self.session = requests.Session()
+        self.session.mount('https://', CachingAdapter(self.cache, self.origin))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_fresh_entry_is_served_without_request(self):
+        url = 'https://www.books.com.tw/products/0011003391'
+        self.assertEqual(self.session.get(url).text, '<html>v1</html>')
+        response = self.session.get(url)
+        self.assertEqual(response.text, '<html>v1</html>')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(self.origin.requests), 1)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_stale_entry_is_revalidated(self):
+        url = 'https://www.books.com.tw/web/sys_saletopb/books/'
+        self.session.get(url)
+        response = self.session.get(url)
+        self.assertEqual(self.origin.requests[-1].headers['If-None-Match'], '"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, '<html>v1</html>')
+        self.assertEqual(self.cache.stats['revalidated'], 1)
+
+        self.origin.body, self.origin.etag = b'<html>v2</html>', '"v2"'
+        self.assertEqual(self.session.get(url).text, '<html>v2</html>')
+
+    def test_streamed_fetch_caches_truncated_body(self):
+        url = 'https://www.books.com.tw/products/0011003391'
+        self.origin.body = b'<html><head>v1</head><body>' + b'x' * 100000 + b'</body></html>'
+        fetcher = AsyncFetcher(self.session, http_cache=self.cache, sleep=lambda seconds: None)
+        self.assertEqual(fetcher.fetch(url, (b'</head>',)).content, b'<html><head>v1</head>')
+        response = fetcher.fetch(url, (b'</head>',))
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.content, b'<html><head>v1</head>')
+        self.assertEqual(len(self.origin.requests), 1)
+        # 截斷的內容不會當成完整頁面回應一般請求
+        self.assertEqual(len(self.session.get(url).content), len(self.origin.body))
+
+    def test_stale_partial_entry_is_revalidated(self):
+        url = 'https://www.books.com.tw/web/sys_saletopb/books/'
+        self.origin.body = b'<html><head>v1</head><body>' + b'x' * 1000 + b'</body></html>'
+        fetcher = AsyncFetcher(self.session, http_cache=self.cache, sleep=lambda seconds: None)
+        fetcher.fetch(url, (b'</head>',))
+        response = fetcher.fetch(url, (b'</head>',))
+        self.assertEqual(self.origin.requests[-1].headers['If-None-Match'], '"v1"')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.content, b'<html><head>v1</head>')
+        self.assertEqual(self.cache.stats['revalidated'], 1)
+
+    def test_cache_hit_skips_rate_limit(self):
+        class CountingLimiter:
+            def __init__(self):
+                self.reserved, self.observed = 0, 0
+
+            def reserve(self, url):
+                self.reserved += 1
+                return 0.0
+
+            def observe(self, url, latency, status=None, retry_after=None):
+                self.observed += 1
+
+        url = 'https://www.books.com.tw/products/0011003391'
+        limiter = CountingLimiter()
+        fetcher = AsyncFetcher(self.session, rate_limiter=limiter, http_cache=self.cache, sleep=lambda seconds: None)
+        fetcher.fetch(url)
+        self.assertTrue(fetcher.fetch(url).from_cache)
+        self.assertEqual((limiter.reserved, limiter.observed), (1, 1))
+        self.assertEqual(len(self.origin.requests), 1)
+
+    def test_lru_eviction(self):
+        cache = HttpCache(os.path.join(self.tmp.name, 'small'), max_bytes=25)
+        cache.store('https://a', {}, b'x' * 10)
+        time.sleep(0.01)
+        cache.store('https://b', {}, b'x' * 10)
+        time.sleep(0.01)
+        cache.lookup('https://a')
+        cache.store('https://c', {}, b'x' * 10)
+        self.assertIsNotNone(cache.lookup('https://a'))
+        self.assertIsNone(cache.lookup('https://b'))
+        self.assertEqual(cache.stats['evicted'], 1)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from books_crawler.core.js_literal import find_property, parse_literal
+from books_crawler.scrapers.chiming_scraper import parse_chiming_html
+
+class TestJsLiteral(unittest.TestCase):
+
+    def test_highcharts_series(self):
+        script = '''
+            Highcharts.chart('chart', {
+                title: {text: '排行走勢'},  // 圖表標題
+                series: [{
+                    name: "博客來: 中文書",
+                    data: [[Date.UTC(2024, 9, 1), 3], [Date.UTC(2024, 11, 31, 8), 12],],
+                    visible: true, color: null, /* 預設 */
+                }]
+            });
+        '''
+        self.assertEqual(find_property(script, 'series'), [{
+            'name': '博客來: 中文書',
+            'data': [['2024-10-01', 3], ['2024-12-31', 12]],
+            'visible': True,
+            'color': None,
+        }])
+
+    def test_strings_are_not_rewritten(self):
+        text = """{"a": "x:y", b: 'it\\'s \\u4e2d', 0x1F: -1.5e2}"""
+        self.assertEqual(parse_literal(text), {'a': 'x:y', 'b': "it's 中", '31': -150.0})
+
+    def test_errors(self):
+        for text in ['[1, 2', '{a 1}', "'abc", 'window.foo']:
+            with self.assertRaises(ValueError):
+                parse_literal(text)
+        self.assertIsNone(find_property('var x = 1;', 'series'))
+
+    def test_decoy_property_is_skipped(self):
+        page = '''
+            <script>var legend = {series: false}; // series: 舊版走勢</script>
+            <p>series: 不在 script 中</p>
+            <script>
+                Highcharts.chart('chart', {"series": [{"name": "博客來", "data": [[Date.UTC(2024, 0, 5), 7]]}]});
+            </script>
+        '''
+        self.assertIs(find_property(page, 'series'), False)
+        self.assertEqual(
+            find_property(page, 'series', accept=lambda value: isinstance(value, list)),
+            [{'name': '博客來', 'data': [['2024-01-05', 7]]}]
+        )
+        self.assertEqual(parse_chiming_html(page.encode('utf-8')), {'series': [
+            {'name': '博客來', 'data': [['2024-01-05', 7]]}
+        ]})
+
+    def test_parse_raw_page(self):
+        content = '<script>var s = {series: [{name: "誠品", data: [[Date.UTC(2024, 0, 5), 7]]}]};</script>'.encode('utf-8')
+        self.assertEqual(parse_chiming_html(content), {'series': [{'name': '誠品', 'data': [['2024-01-05', 7]]}]})
+        self.assertEqual(parse_chiming_html(b'<html></html>'), {'series': []})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from books_crawler.scrapers.list_scraper import BookListScraper
+from tests.helpers import BASE_URL, FakeSession
+
+class TestCrawlAllPages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        config = {'base_dir': self.tmp.name, 'fetch': {'concurrency': 4, 'rate_limits': {'default': 1000}}}
+        self.scraper = BookListScraper('測試', BASE_URL, config)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parallel_matches_serial_order(self):
+        self.scraper.session = FakeSession(total_pages=6)
+        serial, _ = self.scraper.crawl_all_pages(BASE_URL)
+        parallel, _ = self.scraper.crawl_all_pages(BASE_URL, parallel=True)
+        self.assertEqual(len(parallel), 12)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(self.scraper.failed_pages, [])
+
+    def test_serial_records_failed_pages(self):
+        self.scraper.session = FakeSession(total_pages=4, failing_pages={3})
+        with self.assertLogs(self.scraper.logger.name, level='WARNING'):
+            books, _ = self.scraper.crawl_all_pages(BASE_URL)
+        self.assertEqual(self.scraper.failed_pages, [3])
+        self.assertEqual(len(books), 6)
+
+        self.scraper.session.failing_pages = {1}
+        books, metadata = self.scraper.crawl_all_pages(BASE_URL)
+        self.assertEqual((books, metadata, self.scraper.failed_pages), ([], None, [1]))
+
+    def test_parallel_returns_partial_result(self):
+        self.scraper.session = FakeSession(total_pages=5, failing_pages={3, 5})
+        books, _ = self.scraper.crawl_all_pages(BASE_URL, parallel=True)
+        self.assertEqual(self.scraper.failed_pages, [3, 5])
+        self.assertEqual([book['product_name'] for book in books][::2], ['書1-0', '書2-0', '書4-0'])
+
+    def test_parallel_with_parse_workers(self):
+        self.scraper.config['parse_workers'] = 2
+        self.scraper.session = FakeSession(total_pages=4)
+        books, _ = self.scraper.crawl_all_pages(BASE_URL, parallel=True)
+        self.assertEqual([book['product_name'] for book in books][::2], ['書1-0', '書2-0', '書3-0', '書4-0'])
+
+    def test_parallel_streams_to_sink_in_page_order(self):
+        self.scraper.session = FakeSession(total_pages=5, failing_pages={3})
+        with self.scraper.open_sink('books.jsonl') as sink:
+            books, _ = self.scraper.crawl_all_pages(BASE_URL, parallel=True, sink=sink)
+        self.assertEqual(books, [])
+        self.assertEqual(sink.count, 8)
+        with open(sink.path, encoding='utf-8') as f:
+            titles = [line.split('"product_name": "')[1].split('"')[0] for line in f]
+        self.assertEqual(titles[::2], ['書1-0', '書2-0', '書4-0', '書5-0'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from books_crawler.core.metrics import (
+    FETCH_SECONDS, HTTP_RESPONSES, METRICS, PARSE_SECONDS, RECORDS, SLEEP_SECONDS, MetricsRegistry,
+    start_http_server
+)
+from books_crawler.scrapers.list_scraper import BookListScraper
+from tests.helpers import BASE_URL, FakeSession
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_render_histogram_and_counters(self):
+        metrics = MetricsRegistry()
+        metrics.record_fetch('www.books.com.tw', 0.3, 200, 1024)
+        metrics.record_fetch('www.books.com.tw', 20, 503)
+        metrics.inc(SLEEP_SECONDS, 1.5, host='www.books.com.tw')
+        text = metrics.render()
+        self.assertIn('books_crawler_fetch_seconds_bucket{host="www.books.com.tw",le="0.5"} 1', text)
+        self.assertIn('books_crawler_fetch_seconds_bucket{host="www.books.com.tw",le="+Inf"} 2', text)
+        self.assertIn('books_crawler_fetch_seconds_count{host="www.books.com.tw"} 2', text)
+        self.assertIn('books_crawler_http_responses_total{host="www.books.com.tw",status="503"} 1', text)
+        self.assertIn('books_crawler_response_bytes_total{host="www.books.com.tw"} 1024', text)
+        self.assertIn('books_crawler_politeness_sleep_seconds_total{host="www.books.com.tw"} 1.5', text)
+
+    def test_merge_snapshot_from_parse_process(self):
+        parent, child = MetricsRegistry(), MetricsRegistry()
+        parent.record_parse('detail', 0.01, 1)
+        child.record_parse('detail', 0.02, 1)
+        child.record_parse('list_b', 0.01, 20)
+        parent.merge(child.snapshot())
+        totals = parent.histogram_totals(PARSE_SECONDS)
+        self.assertEqual(totals[(('page_type', 'detail'),)][0], 2)
+        self.assertEqual(parent.counter_total(RECORDS), 22)
+
+    def test_write_textfile(self):
+        metrics = MetricsRegistry()
+        metrics.record_parse('bestseller_a', 0.01, 100)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics', 'crawler.prom')
+            metrics.write_textfile(path)
+            with open(path, encoding='utf-8') as f:
+                self.assertIn('books_crawler_records_total{page_type="bestseller_a"} 100', f.read())
+
+    def test_http_server_serves_only_get_metrics(self):
+        server = start_http_server(0, addr='127.0.0.1')
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        with urllib.request.urlopen(f'{base}/metrics?x=1') as response:
+            self.assertEqual(response.status, 200)
+            self.assertIn(b'# TYPE', response.read())
+        requests = [
+            urllib.request.Request(f'{base}/'),
+            urllib.request.Request(f'{base}/metrics/extra'),
+            urllib.request.Request(f'{base}/metrics', data=b'x', method='POST'),
+            urllib.request.Request(f'{base}/metrics', method='DELETE'),
+        ]
+        for request in requests:
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request)
+            self.assertEqual(context.exception.code, 404)
+            context.exception.close()
+
+class TestCrawlMetrics(unittest.TestCase):
+
+    def test_list_crawl_is_instrumented(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {'base_dir': tmp, 'fetch': {'rate_limits': {'default': 1000}}}
+            scraper = BookListScraper('測試', BASE_URL, config)
+            scraper.session = FakeSession(total_pages=3, failing_pages={3})
+            METRICS.reset()
+            scraper.crawl_all_pages(BASE_URL, parallel=True)
+
+        self.assertEqual(METRICS.counter_total(HTTP_RESPONSES, status=200), 2)
+        self.assertEqual(METRICS.counter_total(HTTP_RESPONSES, status=503), 1)
+        self.assertEqual(METRICS.counter_total(RECORDS, page_type='list_a'), 4)
+        self.assertEqual(sum(count for count, _ in METRICS.histogram_totals(FETCH_SECONDS).values()), 3)
+        self.assertIn('list_a: 2 頁', METRICS.summary())
+
+if __name__ == '__main__':
+    unittest.main()
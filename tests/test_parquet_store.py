@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from books_crawler.core import parquet_store
+from books_crawler.core.parquet_store import RankingDataset
+
+def ranking_rows(timestamp, ranks):
+    return [
+        {'rank': rank, 'book_id': book_id, 'title': f'書{book_id}', 'author': '作者',
+         'url': f'https://www.books.com.tw/products/{book_id}', 'img_url': None,
+         'discount': '79', 'price': price, 'timestamp': timestamp}
+        for rank, book_id, price in ranks
+    ]
+
+@unittest.skipIf(parquet_store.pa is None, "未安裝 pyarrow")
+class TestRankingDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dataset = RankingDataset(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_partitions_and_types(self):
+        path = self.dataset.append('7日暢銷榜_總榜', ranking_rows('2024-10-24 10:00:00', [(1, '0011003391', '300'), (2, '0010999574', '未知')]))
+        self.assertIn(os.path.join('list=7日暢銷榜_總榜', 'date=2024-10-24'), path)
+        table = self.dataset.query(list_name='7日暢銷榜_總榜')
+        self.assertEqual(table.column('price').to_pylist(), [300, None])
+        self.assertEqual(str(table.schema.field('timestamp').type), 'timestamp[s]')
+
+    def test_compact_merges_small_files(self):
+        for hour in range(3):
+            self.dataset.append('中文書即時榜', ranking_rows(f'2024-10-24 {10 + hour}:00:00', [(hour + 1, '0011003391', '300')]))
+        self.dataset.append('中文書即時榜', ranking_rows('2024-10-25 10:00:00', [(1, '0011003391', '300')]))
+
+        self.assertEqual(self.dataset.compact(), 1)
+        partition = self.dataset.partition_dir('中文書即時榜', '2024-10-24')
+        self.assertEqual(len(os.listdir(partition)), 1)
+        history = self.dataset.query(book_id='0011003391')
+        self.assertEqual(sorted(history.column('rank').to_pylist()), [1, 1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,5 +36,22 @@ class TestBookInfo(unittest.TestCase):
         self.assertEqual(result['title'], '世界上最透明的故事（日本出版界話題作，只有紙本書可以體驗的感動）')
         self.assertEqual(result['original_title'], '世界でいちばん透きとおった物語')
 
+    def test_title_followed_by_pages(self):
+        meta_text = "書名：人類大歷史 【簡體版書名：人類簡史】，頁數：496，出版社：天下文化，作者：哈拉瑞，譯者：林俊宏"
+        result = BookInfoParser(meta_text).parse_book_info()
+        self.assertEqual(result['title'], '人類大歷史')
+        self.assertEqual(result['simplified_title'], '人類簡史')
+        self.assertEqual(result['pages'], '496')
+        self.assertEqual(result['author'], '哈拉瑞')
+
+    def test_parse_many(self):
+        results = BookInfoParser.parse_many([
+            "書名：體能UP1年級生：高木直子元氣滿滿大作戰，語言：繁體中文，ISBN：9789861799049，頁數：152，出版社：大田",
+            "",
+        ])
+        self.assertEqual(results[0]['title'], '體能UP1年級生：高木直子元氣滿滿大作戰')
+        self.assertEqual(results[0]['isbn'], '9789861799049')
+        self.assertIsNone(results[1])
+
 if __name__ == '__main__':
     unittest.main()
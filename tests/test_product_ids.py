@@ -0,0 +1,107 @@
+import gzip
+import os
+import tempfile
+import unittest
+from books_crawler.core.product_ids import BloomFilter, ProductIdSet, harvest_ids
+from books_crawler.core.resources import SharedResources
+from books_crawler.scrapers.bestseller_scraper import BestsellerScraper
+from books_crawler.scrapers.sitemap_scraper import parse_sitemap_xml, sitemaps_from_robots
+
+class TestProductIdSet(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'ids.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_add_and_persist_sorted(self):
+        ids = ProductIdSet(self.path, capacity=100, flush_size=3)
+        self.assertEqual(ids.add_many(['0011001522', 'E050238022', '0010922997', '0011001522']), 3)
+        self.assertFalse(ids.add('0010922997'))
+        ids.add('0011004550')
+        ids.close()
+
+        with open(self.path, 'rb') as f:
+            self.assertEqual(len(f.read()), 40)
+        ids = ProductIdSet(self.path, capacity=100)
+        self.assertEqual(list(ids), ['0010922997', '0011001522', '0011004550', 'E050238022'])
+        self.assertIn('E050238022', ids)
+        self.assertNotIn('0000000000', ids)
+        ids.close()
+
+    def test_rebuilds_stale_bloom(self):
+        ids = ProductIdSet(self.path, capacity=4)
+        ids.add_many(['0011001522', '0011001523'])
+        ids.close()
+        # 寫回 ID 檔後、保存 bloom filter 前中斷
+        with open(self.path, 'ab') as f:
+            f.write(b'0011001524')
+        ids = ProductIdSet(self.path, capacity=4)
+        self.assertIn('0011001524', ids)
+        ids.add_many(f'00110016{i:02d}' for i in range(10))
+        ids.flush()
+        self.assertGreaterEqual(ids.bloom.capacity, 13)
+        self.assertTrue(all(f'00110016{i:02d}' in ids for i in range(10)))
+        ids.close()
+
+    def test_concurrent_writers_keep_all_ids(self):
+        first = ProductIdSet(self.path, capacity=100)
+        second = ProductIdSet(self.path, capacity=100)
+        first.add_many(['0011001522', '0011001523'])
+        second.add_many(['0011001523', 'E050238022'])
+        first.flush()
+        second.flush()
+        self.assertEqual(list(second), ['0011001522', '0011001523', 'E050238022'])
+        self.assertIn('0011001522', second)
+        first.close()
+        second.close()
+        self.assertEqual(list(ProductIdSet(self.path, capacity=100)), ['0011001522', '0011001523', 'E050238022'])
+
+    def test_invalid_id(self):
+        ids = ProductIdSet(self.path)
+        with self.assertRaises(ValueError):
+            ids.add('abc')
+        ids.close()
+
+    def test_bloom_false_positive_rate(self):
+        bloom = BloomFilter(10000, 0.01)
+        for i in range(10000):
+            bloom.add(f'{i:010d}')
+        false_positives = sum(f'X{i:09d}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+class TestHarvest(unittest.TestCase):
+
+    def test_harvest_ids(self):
+        content = b'<a href="/products/0011001522?loc=1">A</a><a href="https://www.books.com.tw/products/E050238022">B</a>' \
+                  b'<a href="/products/0011001522">A</a><a href="/products/00110015220">x</a>'
+        self.assertEqual(harvest_ids(content), ['0011001522', 'E050238022'])
+
+    def test_sitemap(self):
+        index = b'<?xml version="1.0"?><sitemapindex><sitemap><loc>https://www.books.com.tw/sitemap_1.xml.gz</loc></sitemap></sitemapindex>'
+        self.assertEqual(parse_sitemap_xml(index), {'sitemaps': ['https://www.books.com.tw/sitemap_1.xml.gz'], 'product_ids': []})
+        urlset = b'<urlset><url><loc> https://www.books.com.tw/products/0011001522?a=1&amp;b=2 </loc></url>' \
+                 b'<url><loc>https://www.books.com.tw/web/books/</loc></url></urlset>'
+        self.assertEqual(parse_sitemap_xml(gzip.compress(urlset))['product_ids'], ['0011001522'])
+
+    def test_robots(self):
+        robots = 'User-agent: *\nDisallow: /exep/\nSitemap: https://www.books.com.tw/sitemap.xml\n'
+        self.assertEqual(sitemaps_from_robots(robots), ['https://www.books.com.tw/sitemap.xml'])
+
+    def test_fetched_pages_are_harvested(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {
+                'base_dir': tmp, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+                'discovery': {'enabled': True, 'capacity': 1000},
+            }
+            resources = SharedResources(config, ua_pool_size=2)
+            scraper = BestsellerScraper('x', 'https://www.books.com.tw/web/sys_saletopb/books/01/', config, resources=resources)
+            books = scraper.get_bestsellers()
+            self.assertTrue(all(book['book_id'] in resources.product_ids for book in books))
+            resources.close()
+            self.assertGreater(os.path.getsize(os.path.join(tmp, 'product_ids.bin')), 0)
+
+if __name__ == '__main__':
+    unittest.main()
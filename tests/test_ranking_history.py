@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from books_crawler.core.ranking_history import RankingHistory
+
+def ranking(timestamp, order, prices=None):
+    prices = prices or {}
+    return [
+        {
+            'rank': rank,
+            'book_id': book_id,
+            'title': f'書名{book_id}',
+            'author': '作者',
+            'url': f'https://www.books.com.tw/products/{book_id}',
+            'img_url': None,
+            'discount': '79',
+            'price': str(prices.get(book_id, 300)),
+            'timestamp': timestamp,
+        }
+        for rank, book_id in enumerate(order, start=1)
+    ]
+
+class TestRankingHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = RankingHistory(os.path.join(self.tmp.name, 'history.sqlite'))
+        self.runs = [
+            ranking('2024-10-24 10:00:00', ['A', 'B', 'C', 'D']),
+            ranking('2024-10-24 11:00:00', ['A', 'C', 'B', 'D']),
+            ranking('2024-10-24 12:00:00', ['A', 'C', 'B', 'E'], prices={'A': 250}),
+        ]
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp.cleanup()
+
+    def test_only_changes_are_stored(self):
+        counts = [self.history.append('總榜', rows) for rows in self.runs]
+        # 第一次全部寫入；之後只有 B、C 換位，以及 A 降價、D 掉出、E 進榜
+        self.assertEqual(counts, [4, 2, 3])
+        self.assertEqual(self.history.append('總榜', ranking('2024-10-24 13:00:00', ['A', 'C', 'B', 'E'], prices={'A': 250})), 0)
+
+    def test_snapshots_reconstruct_every_run(self):
+        for rows in self.runs:
+            self.history.append('總榜', rows)
+        for rows in self.runs:
+            snapshot = self.history.snapshot('總榜', rows[0]['timestamp'])
+            self.assertEqual([(row['book_id'], row['rank'], row['price']) for row in snapshot],
+                             [(row['book_id'], row['rank'], int(row['price'])) for row in rows])
+            self.assertEqual(snapshot[0]['title'], '書名A')
+        self.assertEqual(self.history.snapshot('總榜', '2024-10-24 11:30:00')[1]['book_id'], 'C')
+        self.assertEqual(self.history.snapshot('其他榜'), [])
+
+    def test_truncated_list_does_not_drop_books(self):
+        self.history.append('總榜', self.runs[0])
+        self.assertEqual(self.history.append('總榜', ranking('2024-10-24 11:00:00', ['A'])), 0)
+        self.assertEqual(self.history.trajectory('D', '總榜'), [('總榜', '2024-10-24 10:00:00', 4, 300)])
+        self.assertEqual(len(self.history.snapshot('總榜')), 4)
+
+    def test_trajectory(self):
+        for rows in self.runs:
+            self.history.append('總榜', rows)
+        self.history.append('新書榜', ranking('2024-10-24 12:00:00', ['D']))
+        self.assertEqual(self.history.trajectory('D', '總榜'), [
+            ('總榜', '2024-10-24 10:00:00', 4, 300),
+            ('總榜', '2024-10-24 12:00:00', None, None),
+        ])
+        self.assertEqual(len(self.history.trajectory('D')), 3)
+
+if __name__ == '__main__':
+    unittest.main()
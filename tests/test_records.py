@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import pickle
+import unittest
+from books_crawler.core.records import BookDetail, ListItem, RankingEntry, json_default, pa, to_arrow, write_csv, write_jsonl
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.entry = RankingEntry(
+            rank='1', title='書名', url='https://www.books.com.tw/products/0011001522', book_id='0011001522',
+            author='作者', discount='79', price='未知', timestamp='2024-10-24 10:00:00'
+        )
+
+    def test_mapping_interface(self):
+        self.assertEqual(self.entry['rank'], 1)
+        self.assertEqual(self.entry['discount'], 79)
+        # 無法轉換的數值與未設定的欄位都視為不存在
+        self.assertIsNone(self.entry.get('price'))
+        self.assertNotIn('img_url', self.entry)
+        self.assertEqual({**self.entry}, self.entry.to_dict())
+        self.assertEqual(len(self.entry), 7)
+        with self.assertRaises(KeyError):
+            self.entry['unknown'] = 1
+
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(self.entry, '__dict__'))
+        other = RankingEntry(author=''.join(['作', '者']))
+        self.assertIs(other.author, self.entry.author)
+
+    def test_from_dict(self):
+        detail = BookDetail.from_dict({'isbn': '0123456789', 'pages': '320', 'extra': 'x'})
+        self.assertEqual(detail['isbn'], '0123456789')
+        self.assertEqual(detail['pages'], 320)
+        self.assertIsNone(BookDetail.from_dict(None))
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.entry)).to_dict(), self.entry.to_dict())
+
+    def test_json(self):
+        self.assertEqual(json.loads(json.dumps([self.entry], default=json_default))[0]['rank'], 1)
+        buffer = io.StringIO()
+        self.assertEqual(write_jsonl([ListItem(product_name='書', url='u')], buffer, ListItem), 1)
+        self.assertEqual(json.loads(buffer.getvalue()), {'product_name': '書', 'url': 'u'})
+
+    def test_csv(self):
+        buffer = io.StringIO()
+        write_csv([self.entry], buffer, RankingEntry)
+        rows = list(csv.DictReader(io.StringIO(buffer.getvalue())))
+        self.assertEqual(rows[0]['rank'], '1')
+        self.assertEqual(rows[0]['price'], '')
+
+    @unittest.skipIf(pa is None, "未安裝 pyarrow")
+    def test_arrow(self):
+        table = to_arrow([self.entry], RankingEntry)
+        self.assertEqual(table.column('rank').to_pylist(), [1])
+        self.assertEqual(table.column('price').to_pylist(), [None])
+
+if __name__ == '__main__':
+    unittest.main()
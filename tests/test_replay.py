@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import requests
+import yaml
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from books_crawler.core.replay import FixtureStore, ReplayAdapter, sample_store
+from books_crawler.core.resources import SharedResources
+from books_crawler.scrapers.bestseller_scraper import BestsellerScraper
+from books_crawler.scrapers import chiming_scraper, detail_scraper, list_scraper
+from books_crawler.scrapers.chiming_scraper import CHIMING_URL, ChimingBestsellerScraper
+from books_crawler.scrapers.detail_scraper import BookDetailScraper
+from books_crawler.scrapers.list_scraper import BookListScraper
+from books_crawler.utils.category_utils import CategoryGenerator
+
+class StaticAdapter(BaseAdapter):
+    """代替真實網路的 adapter，記錄收到的請求"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        response = Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        response._content = b'<html>recorded</html>'
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+class TestFixtureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_then_replay(self):
+        url = 'https://www.books.com.tw/products/0011001522'
+        static = StaticAdapter()
+        session = requests.Session()
+        session.mount('https://', ReplayAdapter(FixtureStore(self.tmp.name), 'record', static))
+        session.get(url)
+        self.assertEqual(static.urls, [url])
+
+        session = requests.Session()
+        session.mount('https://', ReplayAdapter(FixtureStore(self.tmp.name)))
+        response = session.get(url)
+        self.assertEqual(response.text, '<html>recorded</html>')
+        self.assertEqual(session.get('https://www.books.com.tw/products/other').status_code, 404)
+
+    def test_sample_routes(self):
+        store = sample_store()
+        status, _, body = store.lookup('https://www.books.com.tw/products/0010000000?loc=x')
+        self.assertEqual(status, 200)
+        self.assertIn(b'9789861799049', body)
+        self.assertIsNone(store.lookup('https://example.com/'))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            ReplayAdapter(sample_store(), 'live')
+
+class TestScrapersOffline(unittest.TestCase):
+    """所有爬蟲以內附範例頁面端對端執行，不連網路也不做禮貌等待"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sleeps = []
+        self.config = {'base_dir': self.tmp.name, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser'}
+        self.resources = SharedResources(self.config, ua_pool_size=2, sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.resources.close()
+        self.tmp.cleanup()
+
+    def test_bestseller(self):
+        books = []
+        for url in ['https://www.books.com.tw/web/sys_saletopb/books/01/', 'https://www.books.com.tw/web/sys_tdrntb/books/']:
+            books += BestsellerScraper('x', url, self.config, resources=self.resources).get_bestsellers()
+        self.assertEqual(len(books), 4)
+        # 速率限制仍在運作，等待交給注入的 sleep
+        self.assertTrue(any(seconds > 0 for seconds in self.sleeps))
+
+    def test_list(self):
+        scraper = BookListScraper('x', 'https://www.books.com.tw/web/books_bmidm_1302/?o=1&v=1', self.config, resources=self.resources)
+        soup = scraper._get_soup(scraper.base_url)
+        self.assertEqual(scraper.get_total_pages(soup), 17)
+        self.assertEqual(len(scraper.parse_page(soup)), 100)
+
+    def test_detail(self):
+        scraper = BookDetailScraper(self.config, resources=self.resources)
+        results = dict(scraper.crawl_details(['https://www.books.com.tw/products/0011001522']))
+        self.assertEqual(results['https://www.books.com.tw/products/0011001522']['isbn'], '9789861799049')
+
+    def test_chiming(self):
+        scraper = ChimingBestsellerScraper('https://www.chimingpublishing.com/monster/book/0011001520', self.config, resources=self.resources)
+        series = scraper.get_bestsellers()
+        self.assertEqual([item['name'] for item in series], ['博客來', '誠品'])
+        self.assertEqual(series[0]['data'][0], ['2024-10-01', 3])
+
+    def test_chiming_poll(self):
+        scraper = ChimingBestsellerScraper(None, self.config, resources=self.resources)
+        urls = [CHIMING_URL.format(book_id) for book_id in ['0011001520', '0010922997']]
+        results = dict(scraper.poll(urls + ['https://example.com/monster/book/0011001520']))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(results[url][0]['data'][0] == ['2024-10-01', 3] for url in urls))
+        self.assertIsNone(results['https://example.com/monster/book/0011001520'])
+
+    def test_categories(self):
+        categories = CategoryGenerator('html.parser', resources=self.resources).generate_categories()
+        self.assertTrue(categories)
+        self.assertTrue(all(category['subcategories'] for category in categories))
+
+    def test_unknown_url_is_not_fetched(self):
+        scraper = BestsellerScraper('x', 'https://example.com/', self.config, resources=self.resources)
+        self.assertEqual(scraper.get_bestsellers(), [])
+
+class TestEntryPoints(unittest.TestCase):
+    """命令列入口以傳入（或讀取）的設定執行，書籍寫入資料庫"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'books.sqlite')
+        self.config = {
+            'base_dir': self.tmp.name, 'replay': {'mode': 'replay'}, 'parser_backend': 'html.parser',
+            'database': {'url': f'sqlite:///{self.db_path}'},
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_list_main(self):
+        categories_path = os.path.join(self.tmp.name, 'categories.json')
+        with open(categories_path, 'w', encoding='utf-8') as f:
+            json.dump([{'name': '文學小說', 'subcategories': [
+                {'name': '華文創作', 'link': 'https://www.books.com.tw/web/books_bmidm_0102/?o=1', 'subcategories': []},
+            ]}], f)
+        with mock.patch.object(list_scraper, 'CATEGORIES_FILE', categories_path):
+            list_scraper.main(resume=False, config=self.config)
+        self.assertGreater(self.query('SELECT COUNT(*) FROM books')[0][0], 0)
+
+    def test_detail_main(self):
+        detail_scraper.main(self.config)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM books')[0][0], 5)
+        self.assertGreater(self.query('SELECT COUNT(*) FROM book_categories')[0][0], 0)
+
+    def test_detail_main_reads_default_config(self):
+        config_path = os.path.join(self.tmp.name, 'config.yaml')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump({
+                **self.config, 'seen_index': {'enabled': True}, 'detail': {'stream': True, 'categories': False},
+            }, f, allow_unicode=True)
+        with mock.patch.object(detail_scraper, 'DEFAULT_CONFIG_PATH', config_path):
+            detail_scraper.main()
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'seen_index.sqlite')))
+        self.assertEqual(self.query('SELECT COUNT(*) FROM books')[0][0], 5)
+
+    def test_chiming_main(self):
+        config_path = os.path.join(self.tmp.name, 'config.yaml')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(self.config, f, allow_unicode=True)
+        chiming_scraper.main(['0011001520', '--config', config_path])
+        self.assertEqual(self.query('SELECT DISTINCT book_id FROM chiming_series'), [('0011001520',)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import sqlite3
+import tempfile
+import unittest
+from books_crawler.core.resources import SharedResources
+from books_crawler.scrapers.bestseller_scraper import BestsellerScraper
+from books_crawler.scrapers.chiming_scraper import ChimingBestsellerScraper
+
+class TestSharedResources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {'base_dir': self.tmp.name, 'fetch': {'concurrency': 6}}
+        self.resources = SharedResources(self.config, ua_pool_size=5)
+
+    def tearDown(self):
+        self.resources.close()
+        self.tmp.cleanup()
+
+    def test_scrapers_share_one_session(self):
+        first = BestsellerScraper('a', 'https://www.books.com.tw/a', self.config, resources=self.resources)
+        second = ChimingBestsellerScraper('https://www.chimingpublishing.com/b', self.config, resources=self.resources)
+        self.assertIs(first.session, second.session)
+        self.assertEqual(first.output_dir, second.output_dir)
+        # 各實例的 headers 仍互相獨立
+        self.assertEqual(first.headers['Referer'], 'https://www.books.com.tw')
+        self.assertEqual(second.headers['Referer'], 'https://www.chimingpublishing.com')
+        self.assertEqual(first.session.get_adapter('https://www.books.com.tw')._pool_maxsize, 6)
+
+    def test_rate_limiter_is_scoped_to_resources(self):
+        first = BestsellerScraper('a', 'https://www.books.com.tw/a', self.config, resources=self.resources)
+        second = BestsellerScraper('b', 'https://www.books.com.tw/b', self.config, resources=self.resources)
+        self.assertIs(first.rate_limiter, second.rate_limiter)
+        self.assertIs(first.fetcher.rate_limiter, self.resources.rate_limiter)
+        # 相同設定的另一次執行有自己的速率預算
+        other = SharedResources(self.config, ua_pool_size=1)
+        self.assertIsNot(other.rate_limiter, self.resources.rate_limiter)
+        other.close()
+
+    def test_user_agents_come_from_pool(self):
+        agents = {self.resources.user_agent() for _ in range(50)}
+        self.assertLessEqual(len(agents), 5)
+
+    def test_close_releases_http_cache(self):
+        resources = SharedResources({'base_dir': self.tmp.name, 'cache': {'enabled': True}}, ua_pool_size=1)
+        cache = resources.http_cache
+        resources.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            cache.lookup('https://www.books.com.tw/')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from books_crawler.scheduler import FIRST_RUN_SPREAD_SECONDS, RETRY_BASE_SECONDS, BestsellerScheduler
+
+JOBS = [
+    {'category': '中文書即時榜', 'url': 'https://www.books.com.tw/web/sys_tdrntb/books/', 'frequency': 'hourly'},
+    {'category': '7日暢銷榜_總榜', 'url': 'https://www.books.com.tw/web/sys_saletopb/books/', 'frequency': 'daily'},
+    {'category': '7日暢銷榜_文學小說', 'url': 'https://www.books.com.tw/web/sys_saletopb/books/01/', 'frequency': 'daily'},
+]
+
+class TestBestsellerScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp.name, 'state.json')
+        self.created_at = 10 * 86400
+        self.scheduler = BestsellerScheduler({'urls': JOBS}, state_path=self.state_path, clock=lambda: self.created_at)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_offsets_spread_within_interval(self):
+        offsets = [self.scheduler.offset(job) for job in JOBS]
+        self.assertLess(offsets[0], 3600)
+        self.assertNotEqual(offsets[1], offsets[2])
+
+    def test_jobs_run_once_per_window(self):
+        hourly, daily = JOBS[0], JOBS[1]
+        now = self.created_at + FIRST_RUN_SPREAD_SECONDS
+        self.assertEqual(len(self.scheduler.due_jobs(now)), 3)
+
+        self.scheduler.last_runs = {job['category']: now for job in JOBS}
+        self.assertEqual(self.scheduler.due_jobs(now + 60), [])
+        self.assertEqual(self.scheduler.next_run(hourly, now), self.scheduler.window_start(hourly, now) + 3600)
+
+        due = self.scheduler.due_jobs(now + 3600)
+        self.assertEqual(due, [hourly])
+        self.assertIn(daily, self.scheduler.due_jobs(now + 86400))
+
+    def test_first_runs_are_spread(self):
+        first_runs = [self.scheduler.next_run(job, self.created_at) for job in JOBS]
+        self.assertEqual(len(set(first_runs)), 3)
+        self.assertTrue(all(self.created_at <= run < self.created_at + FIRST_RUN_SPREAD_SECONDS for run in first_runs))
+
+    def test_failures_back_off(self):
+        daily = JOBS[1]
+        now = self.created_at + FIRST_RUN_SPREAD_SECONDS
+        self.assertEqual(self.scheduler.record_failure(daily, now), RETRY_BASE_SECONDS)
+        self.assertNotIn(daily, self.scheduler.due_jobs(now + 1))
+        self.assertIn(daily, self.scheduler.due_jobs(now + RETRY_BASE_SECONDS))
+        self.assertEqual(self.scheduler.record_failure(daily, now), 2 * RETRY_BASE_SECONDS)
+        for _ in range(20):
+            delay = self.scheduler.record_failure(daily, now)
+        self.assertEqual(delay, 86400)
+
+        self.scheduler._save_state()
+        reloaded = BestsellerScheduler({'urls': JOBS}, state_path=self.state_path)
+        self.assertEqual(reloaded.failures[daily['category']]['retry_at'], now + 86400)
+        self.assertEqual(reloaded.created_at, self.created_at)
+
+    def test_state_persists(self):
+        self.scheduler.last_runs['中文書即時榜'] = 123
+        self.scheduler._save_state()
+        reloaded = BestsellerScheduler({'urls': JOBS}, state_path=self.state_path)
+        self.assertEqual(reloaded.last_runs, {'中文書即時榜': 123})
+
+    def test_jobs_sharing_a_url_are_all_saved(self):
+        url = JOBS[1]['url']
+        jobs = [dict(JOBS[1], category='總榜A'), dict(JOBS[1], category='總榜B')]
+        scheduler = BestsellerScheduler({'urls': jobs}, state_path=self.state_path, clock=lambda: self.created_at)
+        scheduler._scraper = mock.Mock()
+        scheduler._scraper._fetch_and_parse.return_value = [(url, {'books': [{'rank': 1, 'title': '書1'}]})]
+        scheduler._output = mock.Mock()
+
+        now = self.created_at + 86400
+        self.assertEqual(scheduler.run_due(now), 2)
+        # 同一個網址只抓取一次，兩個榜單都保存並記錄執行時間
+        self.assertEqual(list(scheduler._scraper._fetch_and_parse.call_args[0][0]), [url])
+        saved = [call.args[1] for call in scheduler._output.save.call_args_list]
+        self.assertEqual(sorted(saved), ['總榜A', '總榜B'])
+        self.assertEqual(scheduler.last_runs, {'總榜A': now, '總榜B': now})
+
+if __name__ == '__main__':
+    unittest.main()
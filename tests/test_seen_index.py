@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+from books_crawler.core.seen_index import SeenIndex
+
+class TestSeenIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = SeenIndex(os.path.join(self.tmp.name, 'seen.sqlite'), max_age=100)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_only_new_or_stale_ids_are_queued(self):
+        self.index.record('0011003391', {'title': 'A'}, now=1000)
+        self.index.record('0010999574', {'title': 'B'}, now=1050)
+        stale = self.index.filter_stale(['0011003391', '0010999574', 'E050238022', '0011003391'], now=1120)
+        self.assertEqual(stale, ['0011003391', 'E050238022'])
+
+    def test_record_reports_content_change(self):
+        self.assertTrue(self.index.record('0011003391', {'title': 'A'}, now=1000))
+        self.assertFalse(self.index.record('0011003391', {'title': 'A'}, now=2000))
+        self.assertTrue(self.index.record('0011003391', {'title': 'A', 'pages': '496'}, now=3000))
+        self.assertEqual(self.index.filter_stale(['0011003391'], now=3050), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from books_crawler.core.resources import SharedResources
+from books_crawler.core.sink import CsvSink, JsonlSink, RecordSink
+from books_crawler.scrapers.bestseller_scraper import BestsellerScraper
+
+class TestSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_jsonl_renames_on_close(self):
+        path = os.path.join(self.tmp.name, 'books.jsonl')
+        with JsonlSink(path, batch_size=2) as sink:
+            sink.write_many([{'title': '書1'}, {'title': '書2'}, {'title': '書3'}])
+            self.assertFalse(os.path.exists(path))
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['title'] for line in f], ['書1', '書2', '書3'])
+        self.assertFalse(os.path.exists(f'{path}.part'))
+
+    def test_partial_progress_survives_error(self):
+        path = os.path.join(self.tmp.name, 'books.jsonl')
+        with self.assertRaises(RuntimeError):
+            with JsonlSink(path, batch_size=1) as sink:
+                sink.write({'title': '書1'})
+                raise RuntimeError('crash')
+        self.assertFalse(os.path.exists(path))
+        with open(f'{path}.part', encoding='utf-8') as f:
+            self.assertEqual(f.read(), '{"title": "書1"}\n')
+
+    def test_csv_header_is_stable(self):
+        path = os.path.join(self.tmp.name, 'books.csv')
+        with CsvSink(path) as sink:
+            sink.write({'rank': 1, 'title': 'A', 'discount': '79'})
+            with self.assertLogs('CsvSink', level='WARNING') as logs:
+                sink.write({'rank': 2, 'title': 'B', 'extra': 'x'})
+                sink.write({'rank': 3, 'title': 'C', 'extra': 'y'})
+            self.assertEqual(len(logs.records), 1)
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(list(rows[0].keys()), ['rank', 'title', 'discount'])
+        self.assertEqual(rows[1], {'rank': '2', 'title': 'B', 'discount': ''})
+
+    def test_record_sink_is_abstract(self):
+        with self.assertRaises(TypeError):
+            RecordSink(os.path.join(self.tmp.name, 'rows.txt'))
+
+class TestSaveData(unittest.TestCase):
+
+    def test_csv_header_is_union_of_fields(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            resources = SharedResources({'base_dir': tmp}, ua_pool_size=1)
+            scraper = BestsellerScraper('x', None, resources.config, resources=resources)
+            # Ａ版有價格欄位，Ｂ版缺價格時只有基本欄位
+            scraper.save_data([{'rank': 1, 'title': 'B'}, {'rank': 2, 'title': 'A', 'price': '300'}], 'rows.csv', 'csv')
+            resources.close()
+            with open(os.path.join(tmp, 'output', 'rows.csv'), encoding='utf-8-sig', newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(rows, [{'rank': '1', 'title': 'B', 'price': ''}, {'rank': '2', 'title': 'A', 'price': '300'}])
+
+if __name__ == '__main__':
+    unittest.main()
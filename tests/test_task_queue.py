@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from books_crawler.core import task_queue
+from books_crawler.core.task_queue import RedisTaskQueue, SQLiteTaskQueue
+from books_crawler.worker import CrawlWorker, LIST_PAGE, enqueue_categories
+from tests.helpers import CATEGORIES, FakeSession
+
+try:
+    import fakeredis
+    # fakeredis 以 lupa 執行 Lua script
+    import lupa
+except ImportError:
+    fakeredis = None
+
+class TaskQueueCases:
+
+    def make_queue(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = self.make_queue()
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_lease_ack_and_retry(self):
+        self.queue.put_many(LIST_PAGE, [{'page': 1}, {'page': 2}])
+        first = self.queue.lease('w1')
+        second = self.queue.lease('w2')
+        self.assertEqual((first.payload, second.payload), ({'page': 1}, {'page': 2}))
+        self.assertIsNone(self.queue.lease('w3'))
+
+        self.queue.ack(first)
+        self.queue.nack(second)
+        retried = self.queue.lease('w3')
+        self.assertEqual((retried.payload, retried.attempts), ({'page': 2}, 2))
+        self.queue.nack(retried)
+        self.queue.nack(self.queue.lease('w3'))
+        self.assertEqual(self.queue.counts(), {'pending': 0, 'leased': 0, 'failed': 1})
+
+    def test_expired_lease_is_requeued(self):
+        self.queue.put(LIST_PAGE, {'page': 1})
+        self.assertIsNotNone(self.queue.lease('w1', lease_seconds=-1))
+        task = self.queue.lease('w2')
+        self.assertEqual(task.attempts, 2)
+
+    def test_late_ack_after_requeue(self):
+        self.queue.put_many(LIST_PAGE, [{'page': 1}, {'page': 2}])
+        late = self.queue.lease('w1', lease_seconds=-1)
+        leased = [self.queue.lease('w2')]
+        # w1 在租約過期、任務已放回佇列後才 ack，之後的 lease 略過已刪除的任務
+        self.queue.ack(late)
+        leased += [self.queue.lease('w3'), self.queue.lease('w4')]
+        self.assertIn({'page': 2}, [task.payload for task in leased if task])
+        self.assertIsNone(leased[-1])
+
+    def test_stale_ack_is_ignored(self):
+        self.queue.put(LIST_PAGE, {'page': 1})
+        stale = self.queue.lease('w1', lease_seconds=-1)
+        current = self.queue.lease('w2')
+        # w1 在任務被 w2 重新領取後才 ack/nack，不影響 w2 的租約
+        self.assertFalse(self.queue.ack(stale))
+        self.assertFalse(self.queue.nack(stale))
+        self.assertEqual(self.queue.counts(), {'pending': 0, 'leased': 1, 'failed': 0})
+        self.assertTrue(self.queue.ack(current))
+        self.assertEqual(self.queue.counts(), {'pending': 0, 'leased': 0, 'failed': 0})
+
+    def test_keyed_put_is_added_once(self):
+        self.assertEqual(self.queue.put_many(LIST_PAGE, [{'page': 2}, {'page': 3}], keys=['a:2', 'a:3']), 2)
+        self.assertEqual(self.queue.put_many(LIST_PAGE, [{'page': 2}, {'page': 4}], keys=['a:2', 'a:4']), 1)
+        self.assertEqual(self.queue.counts()['pending'], 3)
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        self.queue.put(LIST_PAGE, {'page': 1})
+        for attempt in range(3):
+            self.assertEqual(self.queue.lease('w1', lease_seconds=-1).attempts, attempt + 1)
+        self.assertIsNone(self.queue.lease('w1'))
+        self.assertEqual(self.queue.counts(), {'pending': 0, 'leased': 0, 'failed': 1})
+
+    def test_results_round_trip(self):
+        self.queue.push_results(LIST_PAGE, [{'title': '書1'}, {'title': '書2'}])
+        self.assertEqual(self.queue.pop_results(1), [(LIST_PAGE, {'title': '書1'})])
+        self.assertEqual(self.queue.pop_results(), [(LIST_PAGE, {'title': '書2'})])
+        self.assertEqual(self.queue.pop_results(), [])
+
+    def test_shared_rate_limit(self):
+        url = 'https://www.books.com.tw/products/0011003391'
+        limiters = [self.queue.rate_limiter({'default': 2}) for _ in range(2)]
+        self.assertEqual(limiters[0].reserve(url), 0)
+        self.assertAlmostEqual(limiters[1].reserve(url), 0.5, places=1)
+        self.assertAlmostEqual(limiters[0].reserve(url), 1.0, places=1)
+
+    def test_throttle_pauses_all_workers(self):
+        url = 'https://www.books.com.tw/products/0011003391'
+        limiters = [self.queue.rate_limiter({'default': 2}) for _ in range(2)]
+        limiters[0].observe(url, 0.1, 200)
+        self.assertEqual(limiters[1].reserve(url), 0)
+        limiters[0].observe(url, 0.1, 503)
+        self.assertAlmostEqual(limiters[1].reserve(url), task_queue.DEFAULT_THROTTLE_PAUSE, places=0)
+        limiters[1].observe(url, 0.1, 429, retry_after=120)
+        self.assertAlmostEqual(limiters[0].reserve(url), 120, places=0)
+
+    def make_worker(self):
+        config = {
+            'base_dir': self.tmp.name, 'fetch': {'rate_limits': {'default': 1000}},
+            'discovery': {'enabled': True, 'capacity': 100},
+        }
+        enqueue_categories(self.queue, CATEGORIES)
+        worker = CrawlWorker(self.queue, config)
+        for scraper in (worker.list_scraper, worker.detail_scraper, worker.bestseller_scraper):
+            scraper.session = FakeSession(total_pages=2)
+        return worker
+
+    def test_worker_expands_list_pages(self):
+        worker = self.make_worker()
+        self.assertEqual(worker.run(idle_timeout=0), 4)
+        results = self.queue.pop_results()
+        self.assertEqual(len(results), 8)
+        self.assertEqual({record['category'] for _, record in results}, {'翻譯文學', '華文創作'})
+        # 結束時寫回執行中收集到的書籍 ID
+        worker.close()
+        self.assertEqual(os.path.getsize(os.path.join(self.tmp.name, 'product_ids.bin')), 4 * 10)
+
+    def test_released_page_one_adds_pages_once(self):
+        worker = self.make_worker()
+        stale = self.queue.lease('stale', lease_seconds=-1)
+        worker.handle_list_page(stale)
+        # 租約過期的第 1 頁由 worker 重新執行，第 2 頁只加入一次
+        self.assertEqual(worker.run(idle_timeout=0), 4)
+        self.assertEqual(len(self.queue.pop_results()), 8)
+        worker.close()
+
+class TestSQLiteTaskQueue(TaskQueueCases, unittest.TestCase):
+
+    def make_queue(self):
+        return SQLiteTaskQueue(os.path.join(self.tmp.name, 'queue.sqlite'))
+
+@unittest.skipIf(fakeredis is None or task_queue.redis is None, "未安裝 redis / fakeredis")
+class TestRedisTaskQueue(TaskQueueCases, unittest.TestCase):
+
+    def make_queue(self):
+        return RedisTaskQueue(fakeredis.FakeRedis(), prefix=f'test-{id(self)}')
+
+if __name__ == '__main__':
+    unittest.main()